@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+import numpy as np
+from concurrency import DAY_MS, ConcurrencyPeaks, find_daily_peaks
+from parallel import find_daily_peaks_parallel
+
+def generate_calls(num_calls: int, num_customers: int, num_days: int = 30,
+                   seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Random calls of up to two hours (a few spanning midnight) as customer, start and end arrays"""
+    rng = np.random.default_rng(seed)
+    customer_ids = rng.integers(0, num_customers, num_calls)
+    starts = rng.integers(0, num_days * DAY_MS, num_calls)
+    ends = starts + rng.integers(1, 2 * 60 * 60 * 1000, num_calls)
+    return customer_ids, starts, ends
+
+def same_peaks(a: ConcurrencyPeaks, b: ConcurrencyPeaks) -> bool:
+    return all(np.array_equal(getattr(a, name), getattr(b, name))
+               for name in ("customer_ids", "days", "max_concurrent", "timestamps", "call_offsets", "call_indices"))
+
+def run_case(num_calls: int, num_customers: int, worker_counts: List[int], seed: int = 0) -> Dict:
+    """Time the serial engine and the process pool at each worker count on one dataset"""
+    arrays = generate_calls(num_calls, num_customers, seed=seed)
+    
+    started = time.perf_counter()
+    serial = find_daily_peaks(*arrays)
+    serial_seconds = time.perf_counter() - started
+    print(f"{num_calls:>10} calls  serial        {serial_seconds:8.2f}s")
+    
+    case = {"num_calls": num_calls, "num_customers": num_customers, "serial_seconds": serial_seconds, "parallel": []}
+    for workers in worker_counts:
+        # Start the pool outside the timing, as a long-running service would
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(abs, range(workers)))
+            started = time.perf_counter()
+            peaks = find_daily_peaks_parallel(*arrays, max_workers=workers, executor=executor)
+            seconds = time.perf_counter() - started
+        
+        identical = same_peaks(peaks, serial)
+        print(f"{num_calls:>10} calls  {workers:>2} workers   {seconds:8.2f}s  "
+              f"{serial_seconds / seconds:5.2f}x  {'identical' if identical else 'MISMATCH'}")
+        case["parallel"].append({"workers": workers, "seconds": seconds, "speedup": serial_seconds / seconds,
+                                 "identical": identical})
+    return case
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Benchmark serial vs process-pool daily peak concurrency")
+    parser.add_argument("--calls", type=int, nargs="+", default=[1000000, 5000000], help="Dataset sizes")
+    parser.add_argument("--customers", type=int, default=1000, help="Distinct customers")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({2 ** i for i in range(cpus.bit_length()) if 2 ** i < cpus} | {cpus}),
+                        help="Worker counts to try (default: powers of two up to the CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    
+    print(f"{platform.processor() or platform.machine()}, {cpus} CPUs")
+    results = {"cpus": cpus, "cases": [run_case(num_calls, args.customers, args.workers, args.seed)
+                                        for num_calls in args.calls]}
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
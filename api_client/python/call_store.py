@@ -0,0 +1,265 @@
+from array import array
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import argparse
+import json
+import struct
+import numpy as np
+from concurrency import EPOCH_ORDINAL, CallRecord, ConcurrencyPeaks, ResultEntry, find_daily_peaks
+from streaming import RECORD_KEYS, iter_call_records
+
+# File layout: magic, format version, header length, a JSON header listing each section's
+# offset, dtype and shape, then the sections themselves, each aligned for zero-copy views
+MAGIC = b"CALLSTOR"
+VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sII")
+
+KIND_CALLS = "calls"
+KIND_RESULTS = "results"
+
+class CallIdDictionary:
+    """
+    Interned call IDs, looked up by code. Canonical lowercase UUIDs are stored as 16
+    bytes each (uuid_bytes); anything else as one UTF-8 blob with offsets.
+    """
+    
+    def __init__(self, uuid_bytes: Optional[np.ndarray] = None, blob: Optional[np.ndarray] = None,
+                 offsets: Optional[np.ndarray] = None):
+        self.uuid_bytes = uuid_bytes
+        self.blob = blob
+        self.offsets = offsets
+    
+    @classmethod
+    def from_ids(cls, call_ids: List[str]) -> "CallIdDictionary":
+        joined = "".join(call_ids)
+        if call_ids and len(joined) == 36 * len(call_ids) and all(
+                joined[position::36].count("-") == len(call_ids) for position in (8, 13, 18, 23)):
+            hex_digits = joined.replace("-", "")
+            if len(hex_digits) == 32 * len(call_ids) and hex_digits == hex_digits.lower():
+                try:
+                    return cls(uuid_bytes=np.frombuffer(bytes.fromhex(hex_digits), dtype=np.uint8).reshape(-1, 16))
+                except ValueError:
+                    pass
+        
+        encoded = [call_id.encode("utf-8") for call_id in call_ids]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(call_id) for call_id in encoded], out=offsets[1:])
+        return cls(blob=np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets=offsets)
+    
+    def __len__(self) -> int:
+        return len(self.uuid_bytes) if self.uuid_bytes is not None else len(self.offsets) - 1
+    
+    def __getitem__(self, code: int) -> str:
+        if self.uuid_bytes is not None:
+            h = self.uuid_bytes[code].tobytes().hex()
+            return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+        return self.blob[self.offsets[code]:self.offsets[code + 1]].tobytes().decode("utf-8")
+    
+    def to_list(self) -> List[str]:
+        return [self[code] for code in range(len(self))]
+    
+    def sections(self) -> Dict[str, np.ndarray]:
+        if self.uuid_bytes is not None:
+            return {"id_uuid_bytes": self.uuid_bytes}
+        return {"id_blob": self.blob, "id_offsets": self.offsets}
+    
+    @classmethod
+    def from_sections(cls, sections: Dict[str, np.ndarray]) -> "CallIdDictionary":
+        return cls(sections.get("id_uuid_bytes"), sections.get("id_blob"), sections.get("id_offsets"))
+
+class CallIdColumn(Sequence):
+    """A column of call IDs stored as codes into a CallIdDictionary, decoded on access"""
+    
+    def __init__(self, codes: np.ndarray, dictionary: CallIdDictionary):
+        self.codes = codes
+        self.dictionary = dictionary
+    
+    def __len__(self) -> int:
+        return len(self.codes)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.dictionary[code] for code in self.codes[index].tolist()]
+        return self.dictionary[int(self.codes[index])]
+
+class _Interner:
+    """Assigns each distinct call ID a code in first-seen order"""
+    
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+    
+    def code(self, call_id: str) -> int:
+        code = self.codes.get(call_id)
+        if code is None:
+            code = self.codes[call_id] = len(self.codes)
+        return code
+    
+    def dictionary(self) -> CallIdDictionary:
+        return CallIdDictionary.from_ids(list(self.codes))
+
+def _code_dtype(num_codes: int):
+    return np.int32 if num_codes < 1 << 31 else np.int64
+
+@dataclass
+class CallDataset:
+    """Call records as columns, with call IDs interned"""
+    customer_ids: np.ndarray
+    start_timestamps: np.ndarray
+    end_timestamps: np.ndarray
+    call_ids: CallIdColumn
+    
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+    
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "CallDataset":
+        """Build from call record dicts (e.g. iter_call_records) without keeping the dicts"""
+        customer_ids, starts, ends, codes = array("q"), array("q"), array("q"), array("q")
+        interner = _Interner()
+        for record in records:
+            customer_ids.append(record["customerId"])
+            starts.append(record["startTimestamp"])
+            ends.append(record["endTimestamp"])
+            codes.append(interner.code(record["callId"]))
+        
+        dictionary = interner.dictionary()
+        return cls(np.frombuffer(customer_ids, dtype=np.int64), np.frombuffer(starts, dtype=np.int64),
+                   np.frombuffer(ends, dtype=np.int64),
+                   CallIdColumn(np.frombuffer(codes, dtype=np.int64).astype(_code_dtype(len(dictionary))), dictionary))
+    
+    def to_call_records(self) -> List[CallRecord]:
+        return [CallRecord(customer_id, self.call_ids.dictionary[code], start, end)
+                for customer_id, code, start, end in zip(self.customer_ids.tolist(), self.call_ids.codes.tolist(),
+                                                         self.start_timestamps.tolist(), self.end_timestamps.tolist())]
+    
+    def find_daily_peaks(self) -> ConcurrencyPeaks:
+        return find_daily_peaks(self.customer_ids, self.start_timestamps, self.end_timestamps)
+    
+    def results(self) -> List[ResultEntry]:
+        """Daily peaks as ResultEntry records, the same as find_max_concurrent_calls"""
+        return self.find_daily_peaks().to_results(self.call_ids)
+
+def _write(path: str, kind: str, count: int, sections: Dict[str, np.ndarray]):
+    layout, offset = {}, 0
+    for name, values in sections.items():
+        layout[name] = {"offset": offset, "dtype": values.dtype.str, "shape": list(values.shape)}
+        offset += -(-values.nbytes // ALIGNMENT) * ALIGNMENT
+    
+    header = json.dumps({"kind": kind, "count": count, "sections": layout}).encode("utf-8")
+    data_start = -(-(_PREAMBLE.size + len(header)) // ALIGNMENT) * ALIGNMENT
+    
+    with open(path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for name, values in sections.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(values).tobytes())
+        f.truncate(data_start + offset)
+
+def _read(path: str, kind: str, mmap: bool) -> Tuple[int, Dict[str, np.ndarray]]:
+    """Return the record count and every section as a read-only view into the file"""
+    raw = np.memmap(path, dtype=np.uint8, mode="r") if mmap else np.fromfile(path, dtype=np.uint8)
+    magic, version, header_length = _PREAMBLE.unpack(raw[:_PREAMBLE.size].tobytes())
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a call store file")
+    if version != VERSION:
+        raise ValueError(f"{path} has unsupported format version {version}")
+    
+    header = json.loads(raw[_PREAMBLE.size:_PREAMBLE.size + header_length].tobytes())
+    if header["kind"] != kind:
+        raise ValueError(f"{path} holds {header['kind']}, not {kind}")
+    
+    data_start = -(-(_PREAMBLE.size + header_length) // ALIGNMENT) * ALIGNMENT
+    sections = {}
+    for name, section in header["sections"].items():
+        dtype = np.dtype(section["dtype"])
+        count = int(np.prod(section["shape"]))
+        start = data_start + section["offset"]
+        sections[name] = raw[start:start + count * dtype.itemsize].view(dtype).reshape(section["shape"])
+    return header["count"], sections
+
+def is_call_store(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def save_calls(path: str, dataset: CallDataset):
+    _write(path, KIND_CALLS, len(dataset), {
+        "customer_ids": dataset.customer_ids.astype(np.int64, copy=False),
+        "start_timestamps": dataset.start_timestamps.astype(np.int64, copy=False),
+        "end_timestamps": dataset.end_timestamps.astype(np.int64, copy=False),
+        "call_codes": dataset.call_ids.codes,
+        **dataset.call_ids.dictionary.sections(),
+    })
+
+def load_calls(path: str, mmap: bool = True) -> CallDataset:
+    """Load a call dataset; with mmap the columns are views into the file, paged in as they are read"""
+    _, sections = _read(path, KIND_CALLS, mmap)
+    return CallDataset(sections["customer_ids"], sections["start_timestamps"], sections["end_timestamps"],
+                       CallIdColumn(sections["call_codes"], CallIdDictionary.from_sections(sections)))
+
+def save_results(path: str, peaks: ConcurrencyPeaks, call_ids: Sequence[str]):
+    """Save daily peaks, interning only the call IDs the peaks refer to"""
+    interner = _Interner()
+    codes = np.fromiter((interner.code(call_ids[i]) for i in peaks.call_indices.tolist()), dtype=np.int64,
+                        count=len(peaks.call_indices))
+    dictionary = interner.dictionary()
+    
+    _write(path, KIND_RESULTS, len(peaks), {
+        "customer_ids": peaks.customer_ids.astype(np.int64, copy=False),
+        "days": peaks.days.astype(np.int32),
+        "max_concurrent": peaks.max_concurrent.astype(np.int32),
+        "timestamps": peaks.timestamps.astype(np.int64, copy=False),
+        "call_offsets": peaks.call_offsets.astype(np.int64, copy=False),
+        "call_codes": codes.astype(_code_dtype(len(dictionary))),
+        **dictionary.sections(),
+    })
+
+def save_result_entries(path: str, results: Iterable[Dict]):
+    """Save results in the result.json shape (dicts or vars(ResultEntry))"""
+    customer_ids, days, max_concurrent, timestamps, offsets, call_ids = (array("q"), array("q"), array("q"),
+                                                                          array("q"), array("q", [0]), [])
+    for result in results:
+        customer_ids.append(result["customerId"])
+        days.append(date.fromisoformat(result["date"]).toordinal() - EPOCH_ORDINAL)
+        max_concurrent.append(result["maxConcurrentCalls"])
+        timestamps.append(result["timestamp"])
+        call_ids.extend(result["callIds"])
+        offsets.append(len(call_ids))
+    
+    # Call lists are stored with their own offsets, so they need not match maxConcurrentCalls
+    peaks = ConcurrencyPeaks(*(np.frombuffer(column, dtype=np.int64) for column in
+                               (customer_ids, days, max_concurrent, timestamps, offsets)), np.arange(len(call_ids)))
+    save_results(path, peaks, call_ids)
+
+def load_results(path: str, mmap: bool = True) -> Tuple[ConcurrencyPeaks, CallIdDictionary]:
+    """
+    Load daily peaks. Their call_indices are codes into the returned dictionary, so
+    peaks.to_results(dictionary) rebuilds the ResultEntry records.
+    """
+    _, sections = _read(path, KIND_RESULTS, mmap)
+    peaks = ConcurrencyPeaks(sections["customer_ids"], sections["days"], sections["max_concurrent"],
+                             sections["timestamps"], sections["call_offsets"], sections["call_codes"])
+    return peaks, CallIdDictionary.from_sections(sections)
+
+def convert_json(json_path: str, output_path: str, results: bool = False):
+    """Convert a dataset (callRecords) or results JSON file to the binary format, parsing it incrementally"""
+    with open(json_path, "rb") as f:
+        if results:
+            save_result_entries(output_path, iter_call_records(f, keys=("results",)))
+        else:
+            save_calls(output_path, CallDataset.from_records(iter_call_records(f, keys=RECORD_KEYS)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert call datasets or results between JSON and the binary call store")
+    parser.add_argument("input", help="JSON file to convert")
+    parser.add_argument("output", help="Binary file to write")
+    parser.add_argument("--results", action="store_true", help="The input is results ({'results': [...]})")
+    args = parser.parse_args()
+    
+    convert_json(args.input, args.output, args.results)
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Sequence, Tuple
+import numpy as np
+
+DAY_MS = 24 * 60 * 60 * 1000
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Packed endpoint key layout, low to high bits: 1 bit start flag (0 = end, so ends sort
+# before starts at the same millisecond), 27 bits offset within the day (an end may sit
+# exactly on the next midnight, DAY_MS < 2**27), then the dense (customer, day) group
+_TIME_BITS = 27
+_DAY_BITS = 21
+
+@dataclass
+class CallRecord:
+    customerId: int
+    callId: str
+    startTimestamp: int
+    endTimestamp: int
+
+@dataclass
+class ResultEntry:
+    customerId: int
+    date: str
+    maxConcurrentCalls: int
+    timestamp: int
+    callIds: List[str]
+
+def day_to_iso(day: int) -> str:
+    return date.fromordinal(EPOCH_ORDINAL + day).isoformat()
+
+@dataclass
+class ConcurrencyPeaks:
+    """
+    Daily peak concurrency per customer as parallel arrays, one row per (customer, day)
+    sorted by customer then day. The calls active at row i's peak are
+    call_indices[call_offsets[i]:call_offsets[i + 1]], in input order.
+    """
+    customer_ids: np.ndarray
+    days: np.ndarray
+    max_concurrent: np.ndarray
+    timestamps: np.ndarray
+    call_offsets: np.ndarray
+    call_indices: np.ndarray
+    
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+    
+    def to_results(self, call_ids: Sequence[str]) -> List[ResultEntry]:
+        """Build ResultEntry records, mapping call indices to IDs with call_ids"""
+        dates = {day: day_to_iso(day) for day in np.unique(self.days).tolist()}
+        offsets = self.call_offsets.tolist()
+        indices = self.call_indices.tolist()
+        
+        return [
+            ResultEntry(customer_id, dates[day], max_concurrent, timestamp,
+                        [call_ids[i] for i in indices[offsets[row]:offsets[row + 1]]])
+            for row, (customer_id, day, max_concurrent, timestamp) in enumerate(zip(
+                self.customer_ids.tolist(), self.days.tolist(),
+                self.max_concurrent.tolist(), self.timestamps.tolist()))
+        ]
+
+def split_by_day(customer_ids: np.ndarray, start_timestamps: np.ndarray,
+                 end_timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split calls at UTC midnight into one segment per day they touch.
+    
+    A call ending exactly at midnight gets no segment on the next day, and zero-length
+    calls get no segments at all. Returns (call_index, customer_ids, starts, ends) for
+    the segments, where call_index points back to each segment's call in the input.
+    """
+    customer_ids = np.asarray(customer_ids, dtype=np.int64)
+    start_timestamps = np.asarray(start_timestamps, dtype=np.int64)
+    end_timestamps = np.asarray(end_timestamps, dtype=np.int64)
+    
+    first_days = start_timestamps // DAY_MS
+    last_days = (end_timestamps - 1) // DAY_MS
+    counts = np.where(end_timestamps > start_timestamps, last_days - first_days + 1, 0)
+    
+    # Most calls sit within one day; only expand when some do not
+    if (counts == 1).all():
+        return np.arange(len(counts)), customer_ids, start_timestamps, end_timestamps
+    
+    # Segment k of a call is on day first_day + k: k is the segment's position minus its call's first position
+    call_index = np.repeat(np.arange(len(counts)), counts)
+    first_segment = np.cumsum(counts) - counts
+    days = first_days[call_index] + (np.arange(len(call_index)) - first_segment[call_index])
+    
+    # Clip each segment to its day
+    starts = np.maximum(start_timestamps[call_index], days * DAY_MS)
+    ends = np.minimum(end_timestamps[call_index], (days + 1) * DAY_MS)
+    
+    return call_index, customer_ids[call_index], starts, ends
+
+def find_daily_peaks(customer_ids: np.ndarray, start_timestamps: np.ndarray,
+                     end_timestamps: np.ndarray) -> ConcurrencyPeaks:
+    """
+    Split calls by day and find each customer's daily peaks. The peaks' call_indices
+    point at the unsplit input calls.
+    """
+    call_index, customers, starts, ends = split_by_day(customer_ids, start_timestamps, end_timestamps)
+    peaks = find_peaks(customers, starts, ends)
+    peaks.call_indices = call_index[peaks.call_indices]
+    return peaks
+
+def find_peaks(customer_ids: np.ndarray, start_timestamps: np.ndarray,
+               end_timestamps: np.ndarray) -> ConcurrencyPeaks:
+    """
+    Find each customer's maximum number of concurrent calls per UTC day.
+    
+    Every call must lie within a single UTC day (split multi-day calls first); calls are
+    half-open [start, end) intervals and zero-length calls are ignored. The peak
+    timestamp is the start of the first call, in input order, that starts at a moment
+    of maximum concurrency.
+    
+    All endpoints are packed into one int64 key per endpoint and sorted once, so the
+    sweep is O(n log n) with no per-call Python objects.
+    """
+    customer_ids = np.asarray(customer_ids, dtype=np.int64)
+    start_timestamps = np.asarray(start_timestamps, dtype=np.int64)
+    end_timestamps = np.asarray(end_timestamps, dtype=np.int64)
+    
+    kept = np.flatnonzero(end_timestamps > start_timestamps)
+    if kept.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return ConcurrencyPeaks(empty, empty, empty, empty, np.zeros(1, dtype=np.int64), empty)
+    
+    if kept.size == len(start_timestamps):
+        customers, starts, ends = customer_ids, start_timestamps, end_timestamps
+    else:
+        customers, starts, ends = customer_ids[kept], start_timestamps[kept], end_timestamps[kept]
+    
+    days = starts // DAY_MS
+    start_offsets = starts - days * DAY_MS
+    end_offsets = ends - days * DAY_MS
+    if end_offsets.max() > DAY_MS:
+        raise ValueError("Calls must be split by day before finding peaks")
+    
+    # Dense group per (customer, day); np.unique sorts, so groups come out in result order
+    customer_base, day_base = customers.min(), days.min()
+    if days.max() - day_base >= 1 << _DAY_BITS:
+        raise ValueError("Calls span too many days")
+    groups_packed, groups = np.unique(((customers - customer_base) << _DAY_BITS) | (days - day_base),
+                                      return_inverse=True)
+    groups = groups.reshape(-1).astype(np.int64)
+    del customers, days
+    
+    # Sort every endpoint by (group, time, end before start) in one pass
+    keys = np.concatenate((
+        (groups << (_TIME_BITS + 1)) | (end_offsets << 1),
+        (groups << (_TIME_BITS + 1)) | (start_offsets << 1) | 1,
+    ))
+    del end_offsets
+    keys.sort()
+    
+    # Each group's endpoints net to zero, so one running sum covers all groups
+    running = np.cumsum((keys & 1).astype(np.int8) * np.int8(2) - np.int8(1), dtype=np.int32)
+    
+    # Concurrency at each distinct (group, time) is the running count after its last endpoint
+    keys >>= 1
+    last = np.flatnonzero(np.append(keys[1:] != keys[:-1], True))
+    moment_keys = keys[last]
+    moment_counts = running[last]
+    del keys, running, last
+    moment_groups = moment_keys >> _TIME_BITS
+    
+    group_first = np.flatnonzero(np.append(True, moment_groups[1:] != moment_groups[:-1]))
+    max_concurrent = np.maximum.reduceat(moment_counts, group_first)
+    peak_moments = moment_keys[moment_counts == max_concurrent[moment_groups]]
+    del moment_keys, moment_counts, moment_groups
+    
+    # The first call (in input order) starting at a peak moment picks each group's timestamp
+    call_moments = (groups << _TIME_BITS) | start_offsets
+    position = np.minimum(np.searchsorted(peak_moments, call_moments), len(peak_moments) - 1)
+    at_peak = np.flatnonzero(peak_moments[position] == call_moments)
+    _, first = np.unique(groups[at_peak], return_index=True)
+    timestamps = starts[at_peak[first]]
+    del call_moments, position, at_peak
+    
+    # Collect the calls active at each peak only once the peak is known
+    peak = timestamps[groups]
+    active = np.flatnonzero((starts <= peak) & (ends > peak))
+    active = active[np.argsort(groups[active], kind="stable")]
+    call_offsets = np.concatenate(([0], np.cumsum(max_concurrent, dtype=np.int64)))
+    
+    return ConcurrencyPeaks(
+        customer_ids=(groups_packed >> _DAY_BITS) + customer_base,
+        days=(groups_packed & ((1 << _DAY_BITS) - 1)) + day_base,
+        max_concurrent=max_concurrent.astype(np.int64),
+        timestamps=timestamps,
+        call_offsets=call_offsets,
+        call_indices=kept[active],
+    )
@@ -0,0 +1,178 @@
+from typing import Optional, Tuple, Union
+import numpy as np
+
+# Packed endpoint key layout, low to high bits: 1 bit start flag (ends sort before starts at
+# the same millisecond), 41 bits of milliseconds since the earliest call (about 69 years),
+# then the dense customer group
+_TIME_BITS = 41
+_GROUP_BITS = 63 - _TIME_BITS - 1
+
+Timestamps = Union[int, np.ndarray, None]
+
+class ConcurrencyProfile:
+    """
+    Each customer's number of concurrent calls over time, as a step function.
+    
+    The endpoints of all calls are sorted once; after that every query (peaks per
+    bucket or window, time-weighted percentiles, time above a threshold, mean
+    concurrency) is a vectorized pass or binary search over the step arrays, so asking
+    for several reports does not re-sort the calls.
+    
+    Calls are half-open [start, end) intervals and zero-length calls are ignored, as in
+    find_daily_peaks. Calls are not split at midnight: the step function is continuous.
+    
+    Query results are arrays aligned with customer_ids (sorted). Where a query takes
+    start and end they may be scalars or arrays aligned with customer_ids; by default
+    each customer's window runs from their first call's start to their last call's end.
+    """
+    
+    def __init__(self, customer_ids: np.ndarray, start_timestamps: np.ndarray, end_timestamps: np.ndarray):
+        customer_ids = np.asarray(customer_ids, dtype=np.int64)
+        start_timestamps = np.asarray(start_timestamps, dtype=np.int64)
+        end_timestamps = np.asarray(end_timestamps, dtype=np.int64)
+        
+        kept = end_timestamps > start_timestamps
+        customers, starts, ends = customer_ids[kept], start_timestamps[kept], end_timestamps[kept]
+        
+        self.customer_ids, groups = np.unique(customers, return_inverse=True)
+        groups = groups.reshape(-1).astype(np.int64)
+        if len(self.customer_ids) >= 1 << _GROUP_BITS:
+            raise ValueError("Too many customers for one profile")
+        
+        self._base = int(starts.min()) if len(starts) else 0
+        if len(ends) and int(ends.max()) - self._base >= 1 << _TIME_BITS:
+            raise ValueError("Calls span too long a time for one profile")
+        
+        # Sort every endpoint by (customer, time, end before start) in one pass
+        keys = np.concatenate((
+            (groups << (_TIME_BITS + 1)) | ((ends - self._base) << 1),
+            (groups << (_TIME_BITS + 1)) | ((starts - self._base) << 1) | 1,
+        ))
+        keys.sort()
+        running = np.cumsum((keys & 1).astype(np.int8) * np.int8(2) - np.int8(1), dtype=np.int32)
+        
+        # One step per distinct (customer, time): the level holds from that time until the next step
+        keys >>= 1
+        last = np.flatnonzero(np.append(keys[1:] != keys[:-1], len(keys) > 0))
+        self._keys = keys[last]
+        self.levels = running[last].astype(np.int64)
+        self.groups = self._keys >> _TIME_BITS
+        self.times = (self._keys & ((1 << _TIME_BITS) - 1)) + self._base
+        
+        # Steps of customer g are group_offsets[g]:group_offsets[g + 1]; the last one is always level 0
+        self.group_offsets = np.searchsorted(self.groups, np.arange(len(self.customer_ids) + 1))
+        self.first_times = self.times[self.group_offsets[:-1]]
+        self.last_times = self.times[self.group_offsets[1:] - 1]
+        
+        # Prefix integral of concurrency over time, in call-milliseconds, up to each step
+        is_last = np.zeros(len(self.times), dtype=bool)
+        is_last[self.group_offsets[1:] - 1] = True
+        self._durations = np.where(is_last, 0, np.append(np.diff(self.times), 0))
+        self._area = np.concatenate(([0], np.cumsum(self.levels * self._durations)))
+    
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+    
+    def _window(self, start: Timestamps, end: Timestamps) -> Tuple[np.ndarray, np.ndarray]:
+        starts = self.first_times if start is None else np.broadcast_to(np.asarray(start, dtype=np.int64), len(self))
+        ends = self.last_times if end is None else np.broadcast_to(np.asarray(end, dtype=np.int64), len(self))
+        return starts, ends
+    
+    def _step_at(self, groups: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        """Index of the step in effect for each (group, timestamp), or -1 before the group's first step"""
+        offsets = np.clip(timestamps - self._base, -1, (1 << _TIME_BITS) - 1)
+        steps = np.searchsorted(self._keys, (groups << _TIME_BITS) | np.maximum(offsets, 0), side="right") - 1
+        return np.where((offsets < 0) | (steps < self.group_offsets[groups]), -1, steps)
+    
+    def level_at(self, timestamps: Timestamps) -> np.ndarray:
+        """Each customer's concurrency at a timestamp (or one timestamp per customer)"""
+        groups = np.arange(len(self))
+        steps = self._step_at(groups, np.broadcast_to(np.asarray(timestamps, dtype=np.int64), len(self)))
+        return np.where(steps >= 0, self.levels[steps], 0)
+    
+    def window_peaks(self, boundaries: np.ndarray) -> np.ndarray:
+        """
+        Peak concurrency of each customer in each window [boundaries[i], boundaries[i + 1]),
+        as a (customers, windows) array. boundaries must be increasing.
+        """
+        boundaries = np.asarray(boundaries, dtype=np.int64)
+        num_windows = len(boundaries) - 1
+        if num_windows < 1 or len(self) == 0:
+            return np.zeros((len(self), max(num_windows, 0)), dtype=np.int64)
+        
+        # The level carried into each window from before it starts...
+        groups = np.repeat(np.arange(len(self)), num_windows)
+        steps = self._step_at(groups, np.tile(boundaries[:-1], len(self)))
+        peaks = np.where(steps >= 0, self.levels[steps], 0)
+        
+        # ...raised by any step inside the window; steps are sorted by (group, time) so
+        # each window's steps are one contiguous run
+        inside = np.flatnonzero((self.times >= boundaries[0]) & (self.times < boundaries[-1]))
+        if inside.size:
+            cells = self.groups[inside] * num_windows + np.searchsorted(boundaries, self.times[inside], side="right") - 1
+            run_starts = np.flatnonzero(np.append(True, cells[1:] != cells[:-1]))
+            run_cells = cells[run_starts]
+            peaks[run_cells] = np.maximum(peaks[run_cells], np.maximum.reduceat(self.levels[inside], run_starts))
+        
+        return peaks.reshape(len(self), num_windows)
+    
+    def bucket_peaks(self, bucket_ms: int, start: Optional[int] = None,
+                     end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Peak concurrency per fixed-size bucket (e.g. hours or 15 minutes), with buckets
+        aligned to multiples of bucket_ms since the epoch (UTC). Covers [start, end), by
+        default every bucket any call touches. Returns (bucket_starts, peaks) where
+        peaks has one row per customer and one column per bucket.
+        """
+        if start is None:
+            start = int(self.first_times.min()) if len(self) else 0
+        if end is None:
+            end = int(self.last_times.max()) if len(self) else 0
+        first_bucket = start // bucket_ms
+        last_bucket = -(-end // bucket_ms)
+        
+        boundaries = np.arange(first_bucket, last_bucket + 1, dtype=np.int64) * bucket_ms
+        return boundaries[:-1], self.window_peaks(boundaries)
+    
+    def _clipped_durations(self, start: Timestamps, end: Timestamps) -> Tuple[np.ndarray, np.ndarray]:
+        """Time each step spends inside each customer's window, and the idle time in the window before the first call"""
+        starts, ends = self._window(start, end)
+        step_starts = np.maximum(self.times, starts[self.groups])
+        next_times = np.where(self._durations > 0, self.times + self._durations, ends[self.groups])
+        step_ends = np.minimum(next_times, ends[self.groups])
+        idle_before = np.clip(np.minimum(self.first_times, ends) - starts, 0, None)
+        return np.clip(step_ends - step_starts, 0, None), idle_before
+    
+    def percentile(self, q: float, start: Timestamps = None, end: Timestamps = None) -> np.ndarray:
+        """
+        Time-weighted percentile of each customer's concurrency (q in [0, 100]): the
+        lowest level that concurrency is at or below for at least q% of the window.
+        """
+        durations, idle_before = self._clipped_durations(start, end)
+        width = int(self.levels.max()) + 1 if len(self.levels) else 1
+        
+        time_at_level = np.bincount(self.groups * width + self.levels, weights=durations,
+                                    minlength=len(self) * width).reshape(len(self), width)
+        time_at_level[:, 0] += idle_before
+        cumulative = np.cumsum(time_at_level, axis=1)
+        return np.argmax(cumulative >= cumulative[:, -1:] * (q / 100.0), axis=1)
+    
+    def time_above(self, threshold: int, start: Timestamps = None, end: Timestamps = None) -> np.ndarray:
+        """Milliseconds each customer spends with more than threshold concurrent calls"""
+        durations, _ = self._clipped_durations(start, end)
+        return np.bincount(self.groups, weights=np.where(self.levels > threshold, durations, 0),
+                           minlength=len(self)).astype(np.int64)
+    
+    def _area_before(self, timestamps: np.ndarray) -> np.ndarray:
+        """Each customer's integral of concurrency from their first call up to a timestamp"""
+        steps = self._step_at(np.arange(len(self)), timestamps)
+        safe = np.maximum(steps, 0)
+        area = self._area[safe] - self._area[self.group_offsets[:-1]] + self.levels[safe] * (timestamps - self.times[safe])
+        return np.where(steps >= 0, area, 0)
+    
+    def mean(self, start: Timestamps = None, end: Timestamps = None) -> np.ndarray:
+        """Time-weighted mean concurrency over each customer's window, from the prefix integral"""
+        starts, ends = self._window(start, end)
+        widths = ends - starts
+        area = self._area_before(ends) - self._area_before(starts)
+        return np.divide(area, widths, out=np.zeros(len(self)), where=widths > 0)
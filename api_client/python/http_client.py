@@ -0,0 +1,177 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+import json
+import random
+import time
+import zlib
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+DEFAULT_TIMEOUT = (5.0, 60.0)  # (connect, read) seconds
+ENCODE_BATCH_SIZE = 10000
+
+def encode_json(value) -> bytes:
+    """Compact JSON encoding, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def decode_json(body: bytes):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+def iter_results_body(results: Sequence[Dict], batch_size: int = ENCODE_BATCH_SIZE) -> Iterator[bytes]:
+    """Encode {"results": [...]} a batch of results at a time, so the body is never built as one string"""
+    yield b'{"results":['
+    for i in range(0, len(results), batch_size):
+        batch = encode_json(list(results[i:i + batch_size]))
+        yield (b"," if i else b"") + batch[1:-1]
+    yield b"]}"
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip a stream of byte chunks incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+class APIError(Exception):
+    def __init__(self, message: str, response: Optional[requests.Response] = None):
+        super().__init__(message)
+        self.response = response
+
+class APIClient:
+    """
+    HTTP client for the dataset and result endpoints.
+    
+    Requests share one keep-alive session with a bounded connection pool, carry
+    timeouts, and are retried with exponential backoff (plus jitter) on connection
+    errors, timeouts and 429/5xx responses, up to max_retries times. A read timeout is
+    retried only for idempotent methods: the server may already have acted on a POST it
+    was slow to answer, and resending it could duplicate the results. Responses are
+    accepted gzip-compressed and request bodies are sent gzip-compressed; if the server
+    answers 415 to a compressed body, the client resends it plain and stays plain.
+    """
+    
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 30.0, compress: bool = True, compress_level: int = 6,
+                 pool_size: int = 4, session: Optional[requests.Session] = None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.compress = compress
+        self.compress_level = compress_level
+        self.retries = 0  # Retries made over the client's lifetime
+        
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip, deflate"})
+    
+    def __enter__(self) -> "APIClient":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        self.session.close()
+    
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        # Honour a server's Retry-After (in seconds) when it gives one
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+    
+    def request(self, method: str, url: str, body: Optional[Callable[[], Union[bytes, Iterator[bytes]]]] = None,
+                headers: Optional[Dict[str, str]] = None, stream: bool = False) -> requests.Response:
+        """
+        Send a request, retrying as described on the class. body is a function returning
+        the request body (bytes, or an iterator of chunks to send chunked) so it can be
+        rebuilt for each attempt. Raises APIError once the retries are used up or on a
+        non-retryable error status.
+        """
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.request(method, url, data=body() if body else None, headers=headers,
+                                                timeout=self.timeout, stream=stream)
+                if response.status_code < 400:
+                    return response
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise APIError(f"{method} {url} failed: {response.status_code} - {response.text}", response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                unsafe = isinstance(e, requests.ReadTimeout) and method.upper() not in IDEMPOTENT_METHODS
+                if attempt == self.max_retries or unsafe:
+                    raise APIError(f"{method} {url} failed after {attempt + 1} attempts: {e}") from e
+            
+            if response is not None:
+                response.close()
+            self.retries += 1
+            time.sleep(self._delay(attempt, response))
+    
+    def get_json(self, url: str):
+        """GET a JSON document"""
+        return decode_json(self.request("GET", url).content)
+    
+    def open_stream(self, url: str) -> requests.Response:
+        """
+        GET a response without reading its body, to be read incrementally from
+        response.raw (which is set to decompress). Use it as a context manager.
+        """
+        response = self.request("GET", url, stream=True)
+        response.raw.decode_content = True
+        return response
+    
+    def post_json(self, url: str, payload_chunks: Callable[[], Iterable[bytes]], chunked: bool = False) -> requests.Response:
+        """
+        POST a JSON body produced by payload_chunks, gzip-compressed unless disabled.
+        With chunked the body is compressed and sent as it is encoded (Transfer-Encoding:
+        chunked), otherwise it is built in memory first and sent with a Content-Length.
+        """
+        def body():
+            chunks = payload_chunks()
+            if self.compress:
+                chunks = gzip_chunks(chunks, self.compress_level)
+            return chunks if chunked else b"".join(chunks)
+        
+        headers = {"Content-Type": "application/json"}
+        if self.compress:
+            headers["Content-Encoding"] = "gzip"
+        
+        try:
+            return self.request("POST", url, body, headers)
+        except APIError as e:
+            if not (self.compress and e.response is not None and e.response.status_code == 415):
+                raise
+        
+        print("Warning: Server does not accept gzip request bodies, sending uncompressed")
+        self.compress = False
+        return self.post_json(url, payload_chunks, chunked)
+    
+    def post_results(self, url: str, results: Sequence[Dict], page_size: Optional[int] = None,
+                     chunked: bool = False) -> List[requests.Response]:
+        """
+        POST results as {"results": [...]}. With page_size the results are sent in pages
+        of that many, one request each, for servers that accept partial uploads.
+        Returns the response to each page.
+        """
+        if page_size is None or page_size >= len(results):
+            pages = [results]
+        else:
+            pages = [results[i:i + page_size] for i in range(0, len(results), page_size)]
+        
+        return [self.post_json(url, lambda page=page: iter_results_body(page), chunked) for page in pages]
@@ -0,0 +1,191 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import heapq
+from concurrency import DAY_MS, CallRecord, ResultEntry, day_to_iso
+
+# Event kinds, in the order they apply at the same millisecond: a call ending when another
+# starts is not concurrent with it
+_END, _START = 0, 1
+
+@dataclass
+class _DayState:
+    """One customer's open day: the running maximum and the day's call segments"""
+    max_concurrent: int = 0
+    timestamp: Optional[int] = None
+    segments: List[list] = field(default_factory=list)  # [call_id, start, end or None while active]
+    index: Dict[str, int] = field(default_factory=dict)  # call_id -> position in segments
+    
+    def add(self, call_id: str, start: int):
+        self.index[call_id] = len(self.segments)
+        self.segments.append([call_id, start, None])
+    
+    def result(self, customer_id: int, day: int) -> ResultEntry:
+        peak = self.timestamp
+        call_ids = [call_id for call_id, start, end in self.segments if start <= peak and (end is None or end > peak)]
+        return ResultEntry(customer_id, day_to_iso(day), self.max_concurrent, peak, call_ids)
+
+class OnlineConcurrencyTracker:
+    """
+    Tracks concurrent calls per customer from a live stream of call start and end events,
+    emitting each customer's ResultEntry for a UTC day once that day is over.
+    
+    Events may arrive out of order by up to lateness_ms: they wait in a heap until no
+    earlier event can still arrive (the watermark, lateness_ms behind the latest event
+    seen) and are then applied in time order, so each event costs O(log n) in the number
+    of events waiting. Events older than the watermark are counted in late_events and
+    dropped. A day closes once the watermark passes its end; calls still active at
+    midnight carry over into the next day, as split_by_day splits them. An end whose call
+    has still not started when a new day opens (its start was late or lost) is counted in
+    invalid_events and forgotten.
+    
+    The peak timestamp is the earliest moment of the day's maximum concurrency, and the
+    peak's callIds are listed by start time (then arrival order), which matches
+    find_max_concurrent_calls on calls ordered by start time.
+    """
+    
+    def __init__(self, lateness_ms: int = 0):
+        self.lateness_ms = lateness_ms
+        self.late_events = 0
+        self.invalid_events = 0
+        
+        self._pending: List[Tuple[int, int, int, int, str]] = []  # (time, kind, seq, customer_id, call_id)
+        self._seq = 0
+        self._max_seen: Optional[int] = None
+        self._watermark: Optional[int] = None  # Every event before this has been applied
+        
+        self._day: Optional[int] = None  # The open day; every earlier day has been closed
+        self._days: Dict[int, _DayState] = {}  # customer_id -> state of the open day
+        self._active: Dict[int, Dict[str, int]] = {}  # customer_id -> {call_id: start}, in start order
+        # (customer_id, call_id) -> end time, for ends applied before their call's start (zero-length calls)
+        self._ended_early: Dict[Tuple[int, str], int] = {}
+    
+    def current_concurrency(self, customer_id: int) -> int:
+        """Calls active for a customer as of the watermark"""
+        return len(self._active.get(customer_id, ()))
+    
+    def daily_peak(self, customer_id: int) -> Optional[ResultEntry]:
+        """The customer's peak so far in the open day, or None if they have no calls in it"""
+        state = self._days.get(customer_id)
+        return state.result(customer_id, self._day) if state else None
+    
+    def start(self, customer_id: int, call_id: str, timestamp: int) -> List[ResultEntry]:
+        """Record a call starting; returns the results of any days this closes"""
+        return self._push(timestamp, _START, customer_id, call_id)
+    
+    def end(self, customer_id: int, call_id: str, timestamp: int) -> List[ResultEntry]:
+        """Record a call ending; returns the results of any days this closes"""
+        return self._push(timestamp, _END, customer_id, call_id)
+    
+    def add_call(self, call: CallRecord) -> List[ResultEntry]:
+        """Record a finished call as its start and end events"""
+        results = self.start(call.customerId, call.callId, call.startTimestamp)
+        return results + self.end(call.customerId, call.callId, call.endTimestamp)
+    
+    def advance(self, timestamp: int) -> List[ResultEntry]:
+        """
+        Note that the stream has reached timestamp even without events (a heartbeat),
+        so days that are over close without waiting for the next event.
+        """
+        if self._max_seen is None or timestamp > self._max_seen:
+            self._max_seen = timestamp
+        return self._release(self._max_seen - self.lateness_ms)
+    
+    def finish(self) -> List[ResultEntry]:
+        """Apply every waiting event and close the open day, e.g. at shutdown"""
+        results = self._release(None)
+        if self._day is not None:
+            results.extend(self._close_day(carry_over=False))
+        if self.late_events or self.invalid_events:
+            print(f"Warning: Dropped {self.late_events} late and {self.invalid_events} invalid call events")
+        return results
+    
+    def _push(self, timestamp: int, kind: int, customer_id: int, call_id: str) -> List[ResultEntry]:
+        if self._watermark is not None and timestamp < self._watermark:
+            self.late_events += 1
+            return []
+        
+        heapq.heappush(self._pending, (timestamp, kind, self._seq, customer_id, call_id))
+        self._seq += 1
+        return self.advance(timestamp)
+    
+    def _release(self, watermark: Optional[int]) -> List[ResultEntry]:
+        """Apply every waiting event before watermark (all of them if None) in time order, closing finished days"""
+        results = []
+        while self._pending and (watermark is None or self._pending[0][0] < watermark):
+            timestamp, kind, _, customer_id, call_id = heapq.heappop(self._pending)
+            if kind == _START:
+                self._advance_day(timestamp // DAY_MS, results)
+                self._apply_start(customer_id, call_id, timestamp)
+            else:
+                # A call ending exactly at midnight belongs to the day before
+                self._advance_day((timestamp - 1) // DAY_MS, results)
+                self._apply_end(customer_id, call_id, timestamp)
+        
+        if watermark is not None and (self._watermark is None or watermark > self._watermark):
+            self._watermark = watermark
+            # Every event up to a day's end has been applied once the watermark is past it
+            self._advance_day((watermark - 1) // DAY_MS, results)
+        return results
+    
+    def _apply_start(self, customer_id: int, call_id: str, timestamp: int):
+        end = self._ended_early.pop((customer_id, call_id), None)
+        if end is not None:
+            # Zero-length calls are ignored; an end before the start is invalid
+            if end != timestamp:
+                self.invalid_events += 1
+            return
+        
+        active = self._active.setdefault(customer_id, {})
+        active[call_id] = timestamp
+        state = self._days.get(customer_id)
+        if state is None:
+            state = self._days[customer_id] = _DayState()
+        state.add(call_id, timestamp)
+        
+        # Ends at this millisecond were applied first, so a new maximum here is the peak's start
+        if len(active) > state.max_concurrent:
+            state.max_concurrent, state.timestamp = len(active), timestamp
+    
+    def _apply_end(self, customer_id: int, call_id: str, timestamp: int):
+        active = self._active.get(customer_id)
+        if active is None or call_id not in active:
+            self._ended_early[(customer_id, call_id)] = timestamp
+            return
+        
+        del active[call_id]
+        if not active:
+            del self._active[customer_id]
+        state = self._days[customer_id]
+        state.segments[state.index[call_id]][2] = timestamp
+    
+    def _advance_day(self, day: int, results: List[ResultEntry]):
+        """Close open days until day is the open one"""
+        if self._day is None:
+            self._day = day
+        if self._day >= day:
+            return
+        while self._day < day:
+            results.extend(self._close_day(carry_over=True))
+            # Jump over days with no calls at all
+            self._day = self._day + 1 if self._days else day
+        
+        # Starts are applied in time order, so a call ended before this day that has not
+        # started yet never will
+        day_start = day * DAY_MS
+        orphaned = [key for key, end in self._ended_early.items() if end < day_start]
+        for key in orphaned:
+            del self._ended_early[key]
+        self.invalid_events += len(orphaned)
+    
+    def _close_day(self, carry_over: bool) -> List[ResultEntry]:
+        results = [self._days[customer_id].result(customer_id, self._day) for customer_id in sorted(self._days)]
+        self._days = {}
+        
+        # Calls still active at midnight start the next day with a segment at midnight
+        if carry_over and self._active:
+            midnight = (self._day + 1) * DAY_MS
+            for customer_id, active in self._active.items():
+                state = self._days[customer_id] = _DayState(len(active), midnight)
+                for call_id in active:
+                    state.add(call_id, midnight)
+        return results
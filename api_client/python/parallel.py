@@ -0,0 +1,91 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+import os
+import numpy as np
+from concurrency import ConcurrencyPeaks, find_daily_peaks
+
+# Below this many calls the pool costs more than it saves
+MIN_PARALLEL_CALLS = 200000
+
+# Fibonacci hashing multiplier, so patterned customer IDs still spread evenly over shards
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+def partition_by_customer(customer_ids: np.ndarray, num_shards: int) -> List[np.ndarray]:
+    """
+    Hash-partition calls by customer, returning each shard's call indices in input order.
+    Every call of a customer lands in the same shard.
+    """
+    customer_ids = np.asarray(customer_ids, dtype=np.int64)
+    hashed = (customer_ids.view(np.uint64) * _HASH_MULTIPLIER) >> np.uint64(32)
+    shard_of = (hashed % np.uint64(num_shards)).astype(np.int64)
+    
+    # A stable sort keeps input order within each shard, which the peaks' call order relies on
+    order = np.argsort(shard_of, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(shard_of, minlength=num_shards))[:-1])
+
+def _shard_peaks(customer_ids: np.ndarray, start_timestamps: np.ndarray,
+                 end_timestamps: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Find one shard's peaks, returned as plain arrays so the result pickles compactly"""
+    peaks = find_daily_peaks(customer_ids, start_timestamps, end_timestamps)
+    return (peaks.customer_ids, peaks.days, peaks.max_concurrent, peaks.timestamps,
+            peaks.call_offsets, peaks.call_indices)
+
+def merge_peaks(shard_peaks: List[ConcurrencyPeaks], shard_indices: List[np.ndarray]) -> ConcurrencyPeaks:
+    """
+    Merge peaks found on disjoint customer shards into one result sorted by customer
+    then day, mapping each shard's call indices back to the full input.
+    """
+    customer_ids = np.concatenate([peaks.customer_ids for peaks in shard_peaks])
+    days = np.concatenate([peaks.days for peaks in shard_peaks])
+    max_concurrent = np.concatenate([peaks.max_concurrent for peaks in shard_peaks])
+    timestamps = np.concatenate([peaks.timestamps for peaks in shard_peaks])
+    call_indices = np.concatenate([indices[peaks.call_indices] for peaks, indices in zip(shard_peaks, shard_indices)])
+    
+    # Each shard's offsets, shifted past the calls of the shards before it
+    bases = np.cumsum([0] + [len(peaks.call_indices) for peaks in shard_peaks[:-1]])
+    row_starts = np.concatenate([peaks.call_offsets[:-1] + base for peaks, base in zip(shard_peaks, bases)])
+    
+    order = np.lexsort((days, customer_ids))
+    counts = max_concurrent[order]
+    call_offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+    
+    # Gather each row's calls from its old position into its new one
+    shift = np.repeat(row_starts[order] - call_offsets[:-1], counts)
+    gathered = call_indices[np.arange(call_offsets[-1]) + shift]
+    
+    return ConcurrencyPeaks(customer_ids[order], days[order], max_concurrent[order], timestamps[order],
+                            call_offsets, gathered)
+
+def find_daily_peaks_parallel(customer_ids: np.ndarray, start_timestamps: np.ndarray, end_timestamps: np.ndarray,
+                              max_workers: Optional[int] = None, num_shards: Optional[int] = None,
+                              executor: Optional[ProcessPoolExecutor] = None) -> ConcurrencyPeaks:
+    """
+    find_daily_peaks spread over a process pool.
+    
+    Calls are hash-partitioned by customer into shards, each shard's arrays are sent to
+    a worker and the sorted per-shard results are merged, so the output is identical to
+    find_daily_peaks. Pass an executor to reuse one pool across calls.
+    """
+    customer_ids = np.asarray(customer_ids, dtype=np.int64)
+    start_timestamps = np.asarray(start_timestamps, dtype=np.int64)
+    end_timestamps = np.asarray(end_timestamps, dtype=np.int64)
+    
+    max_workers = max_workers or os.cpu_count() or 1
+    num_shards = num_shards or max_workers
+    if num_shards <= 1 or len(customer_ids) < MIN_PARALLEL_CALLS:
+        return find_daily_peaks(customer_ids, start_timestamps, end_timestamps)
+    
+    shard_indices = [indices for indices in partition_by_customer(customer_ids, num_shards) if len(indices)]
+    shard_args = (
+        [customer_ids[indices] for indices in shard_indices],
+        [start_timestamps[indices] for indices in shard_indices],
+        [end_timestamps[indices] for indices in shard_indices],
+    )
+    
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            shard_results = list(pool.map(_shard_peaks, *shard_args))
+    else:
+        shard_results = list(executor.map(_shard_peaks, *shard_args))
+    
+    return merge_peaks([ConcurrencyPeaks(*result) for result in shard_results], shard_indices)
@@ -1,173 +1,58 @@
-from dataclasses import dataclass
 from typing import List, Dict
-from datetime import datetime, date
-import requests
+import argparse
 import json
-from collections import defaultdict
-
-@dataclass
-class CallRecord:
-    customerId: int
-    callId: str
-    startTimestamp: int
-    endTimestamp: int
-
-@dataclass
-class TimelineEvent:
-    time: int
-    is_start: bool
-    call_id: str
-    
-    def get_value(self) -> int:
-        return 1 if self.is_start else -1
-
-@dataclass
-class ResultEntry:
-    customerId: int
-    date: str
-    maxConcurrentCalls: int
-    timestamp: int
-    callIds: List[str]
+import numpy as np
+from call_store import is_call_store, load_calls
+from concurrency import CallRecord, ResultEntry, find_daily_peaks, split_by_day
+from http_client import APIClient
+from parallel import find_daily_peaks_parallel
+from streaming import iter_call_records, stream_daily_peaks
 
 def split_call_by_day(call: CallRecord) -> List[CallRecord]:
-    splits = []
-    DAY_MS = 24 * 60 * 60 * 1000
-    
-    start_date = datetime.utcfromtimestamp(call.startTimestamp / 1000).date()
-    end_date = datetime.utcfromtimestamp(call.endTimestamp / 1000).date()
-    
-    # Handle midnight boundary
-    if call.endTimestamp % DAY_MS == 0:
-        end_date = datetime.utcfromtimestamp((call.endTimestamp - 1) / 1000).date()
-    
-    if start_date == end_date:
-        splits.append(call)
-        return splits
-    
-    # First day
-    end_of_first_day = int(datetime(
-        start_date.year, start_date.month, start_date.day, 23, 59, 59, 999999
-    ).timestamp() * 1000)
-    splits.append(CallRecord(
-        call.customerId, call.callId,
-        call.startTimestamp, end_of_first_day
-    ))
-    
-    # Middle days
-    current_date = start_date
-    while current_date < end_date:
-        current_date = date.fromordinal(current_date.toordinal() + 1)
-        day_start = int(datetime(
-            current_date.year, current_date.month, current_date.day
-        ).timestamp() * 1000)
-        day_end = int(datetime(
-            current_date.year, current_date.month, current_date.day, 23, 59, 59, 999999
-        ).timestamp() * 1000)
-        
-        if current_date < end_date:
-            splits.append(CallRecord(
-                call.customerId, call.callId,
-                day_start, day_end
-            ))
-    
-    # Last day
-    start_of_last_day = int(datetime(
-        end_date.year, end_date.month, end_date.day
-    ).timestamp() * 1000)
-    splits.append(CallRecord(
-        call.customerId, call.callId,
-        start_of_last_day, call.endTimestamp
-    ))
-    
-    return splits
+    _, _, starts, ends = split_by_day([call.customerId], [call.startTimestamp], [call.endTimestamp])
+    return [CallRecord(call.customerId, call.callId, start, end)
+            for start, end in zip(starts.tolist(), ends.tolist())]
 
-def find_max_concurrent_calls(calls: List[CallRecord]) -> List[ResultEntry]:
-    results = []
-    by_customer = defaultdict(list)
-    
-    # Split calls by day and group by customer
-    for call in calls:
-        if call.startTimestamp != call.endTimestamp:  # Skip zero-length calls
-            for split_call in split_call_by_day(call):
-                by_customer[split_call.customerId].append(split_call)
-    
-    # Process each customer's calls
-    for customer_id, customer_calls in by_customer.items():
-        by_date = defaultdict(list)
-        
-        # Group by date
-        for call in customer_calls:
-            call_date = datetime.utcfromtimestamp(call.startTimestamp / 1000).date()
-            by_date[call_date].append(call)
-        
-        # Process each date
-        for day_date, daily_calls in by_date.items():
-            timeline = []
-            
-            # Create timeline events
-            for call in daily_calls:
-                timeline.append(TimelineEvent(call.startTimestamp, True, call.callId))
-                timeline.append(TimelineEvent(call.endTimestamp, False, call.callId))
-            
-            timeline.sort(key=lambda x: x.time)
-            
-            current_calls = 0
-            max_calls = 0
-            max_timestamp = None
-            current_call_ids = set()
-            max_call_ids = []
-            last_start = timeline[0].time
-            
-            # Process timeline events
-            for event in timeline:
-                if event.is_start:
-                    current_call_ids.add(event.call_id)
-                    last_start = event.time
-                else:
-                    current_call_ids.remove(event.call_id)
-                
-                current_calls += event.get_value()
-                
-                if current_calls >= max_calls:
-                    if current_calls > max_calls or event.is_start:
-                        max_calls = current_calls
-                        max_timestamp = last_start
-                        max_call_ids = list(current_call_ids)
-            
-            results.append(ResultEntry(
-                customer_id,
-                day_date.isoformat(),
-                max_calls,
-                max_timestamp,
-                max_call_ids
-            ))
-    
-    # Sort results
-    results.sort(key=lambda x: (x.customerId, x.date))
-    return results
+def find_max_concurrent_calls(calls: List[CallRecord], workers: int = 1) -> List[ResultEntry]:
+    arrays = (
+        np.fromiter((call.customerId for call in calls), dtype=np.int64, count=len(calls)),
+        np.fromiter((call.startTimestamp for call in calls), dtype=np.int64, count=len(calls)),
+        np.fromiter((call.endTimestamp for call in calls), dtype=np.int64, count=len(calls))
+    )
+    # Customers are independent, so with several workers each takes a shard of them
+    peaks = find_daily_peaks_parallel(*arrays, max_workers=workers) if workers > 1 else find_daily_peaks(*arrays)
+    return peaks.to_results([call.callId for call in calls])
 
 def main():
+    parser = argparse.ArgumentParser(description="Find each customer's daily peak concurrent calls")
+    parser.add_argument("--file", help="Read call records from this JSON or call store file instead of fetching them")
+    parser.add_argument("--lateness-ms", type=int, default=None,
+                        help="Records are ordered by start time give or take this much; finished days are "
+                             "computed and freed as the stream goes (default: hold every day until the end)")
+    parser.add_argument("--page-size", type=int, default=None, help="Upload results in pages of this many")
+    args = parser.parse_args()
+    
     # Get data
     GET_URL = ""
     POST_URL = ""
     
-    response = requests.get(GET_URL)
-    data = response.json()
-    
-    # Convert to CallRecords
-    calls = [CallRecord(**call) for call in data['callRecords']]
-    
-    # Process calls
-    results = find_max_concurrent_calls(calls)
-    
-    # Prepare and send results
-    payload = {
-        'results': [vars(result) for result in results]
-    }
-    
-    response = requests.post(POST_URL, json=payload)
-    print(f"Status: {response.status_code}")
-    print(f"Response: {response.text}")
+    with APIClient() as client:
+        # Stream call records rather than loading the whole body, aggregating them per (customer, day)
+        if args.file and is_call_store(args.file):
+            results = load_calls(args.file).results()
+        elif args.file:
+            with open(args.file, "rb") as f:
+                results = list(stream_daily_peaks(iter_call_records(f), args.lateness_ms))
+        else:
+            with client.open_stream(GET_URL) as response:
+                results = list(stream_daily_peaks(iter_call_records(response.raw), args.lateness_ms))
+    
+        results.sort(key=lambda result: (result.customerId, result.date))
+    
+        # Send results
+        for response in client.post_results(POST_URL, [vars(result) for result in results], args.page_size):
+            print(f"Status: {response.status_code}")
+            print(f"Response: {response.text}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,199 @@
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+import codecs
+import json
+import numpy as np
+from concurrency import DAY_MS, ResultEntry, find_peaks, split_by_day
+
+# Keys the call record array may appear under: the API's, and the local data.json export's
+RECORD_KEYS = ("callRecords", "Call Records")
+READ_SIZE = 1 << 16
+BATCH_SIZE = 50000
+
+class _JsonReader:
+    """Pull-based reader that decodes one JSON value at a time from a file-like stream"""
+    
+    _decoder = json.JSONDecoder()
+    
+    def __init__(self, stream, read_size: int = READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            chunk = self.text_decoder.decode(b"", final=True) if isinstance(chunk, bytes) else ""
+        elif isinstance(chunk, bytes):
+            chunk = self.text_decoder.decode(chunk)
+        
+        # Drop what has been consumed so the buffer stays around one read in size
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at the end)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+    
+    def expect(self, *chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in JSON stream, found {char!r}")
+        self.pos += 1
+        return char
+    
+    def decode(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer, or cut off just after its '.', 'e' or 'E',
+                # may continue in the next read
+                cut_off = end == len(self.buffer) or (isinstance(value, (int, float))
+                                                      and self.buffer[end] in ".eE")
+                if not cut_off or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+def iter_call_records(stream, keys: Iterable[str] = RECORD_KEYS, read_size: int = READ_SIZE) -> Iterator[Dict]:
+    """
+    Yield call records one at a time from a JSON document of the form
+    {"callRecords": [{...}, ...], ...}, reading the stream incrementally so the whole
+    document is never held in memory. Other top-level values are skipped.
+    """
+    keys = set(keys)
+    reader = _JsonReader(stream, read_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    
+    while True:
+        key = reader.decode()
+        reader.expect(":")
+        
+        if key in keys:
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield reader.decode()
+                    if reader.expect(",", "]") == "]":
+                        break
+        else:
+            reader.decode()
+        
+        if reader.expect(",", "}") == "}":
+            return
+
+class DailyPeakAccumulator:
+    """
+    Collects calls per (customer, day) and computes each day's peaks once the day is finished.
+    
+    With lateness_ms set, the input is taken to be ordered by start time give or take
+    lateness_ms: a day is finished, flushed and freed once a call starts more than
+    lateness_ms after the day ends. Calls that arrive later than that for an already
+    flushed day are counted in late_segments and dropped. Without lateness_ms every
+    day is held until finish().
+    """
+    
+    def __init__(self, lateness_ms: Optional[int] = None):
+        self.lateness_ms = lateness_ms
+        self.late_segments = 0
+        self._pending = defaultdict(list)  # day -> [(customer_ids, starts, ends, call_ids)]
+        self._max_start = None
+        self._flushed_before = None  # Every day before this one has been flushed
+    
+    def add(self, customer_ids: np.ndarray, start_timestamps: np.ndarray, end_timestamps: np.ndarray,
+            call_ids: List[str]) -> List[ResultEntry]:
+        """Add a batch of calls, returning the results of any days this finishes"""
+        if len(call_ids) == 0:
+            return []
+        
+        call_index, customers, starts, ends = split_by_day(customer_ids, start_timestamps, end_timestamps)
+        days = starts // DAY_MS
+        
+        if self._flushed_before is not None:
+            late = days < self._flushed_before
+            if late.any():
+                self.late_segments += int(late.sum())
+                keep = ~late
+                call_index, customers, starts, ends, days = (
+                    call_index[keep], customers[keep], starts[keep], ends[keep], days[keep])
+        
+        # Append each day's segments as one chunk, keeping input order within the day
+        order = np.argsort(days, kind="stable")
+        boundaries = np.flatnonzero(np.diff(days[order])) + 1
+        for chunk in np.split(order, boundaries):
+            if len(chunk):
+                self._pending[int(days[chunk[0]])].append((
+                    customers[chunk], starts[chunk], ends[chunk], [call_ids[i] for i in call_index[chunk].tolist()]))
+        
+        batch_max = int(np.max(start_timestamps))
+        self._max_start = batch_max if self._max_start is None else max(self._max_start, batch_max)
+        
+        if self.lateness_ms is None:
+            return []
+        return self._flush((self._max_start - self.lateness_ms) // DAY_MS)
+    
+    def finish(self) -> List[ResultEntry]:
+        """Flush every remaining day"""
+        if not self._pending:
+            return []
+        return self._flush(max(self._pending) + 1)
+    
+    def _flush(self, before_day: int) -> List[ResultEntry]:
+        results = []
+        for day in sorted(day for day in self._pending if day < before_day):
+            chunks = self._pending.pop(day)
+            peaks = find_peaks(np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks]),
+                               np.concatenate([c[2] for c in chunks]))
+            results.extend(peaks.to_results([call_id for c in chunks for call_id in c[3]]))
+        
+        if self._flushed_before is None or before_day > self._flushed_before:
+            self._flushed_before = before_day
+        return results
+
+def stream_daily_peaks(records: Iterable[Dict], lateness_ms: Optional[int] = None,
+                       batch_size: int = BATCH_SIZE) -> Iterator[ResultEntry]:
+    """
+    Compute daily peaks from an iterable of call record dicts in one pass, yielding
+    each day's results as soon as the day is finished (see DailyPeakAccumulator).
+    Results come out day by day, so sort them by (customerId, date) if needed.
+    """
+    accumulator = DailyPeakAccumulator(lateness_ms)
+    records = iter(records)
+    
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        
+        yield from accumulator.add(
+            np.fromiter((record['customerId'] for record in batch), dtype=np.int64, count=len(batch)),
+            np.fromiter((record['startTimestamp'] for record in batch), dtype=np.int64, count=len(batch)),
+            np.fromiter((record['endTimestamp'] for record in batch), dtype=np.int64, count=len(batch)),
+            [record['callId'] for record in batch]
+        )
+    
+    yield from accumulator.finish()
+    
+    if accumulator.late_segments:
+        print(f"Warning: Dropped {accumulator.late_segments} call segments that arrived after their day was flushed")
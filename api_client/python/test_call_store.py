@@ -0,0 +1,85 @@
+import unittest
+import json
+import os
+import tempfile
+import numpy as np
+from call_store import (CallDataset, CallIdDictionary, convert_json, is_call_store, load_calls, load_results,
+                        save_calls, save_results)
+from concurrency import CallRecord
+from solution import find_max_concurrent_calls
+from test_concurrency import DATA_FILE
+
+RESULT_FILE = os.path.join(os.path.dirname(DATA_FILE), "result.json")
+
+class TestCallStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "store.bin")
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_call_id_dictionary(self):
+        uuids = ["c533d9e0-c985-4b47-85f9-86e5c21d1893", "6ba00a04-3553-493e-aa72-65b475831f12"]
+        dictionary = CallIdDictionary.from_ids(uuids)
+        self.assertIsNotNone(dictionary.uuid_bytes)
+        self.assertEqual(dictionary.to_list(), uuids)
+        
+        # Anything that would not round-trip as a UUID is stored as text
+        for call_ids in (["call1", "call-22", "café"], [uuids[0].upper()], ["g" * 8 + uuids[0][8:]], []):
+            dictionary = CallIdDictionary.from_ids(call_ids)
+            self.assertIsNone(dictionary.uuid_bytes)
+            self.assertEqual(dictionary.to_list(), call_ids)
+    
+    def test_convert_sample_data(self):
+        convert_json(DATA_FILE, self.path)
+        with open(DATA_FILE, "r") as f:
+            records = json.load(f)["Call Records"]
+        
+        self.assertTrue(is_call_store(self.path))
+        self.assertFalse(is_call_store(DATA_FILE))
+        self.assertLess(os.path.getsize(self.path), os.path.getsize(DATA_FILE) / 3)
+        
+        dataset = load_calls(self.path)
+        self.assertIsInstance(dataset.customer_ids, np.memmap)
+        self.assertEqual([vars(call) for call in dataset.to_call_records()], records)
+        self.assertEqual(dataset.results(), find_max_concurrent_calls([CallRecord(**record) for record in records]))
+    
+    def test_repeated_call_ids_are_interned(self):
+        records = [{"customerId": 1, "callId": call_id, "startTimestamp": i, "endTimestamp": i + 5}
+                   for i, call_id in enumerate(["a", "b", "a", "c", "b"])]
+        save_calls(self.path, CallDataset.from_records(records))
+        dataset = load_calls(self.path, mmap=False)
+        
+        self.assertEqual(len(dataset.call_ids.dictionary), 3)
+        self.assertEqual(dataset.call_ids.codes.tolist(), [0, 1, 0, 2, 1])
+        self.assertEqual(list(dataset.call_ids), ["a", "b", "a", "c", "b"])
+    
+    def test_results_round_trip(self):
+        convert_json(RESULT_FILE, self.path, results=True)
+        with open(RESULT_FILE, "r") as f:
+            expected = json.load(f)["results"]
+        
+        peaks, dictionary = load_results(self.path)
+        self.assertEqual([vars(result) for result in peaks.to_results(dictionary)], expected)
+    
+    def test_save_computed_results(self):
+        dataset = CallDataset.from_records(
+            {"customerId": i % 3, "callId": f"call{i}", "startTimestamp": i * 1000, "endTimestamp": i * 1000 + 2500}
+            for i in range(30))
+        peaks = dataset.find_daily_peaks()
+        save_results(self.path, peaks, dataset.call_ids)
+        
+        loaded, dictionary = load_results(self.path)
+        self.assertEqual(loaded.to_results(dictionary), dataset.results())
+    
+    def test_wrong_kind_or_file_rejected(self):
+        save_calls(self.path, CallDataset.from_records([]))
+        self.assertEqual(len(load_calls(self.path)), 0)
+        with self.assertRaises(ValueError):
+            load_results(self.path)
+        with self.assertRaises(ValueError):
+            load_calls(DATA_FILE)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import json
+import os
+import random
+from collections import defaultdict
+import numpy as np
+from concurrency import CallRecord, ResultEntry, DAY_MS, day_to_iso, find_peaks, split_by_day
+from solution import find_max_concurrent_calls, split_call_by_day
+from solution2 import find_concurrent_calls
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data.json")
+
+def reference_results(calls):
+    """Brute-force port of the Java client's findMaxConcurrentCalls, for comparison"""
+    date_events = defaultdict(list)
+    for call in calls:
+        if call.startTimestamp == call.endTimestamp:
+            continue
+        first_day, last_day = call.startTimestamp // DAY_MS, call.endTimestamp // DAY_MS
+        for day in range(first_day, last_day + 1):
+            start = call.startTimestamp if day == first_day else day * DAY_MS
+            end = call.endTimestamp if day == last_day else (day + 1) * DAY_MS
+            if start != end:
+                date_events[(call.customerId, day)].append((start, end, call.callId))
+    
+    results = []
+    for (customer_id, day), events in sorted(date_events.items()):
+        max_concurrent, max_timestamp, max_call_ids = 0, None, []
+        for timestamp, _, _ in events:
+            concurrent_calls = [call_id for start, end, call_id in events if start <= timestamp < end]
+            if len(concurrent_calls) > max_concurrent:
+                max_concurrent, max_timestamp, max_call_ids = len(concurrent_calls), timestamp, concurrent_calls
+        results.append(ResultEntry(customer_id, day_to_iso(day), max_concurrent, max_timestamp, max_call_ids))
+    return results
+
+def random_calls(count, seed, customers=5, days=3):
+    rng = random.Random(seed)
+    calls = []
+    for i in range(count):
+        # Coarse timestamps so ties between starts and ends are common
+        start = rng.randrange(0, days * DAY_MS, 60 * 60 * 1000) + rng.choice([0, 0, 1000])
+        length = rng.choice([0, 60 * 60 * 1000, 2 * 60 * 60 * 1000, DAY_MS, rng.randrange(1, 2 * DAY_MS)])
+        calls.append(CallRecord(rng.randrange(customers), f"call{i}", start, start + length))
+    return calls
+
+class TestFindPeaks(unittest.TestCase):
+    def peaks(self, calls):
+        return find_max_concurrent_calls(calls)
+    
+    def test_single_call(self):
+        results = self.peaks([CallRecord(1, "call1", 1000, 2000)])
+        self.assertEqual(results, [ResultEntry(1, "1970-01-01", 1, 1000, ["call1"])])
+    
+    def test_back_to_back_calls(self):
+        """Test that a call ending when another starts is not concurrent with it"""
+        results = self.peaks([CallRecord(1, "call1", 100, 200), CallRecord(1, "call2", 200, 300)])
+        self.assertEqual(results, [ResultEntry(1, "1970-01-01", 1, 100, ["call1"])])
+    
+    def test_millisecond_precision(self):
+        """Test that ties go to the first call in input order that starts at the peak"""
+        results = self.peaks([
+            CallRecord(1, "call1", 1000, 2000),
+            CallRecord(1, "call2", 2000, 3000),
+            CallRecord(1, "call3", 1999, 3000),
+        ])
+        self.assertEqual(results, [ResultEntry(1, "1970-01-01", 2, 2000, ["call2", "call3"])])
+    
+    def test_different_max_periods(self):
+        results = self.peaks([
+            CallRecord(123, "call1", 1000, 3000),
+            CallRecord(123, "call2", 1000, 3000),
+            CallRecord(123, "call3", 4000, 6000),
+            CallRecord(123, "call4", 4000, 6000),
+        ])
+        self.assertEqual(results, [ResultEntry(123, "1970-01-01", 2, 1000, ["call1", "call2"])])
+    
+    def test_zero_length_call(self):
+        results = self.peaks([
+            CallRecord(123, "call1", 1000, 1000),
+            CallRecord(123, "call2", 1000, 2000),
+            CallRecord(123, "call3", 1500, 2500),
+        ])
+        self.assertEqual(results, [ResultEntry(123, "1970-01-01", 2, 1500, ["call2", "call3"])])
+    
+    def test_multiple_customers_and_days(self):
+        results = self.peaks([
+            CallRecord(2, "call3", 1500, 2500),
+            CallRecord(1, "call1", 1000, 3000),
+            CallRecord(2, "call4", 2000, 3000),
+            CallRecord(1, "call2", DAY_MS + 1000, DAY_MS + 2000),
+        ])
+        self.assertEqual([(r.customerId, r.date, r.maxConcurrentCalls) for r in results],
+                         [(1, "1970-01-01", 1), (1, "1970-01-02", 1), (2, "1970-01-01", 2)])
+    
+    def test_empty(self):
+        self.assertEqual(self.peaks([]), [])
+        self.assertEqual(len(find_peaks(np.array([1]), np.array([5]), np.array([5]))), 0)
+    
+    def test_unsplit_calls_rejected(self):
+        with self.assertRaises(ValueError):
+            find_peaks(np.array([1]), np.array([DAY_MS - 1]), np.array([DAY_MS + 1]))
+    
+    def test_matches_reference_on_random_calls(self):
+        """Test against the brute-force reference, with many tied endpoints and multi-day calls"""
+        for seed in range(20):
+            calls = random_calls(300, seed)
+            self.assertEqual(self.peaks(calls), reference_results(calls))
+    
+    def test_solutions_match_reference_on_sample_data(self):
+        with open(DATA_FILE, "r") as f:
+            records = json.load(f)["Call Records"]
+        calls = [CallRecord(**record) for record in records]
+        expected = reference_results(calls)
+        
+        self.assertEqual(find_concurrent_calls(records), [vars(result) for result in expected])
+        self.assertEqual(find_max_concurrent_calls(calls), expected)
+
+class TestSplitByDay(unittest.TestCase):
+    def test_single_day_calls_are_untouched(self):
+        call_index, customers, starts, ends = split_by_day([1, 2], [1000, 5000], [2000, DAY_MS])
+        self.assertEqual(call_index.tolist(), [0, 1])
+        self.assertEqual(starts.tolist(), [1000, 5000])
+        self.assertEqual(ends.tolist(), [2000, DAY_MS])
+    
+    def test_multi_day_calls(self):
+        """Test clipping at UTC midnight, including across a month end"""
+        jan_31 = 19753 * DAY_MS  # 2024-01-31
+        call_index, customers, starts, ends = split_by_day(
+            [7, 8, 9], [jan_31 + 3600000, 0, 500], [jan_31 + 2 * DAY_MS + 60000, 0, 2 * DAY_MS])
+        
+        self.assertEqual(call_index.tolist(), [0, 0, 0, 2, 2])
+        self.assertEqual(customers.tolist(), [7, 7, 7, 9, 9])
+        self.assertEqual(starts.tolist(), [jan_31 + 3600000, jan_31 + DAY_MS, jan_31 + 2 * DAY_MS, 500, DAY_MS])
+        self.assertEqual(ends.tolist(), [jan_31 + DAY_MS, jan_31 + 2 * DAY_MS, jan_31 + 2 * DAY_MS + 60000,
+                                         DAY_MS, 2 * DAY_MS])
+        self.assertEqual(day_to_iso((jan_31 + DAY_MS) // DAY_MS), "2024-02-01")
+    
+    def test_split_call_by_day(self):
+        call = CallRecord(123, "multiDayCall", DAY_MS - 3600000, 2 * DAY_MS + 3600000)
+        self.assertEqual(split_call_by_day(call), [
+            CallRecord(123, "multiDayCall", DAY_MS - 3600000, DAY_MS),
+            CallRecord(123, "multiDayCall", DAY_MS, 2 * DAY_MS),
+            CallRecord(123, "multiDayCall", 2 * DAY_MS, 2 * DAY_MS + 3600000),
+        ])
+
+if __name__ == "__main__":
+    unittest.main()
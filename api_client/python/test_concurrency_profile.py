@@ -0,0 +1,100 @@
+import unittest
+import random
+import numpy as np
+from concurrency import DAY_MS, find_daily_peaks
+from concurrency_profile import ConcurrencyProfile
+from test_concurrency import random_calls
+
+def brute_force_levels(calls, customer_id, start, end):
+    """Concurrency of one customer at every millisecond in [start, end)"""
+    levels = np.zeros(end - start, dtype=np.int64)
+    for customer, call_start, call_end in calls:
+        if customer == customer_id:
+            levels[max(call_start, start) - start:max(min(call_end, end), start) - start] += 1
+    return levels
+
+def small_calls(count, seed, customers=3, span=300):
+    rng = random.Random(seed)
+    calls = []
+    for _ in range(count):
+        start = rng.randrange(span)
+        calls.append((rng.randrange(customers) * 10, start, start + rng.choice([0, 1, 5, 20, rng.randrange(1, 80)])))
+    return calls
+
+def profile_of(calls):
+    return ConcurrencyProfile(*(np.array(column) for column in zip(*calls)))
+
+class TestConcurrencyProfile(unittest.TestCase):
+    def test_step_function(self):
+        profile = profile_of([(1, 100, 200), (1, 150, 300), (1, 200, 250), (2, 50, 60), (2, 70, 70)])
+        
+        self.assertEqual(profile.customer_ids.tolist(), [1, 2])
+        self.assertEqual(profile.level_at(150).tolist(), [2, 0])
+        self.assertEqual(profile.level_at(200).tolist(), [2, 0])
+        self.assertEqual(profile.level_at(55).tolist(), [0, 1])
+        self.assertEqual(profile.level_at([299, 60]).tolist(), [1, 0])
+        self.assertEqual(profile.level_at(-5).tolist(), [0, 0])
+    
+    def test_queries_match_brute_force(self):
+        for seed in range(10):
+            calls = small_calls(40, seed)
+            profile = profile_of(calls)
+            boundaries = np.array([-10, 0, 7, 50, 51, 120, 333, 400])
+            window_peaks = profile.window_peaks(boundaries)
+            
+            for row, customer_id in enumerate(profile.customer_ids.tolist()):
+                levels = brute_force_levels(calls, customer_id, -10, 400)
+                at = lambda t: t + 10
+                
+                peaks = [levels[at(a):at(b)].max() for a, b in zip(boundaries[:-1], boundaries[1:])]
+                self.assertEqual(window_peaks[row].tolist(), peaks)
+                
+                # Default window is the customer's active span
+                first, last = profile.first_times[row], profile.last_times[row]
+                span = levels[at(first):at(last)]
+                self.assertEqual(profile.time_above(1)[row], (span > 1).sum())
+                self.assertAlmostEqual(profile.mean()[row], span.mean())
+                for q in (0, 50, 95, 100):
+                    self.assertEqual(profile.percentile(q)[row], np.sort(span)[max(int(np.ceil(q / 100 * len(span))) - 1, 0)])
+                
+                # Explicit window, reaching outside the customer's calls
+                window = levels[at(20):at(250)]
+                self.assertEqual(profile.time_above(0, 20, 250)[row], (window > 0).sum())
+                self.assertAlmostEqual(profile.mean(20, 250)[row], window.mean())
+                self.assertEqual(profile.percentile(95, 20, 250)[row],
+                                 np.sort(window)[int(np.ceil(0.95 * len(window))) - 1])
+    
+    def test_bucket_peaks_match_daily_peaks(self):
+        calls = random_calls(500, 4, customers=4, days=5)
+        customers = np.array([call.customerId for call in calls])
+        starts = np.array([call.startTimestamp for call in calls])
+        ends = np.array([call.endTimestamp for call in calls])
+        
+        profile = ConcurrencyProfile(customers, starts, ends)
+        bucket_starts, peaks = profile.bucket_peaks(DAY_MS)
+        daily = find_daily_peaks(customers, starts, ends)
+        
+        self.assertEqual(bucket_starts[0] % DAY_MS, 0)
+        row_of = {customer_id: row for row, customer_id in enumerate(profile.customer_ids.tolist())}
+        expected = np.zeros_like(peaks)
+        for customer_id, day, max_concurrent in zip(daily.customer_ids.tolist(), daily.days.tolist(),
+                                                    daily.max_concurrent.tolist()):
+            expected[row_of[customer_id], day - bucket_starts[0] // DAY_MS] = max_concurrent
+        np.testing.assert_array_equal(peaks, expected)
+    
+    def test_quarter_hour_buckets(self):
+        quarter = 15 * 60 * 1000
+        profile = profile_of([(1, 0, quarter + 1), (1, quarter, 2 * quarter), (1, 3 * quarter + 5, 3 * quarter + 6)])
+        bucket_starts, peaks = profile.bucket_peaks(quarter)
+        
+        self.assertEqual(bucket_starts.tolist(), [0, quarter, 2 * quarter, 3 * quarter])
+        self.assertEqual(peaks.tolist(), [[1, 2, 0, 1]])
+    
+    def test_empty(self):
+        profile = profile_of([(1, 5, 5)])
+        self.assertEqual(len(profile), 0)
+        self.assertEqual(profile.window_peaks([0, 10]).shape, (0, 1))
+        self.assertEqual(len(profile.percentile(95)), 0)
+
+if __name__ == "__main__":
+    unittest.main()
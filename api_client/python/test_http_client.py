@@ -0,0 +1,169 @@
+import unittest
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http_client import APIClient, APIError, gzip_chunks, iter_results_body
+from solution2 import fetch_data, post_results
+
+CALL_RECORDS = [{"customerId": 1, "callId": f"call{i}", "startTimestamp": i, "endTimestamp": i + 10} for i in range(50)]
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Stand-in for the dataset and result endpoints, with switches for failure modes"""
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, *args):
+        pass
+    
+    def send_body(self, status, body, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+                if size == 0:
+                    return body
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+    
+    def do_GET(self):
+        server = self.server
+        server.clients.add(self.client_address)
+        if self.path.startswith("/flaky") and server.failures > 0:
+            server.failures -= 1
+            self.send_body(503, b"busy", [("Retry-After", "0")])
+            return
+        if self.path.startswith("/missing"):
+            self.send_body(404, b"no such dataset")
+            return
+        
+        body = json.dumps({"callRecords": CALL_RECORDS}).encode("utf-8")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            self.send_body(200, gzip.compress(body), [("Content-Encoding", "gzip")])
+        else:
+            self.send_body(200, body)
+    
+    def do_POST(self):
+        server = self.server
+        body = self.read_body()
+        if self.headers.get("Content-Encoding") == "gzip":
+            if server.reject_gzip:
+                self.send_body(415, b"gzip not supported")
+                return
+            body = gzip.decompress(body)
+        server.uploads.append((self.headers.get("Transfer-Encoding"), json.loads(body)))
+        if server.slow > 0:
+            # Accept the upload but answer after the client has given up
+            server.slow -= 1
+            time.sleep(0.5)
+            try:
+                self.send_body(200, b"ok")
+            except ConnectionError:
+                pass
+            return
+        self.send_body(200, b"ok")
+
+class TestAPIClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.server.clients, self.server.uploads = set(), []
+        self.server.failures, self.server.reject_gzip, self.server.slow = 0, False, 0
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = APIClient(backoff=0)
+    
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_get_reuses_connection(self):
+        for _ in range(3):
+            self.assertEqual(fetch_data(f"{self.url}/dataset", self.client), CALL_RECORDS)
+        self.assertEqual(len(self.server.clients), 1)
+    
+    def test_retries_then_succeeds(self):
+        self.server.failures = 2
+        self.assertEqual(fetch_data(f"{self.url}/flaky", self.client), CALL_RECORDS)
+        self.assertEqual(self.client.retries, 2)
+    
+    def test_retries_are_bounded(self):
+        self.server.failures = 10
+        client = APIClient(max_retries=2, backoff=0)
+        with self.assertRaises(APIError) as raised:
+            client.get_json(f"{self.url}/flaky")
+        self.assertEqual(raised.exception.response.status_code, 503)
+        self.assertEqual(client.retries, 2)
+        self.assertEqual(self.server.failures, 7)
+    
+    def test_client_errors_are_not_retried(self):
+        with self.assertRaises(APIError):
+            self.client.get_json(f"{self.url}/missing")
+        self.assertEqual(self.client.retries, 0)
+    
+    def test_connection_errors_are_bounded(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client = APIClient(max_retries=1, backoff=0, timeout=1)
+        with self.assertRaises(APIError):
+            client.get_json(f"{self.url}/dataset")
+        self.assertEqual(client.retries, 1)
+    
+    def test_post_read_timeout_is_not_resent(self):
+        self.server.slow = 1
+        client = APIClient(backoff=0, timeout=(1.0, 0.1))
+        with self.assertRaises(APIError):
+            client.post_results(f"{self.url}/result", [{"customerId": 1}])
+        client.close()
+        
+        self.assertEqual(client.retries, 0)
+        self.assertEqual([upload for _, upload in self.server.uploads], [{"results": [{"customerId": 1}]}])
+    
+    def test_post_gzip_results(self):
+        results = [{"customerId": i, "date": "2024-01-01", "callIds": [f"c{i}"]} for i in range(25)]
+        response = post_results(f"{self.url}/result", results, self.client)
+        
+        self.assertEqual(response.text, "ok")
+        self.assertEqual(self.server.uploads, [(None, {"results": results})])
+    
+    def test_paged_and_chunked_upload(self):
+        results = [{"customerId": i} for i in range(25)]
+        responses = self.client.post_results(f"{self.url}/result", results, page_size=10, chunked=True)
+        
+        self.assertEqual(len(responses), 3)
+        self.assertEqual([encoding for encoding, _ in self.server.uploads], ["chunked"] * 3)
+        self.assertEqual([upload["results"] for _, upload in self.server.uploads],
+                         [results[:10], results[10:20], results[20:]])
+    
+    def test_falls_back_to_plain_bodies(self):
+        self.server.reject_gzip = True
+        self.client.post_results(f"{self.url}/result", [{"customerId": 1}])
+        self.client.post_results(f"{self.url}/result", [{"customerId": 2}])
+        
+        self.assertFalse(self.client.compress)
+        self.assertEqual([upload for _, upload in self.server.uploads],
+                         [{"results": [{"customerId": 1}]}, {"results": [{"customerId": 2}]}])
+
+class TestEncoding(unittest.TestCase):
+    def test_results_body_batches(self):
+        results = [{"customerId": i, "callIds": ["a", "é"]} for i in range(7)]
+        for batch_size in (1, 3, 100):
+            body = b"".join(iter_results_body(results, batch_size))
+            self.assertEqual(json.loads(body), {"results": results})
+        self.assertEqual(json.loads(b"".join(iter_results_body([]))), {"results": []})
+    
+    def test_gzip_chunks(self):
+        chunks = [b"abc" * 1000, b"", b"xyz"]
+        self.assertEqual(gzip.decompress(b"".join(gzip_chunks(chunks))), b"".join(chunks))
+
+if __name__ == "__main__":
+    unittest.main()
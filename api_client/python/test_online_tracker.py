@@ -0,0 +1,101 @@
+import unittest
+import random
+from concurrency import CallRecord, ResultEntry, DAY_MS
+from online_tracker import OnlineConcurrencyTracker
+from solution import find_max_concurrent_calls
+from test_concurrency import random_calls
+
+def call_events(calls):
+    """Start and end events of the calls in time order, ends first at the same millisecond"""
+    events = [(call.startTimestamp, 1, i, call) for i, call in enumerate(calls)]
+    events += [(call.endTimestamp, 0, i, call) for i, call in enumerate(calls)]
+    return sorted(events, key=lambda event: event[:3])
+
+def feed(tracker, events):
+    results = []
+    for timestamp, kind, _, call in events:
+        if kind:
+            results.extend(tracker.start(call.customerId, call.callId, timestamp))
+        else:
+            results.extend(tracker.end(call.customerId, call.callId, timestamp))
+    return results
+
+def by_key(results):
+    return sorted(results, key=lambda result: (result.customerId, result.date))
+
+class TestOnlineConcurrencyTracker(unittest.TestCase):
+    def test_in_order_events_match_batch(self):
+        for seed in range(10):
+            calls = sorted(random_calls(300, seed), key=lambda call: call.startTimestamp)
+            tracker = OnlineConcurrencyTracker()
+            results = feed(tracker, call_events(calls)) + tracker.finish()
+            self.assertEqual(by_key(results), find_max_concurrent_calls(calls))
+    
+    def test_out_of_order_events_within_lateness(self):
+        lateness = 3 * 60 * 60 * 1000
+        for seed in range(10):
+            calls = sorted(random_calls(300, seed, days=4), key=lambda call: call.startTimestamp)
+            rng = random.Random(seed)
+            events = sorted(call_events(calls), key=lambda event: event[0] + rng.randrange(lateness))
+            
+            tracker = OnlineConcurrencyTracker(lateness_ms=lateness)
+            results = feed(tracker, events) + tracker.finish()
+            
+            expected = find_max_concurrent_calls(calls)
+            self.assertEqual(tracker.late_events, 0)
+            self.assertEqual([(r.customerId, r.date, r.maxConcurrentCalls, r.timestamp, sorted(r.callIds))
+                              for r in by_key(results)],
+                             [(r.customerId, r.date, r.maxConcurrentCalls, r.timestamp, sorted(r.callIds))
+                              for r in expected])
+    
+    def test_days_close_as_the_stream_advances(self):
+        tracker = OnlineConcurrencyTracker(lateness_ms=1000)
+        self.assertEqual(tracker.start(1, "a", 1000), [])
+        self.assertEqual(tracker.start(1, "b", 1500), [])
+        self.assertEqual(tracker.end(1, "a", 3000), [])
+        self.assertEqual(tracker.current_concurrency(1), 2)
+        
+        self.assertEqual(tracker.advance(DAY_MS + 1001), [ResultEntry(1, "1970-01-01", 2, 1500, ["a", "b"])])
+        self.assertEqual(tracker.current_concurrency(1), 1)
+        self.assertEqual(tracker.daily_peak(1), ResultEntry(1, "1970-01-02", 1, DAY_MS, ["b"]))
+        
+        self.assertEqual(tracker.end(1, "b", DAY_MS + 5000), [])
+        self.assertEqual(tracker.finish(), [ResultEntry(1, "1970-01-02", 1, DAY_MS, ["b"])])
+    
+    def test_late_events_are_dropped(self):
+        tracker = OnlineConcurrencyTracker(lateness_ms=100)
+        tracker.start(1, "a", 1000)
+        tracker.start(1, "b", 2000)
+        tracker.start(1, "late", 1500)
+        results = tracker.add_call(CallRecord(2, "c", 2500, 2600)) + tracker.finish()
+        
+        self.assertEqual(tracker.late_events, 1)
+        self.assertEqual(results, [ResultEntry(1, "1970-01-01", 2, 2000, ["a", "b"]),
+                                   ResultEntry(2, "1970-01-01", 1, 2500, ["c"])])
+    
+    def test_zero_length_and_midnight_calls(self):
+        tracker = OnlineConcurrencyTracker()
+        results = tracker.add_call(CallRecord(1, "zero", 500, 500))
+        results += tracker.add_call(CallRecord(1, "to-midnight", 600, DAY_MS))
+        results += tracker.add_call(CallRecord(1, "next-day", DAY_MS, DAY_MS + 10))
+        results += tracker.finish()
+        
+        self.assertEqual(results, [ResultEntry(1, "1970-01-01", 1, 600, ["to-midnight"]),
+                                   ResultEntry(1, "1970-01-02", 1, DAY_MS, ["next-day"])])
+        self.assertEqual(tracker.invalid_events, 0)
+
+    def test_ends_without_starts_are_forgotten(self):
+        tracker = OnlineConcurrencyTracker()
+        tracker.start(1, "a", 1000)
+        tracker.start(2, "x", 500)  # Late, so dropped
+        # Customer 2's end of the dropped call must not cancel customer 1's call with the same ID
+        tracker.end(2, "x", 2000)
+        tracker.start(1, "x", 2000)
+        results = tracker.advance(DAY_MS + 1)
+        
+        self.assertEqual(results, [ResultEntry(1, "1970-01-01", 2, 2000, ["a", "x"])])
+        self.assertEqual((tracker.late_events, tracker.invalid_events), (1, 1))
+        self.assertEqual(tracker._ended_early, {})
+
+if __name__ == "__main__":
+    unittest.main()
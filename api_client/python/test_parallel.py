@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+import numpy as np
+import parallel
+from concurrency import find_daily_peaks
+from parallel import find_daily_peaks_parallel, merge_peaks, partition_by_customer
+from solution import find_max_concurrent_calls
+from test_concurrency import random_calls
+
+def call_arrays(calls):
+    return (np.array([call.customerId for call in calls]), np.array([call.startTimestamp for call in calls]),
+            np.array([call.endTimestamp for call in calls]))
+
+class TestParallelPeaks(unittest.TestCase):
+    def assertSamePeaks(self, actual, expected):
+        for name in ("customer_ids", "days", "max_concurrent", "timestamps", "call_offsets", "call_indices"):
+            np.testing.assert_array_equal(getattr(actual, name), getattr(expected, name), err_msg=name)
+    
+    def test_partition_keeps_customers_together(self):
+        customer_ids = np.array([5, 1, 5, 9, 1, 1, 2, 5])
+        shards = partition_by_customer(customer_ids, 3)
+        
+        self.assertEqual(sorted(np.concatenate(shards).tolist()), list(range(len(customer_ids))))
+        for indices in shards:
+            self.assertTrue((np.diff(indices) > 0).all())
+            for other in shards:
+                if other is not indices:
+                    self.assertFalse(set(customer_ids[indices].tolist()) & set(customer_ids[other].tolist()))
+    
+    def test_merge_matches_serial(self):
+        """Test merging per-shard results for various shard counts, including empty shards"""
+        for seed in range(5):
+            arrays = call_arrays(random_calls(500, seed, customers=7))
+            expected = find_daily_peaks(*arrays)
+            for num_shards in (1, 2, 3, 16):
+                shard_indices = partition_by_customer(arrays[0], num_shards)
+                shard_peaks = [find_daily_peaks(*(array[indices] for array in arrays)) for indices in shard_indices]
+                self.assertSamePeaks(merge_peaks(shard_peaks, shard_indices), expected)
+    
+    def test_process_pool_matches_serial(self):
+        calls = random_calls(2000, 3, customers=20)
+        with mock.patch.object(parallel, "MIN_PARALLEL_CALLS", 0):
+            self.assertSamePeaks(find_daily_peaks_parallel(*call_arrays(calls), max_workers=2, num_shards=4),
+                                 find_daily_peaks(*call_arrays(calls)))
+            self.assertEqual(find_max_concurrent_calls(calls, workers=2), find_max_concurrent_calls(calls))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import io
+import json
+from concurrency import CallRecord, DAY_MS
+from solution import find_max_concurrent_calls
+from streaming import DailyPeakAccumulator, _JsonReader, iter_call_records, stream_daily_peaks
+from test_concurrency import DATA_FILE, random_calls
+
+def record_dicts(calls):
+    return [vars(call) for call in calls]
+
+def sorted_results(results):
+    return sorted(results, key=lambda result: (result.customerId, result.date))
+
+class TestIterCallRecords(unittest.TestCase):
+    def test_matches_json_load_with_tiny_reads(self):
+        """Test that records split across many small reads decode the same as json.load"""
+        with open(DATA_FILE, "rb") as f:
+            expected = json.load(f)["Call Records"]
+            f.seek(0)
+            records = list(iter_call_records(f, read_size=7))
+        self.assertEqual(records, expected)
+    
+    def test_skips_other_values(self):
+        document = json.dumps({
+            "meta": {"nested": [1, 2, {"callRecords": "no"}]},
+            "count": 12345,
+            "callRecords": [{"customerId": 1, "callId": "café", "startTimestamp": 10, "endTimestamp": 12345678}],
+            "trailer": 9876543210,
+        }).encode("utf-8")
+        for read_size in (1, 3, 1000):
+            records = list(iter_call_records(io.BytesIO(document), read_size=read_size))
+            self.assertEqual(records, [{"customerId": 1, "callId": "café", "startTimestamp": 10,
+                                        "endTimestamp": 12345678}])
+    
+    def test_numbers_split_across_reads(self):
+        """Test that floats and exponents cut off after '.', 'e' or 'E' are read in full"""
+        record = {"customerId": 1, "callId": "a", "startTimestamp": 10, "endTimestamp": 20}
+        for number, cut in (("12.75", "12."), ("1e3", "1e"), ("1.5E-2", "1.5E"), ("-2.5e+4", "-2.5e")):
+            document = f'{{"total": {number}, "callRecords": [{json.dumps(record)}]}}'.encode("utf-8")
+            # The first read ends just after the cut, as does every read at read_size=1
+            for read_size in (document.index(cut.encode()) + len(cut), 1):
+                records = list(iter_call_records(io.BytesIO(document), read_size=read_size))
+                self.assertEqual(records, [record])
+        
+        reader = _JsonReader(io.StringIO("[1.5E-2, 12.75]"), read_size=1)
+        reader.expect("[")
+        self.assertEqual(reader.decode(), 1.5E-2)
+        reader.expect(",")
+        self.assertEqual(reader.decode(), 12.75)
+    
+    def test_empty_and_text_streams(self):
+        self.assertEqual(list(iter_call_records(io.StringIO('{"callRecords": []}'))), [])
+        self.assertEqual(list(iter_call_records(io.StringIO("{}"))), [])
+    
+    def test_truncated_stream_raises(self):
+        with self.assertRaises(ValueError):
+            list(iter_call_records(io.BytesIO(b'{"callRecords": [{"customerId": 1'), read_size=4))
+
+class TestStreamDailyPeaks(unittest.TestCase):
+    def test_matches_batch_results(self):
+        for seed in range(5):
+            calls = random_calls(400, seed)
+            streamed = list(stream_daily_peaks(record_dicts(calls), batch_size=37))
+            self.assertEqual(sorted_results(streamed), find_max_concurrent_calls(calls))
+    
+    def test_lateness_window_flushes_early(self):
+        """Test that time-ordered input flushes days as it goes and still matches"""
+        calls = sorted(random_calls(600, 1, days=6), key=lambda call: call.startTimestamp)
+        expected = find_max_concurrent_calls(calls)
+        
+        accumulator = DailyPeakAccumulator(lateness_ms=60 * 60 * 1000)
+        flushed_early = []
+        for i in range(0, len(calls), 50):
+            batch = calls[i:i + 50]
+            flushed_early.extend(accumulator.add(
+                [call.customerId for call in batch], [call.startTimestamp for call in batch],
+                [call.endTimestamp for call in batch], [call.callId for call in batch]))
+        results = flushed_early + accumulator.finish()
+        
+        self.assertGreater(len(flushed_early), 0)
+        self.assertEqual(sorted_results(results), expected)
+        self.assertEqual(accumulator.late_segments, 0)
+    
+    def test_late_calls_are_dropped(self):
+        calls = [
+            CallRecord(1, "day0", 1000, 2000),
+            CallRecord(1, "day2", 2 * DAY_MS + 1000, 2 * DAY_MS + 2000),
+            CallRecord(1, "late", 3000, 4000),
+        ]
+        accumulator = DailyPeakAccumulator(lateness_ms=1000)
+        results = []
+        for call in calls:
+            results.extend(accumulator.add([call.customerId], [call.startTimestamp], [call.endTimestamp], [call.callId]))
+        results.extend(accumulator.finish())
+        
+        self.assertEqual([(result.date, result.callIds) for result in results],
+                         [("1970-01-01", ["day0"]), ("1970-01-03", ["day2"])])
+        self.assertEqual(accumulator.late_segments, 1)
+    
+    def test_sample_data_from_file(self):
+        with open(DATA_FILE, "rb") as f:
+            calls = [CallRecord(**record) for record in json.load(f)["Call Records"]]
+            f.seek(0)
+            streamed = list(stream_daily_peaks(iter_call_records(f, read_size=1024), batch_size=100))
+        self.assertEqual(sorted_results(streamed), find_max_concurrent_calls(calls))
+
+if __name__ == "__main__":
+    unittest.main()
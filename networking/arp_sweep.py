@@ -0,0 +1,275 @@
+"""
+ARP Sweep and MAC Vendor Lookup
+
+Discovers the devices on the local segment by sending ARP requests in rate-limited
+batches from one layer 2 socket, collecting replies between batches. Hosts that stay
+silent get the request again (up to retries times), and each round ends as soon as
+replies stop arriving instead of always waiting out a fixed timeout.
+
+Vendors come from a local OUI file (IEEE oui.txt, Wireshark manuf, nmap-mac-prefixes or
+arp-scan's ieee-oui.txt), loaded into sorted integer arrays so each lookup is a binary
+search. Set OUI_FILE to use a file outside the usual locations.
+"""
+import bisect
+import os
+import re
+import select
+import socket
+import struct
+import time
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from scapy.all import conf, get_if_addr, get_if_hwaddr
+
+OUI_FILES = [
+    '/usr/share/ieee-data/oui.txt',
+    '/usr/share/arp-scan/ieee-oui.txt',
+    '/usr/share/wireshark/manuf',
+    '/usr/share/nmap/nmap-mac-prefixes',
+]
+
+# 00-00-0C   (hex)		Cisco Systems, Inc      (IEEE oui.txt)
+IEEE_LINE = re.compile(r'^([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})\s+\(hex\)\s+(.+)$')
+# 00000C	Cisco Systems, Inc                      (nmap, arp-scan)
+HEX_LINE = re.compile(r'^([0-9A-Fa-f]{6})\s+(.+)$')
+# 00:1B:C5:00:00:00/36	Converging	Converging Systems Inc.   (Wireshark manuf)
+MANUF_LINE = re.compile(r'^((?:[0-9A-Fa-f]{2}[:-]){2,5}[0-9A-Fa-f]{2})(?:/(\d+))?\t+([^\t]+)(?:\t+(.+))?$')
+
+ARP_REQUEST, ARP_REPLY = 1, 2
+BROADCAST = b'\xff' * 6
+
+def mac_to_int(mac: str) -> int:
+    """48-bit integer of a MAC address in colon, dash or dot notation"""
+    return int(re.sub(r'[^0-9A-Fa-f]', '', mac), 16)
+
+class OuiIndex:
+    """MAC address prefix -> vendor name, as sorted integer arrays searched with bisect"""
+    
+    def __init__(self):
+        self.vendors: List[str] = []
+        self._vendor_ids: Dict[str, int] = {}
+        self._entries: Dict[int, Dict[int, int]] = {}  # prefix bits -> {prefix: vendor id}, until build()
+        self._tables: List[Tuple[int, array, array]] = []  # (bits, sorted prefixes, vendor ids), longest first
+    
+    def __len__(self):
+        return sum(len(prefixes) for _, prefixes, _ in self._tables)
+    
+    @classmethod
+    def load(cls, path):
+        """Index every prefix in an OUI file"""
+        index = cls()
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.readlines()
+        # IEEE's file also lists street addresses, where a postcode could pass for a prefix
+        ieee = any('(hex)' in line for line in lines)
+        for line in lines:
+            if not ieee or '(hex)' in line:
+                index.add_line(line)
+        index.build()
+        return index
+    
+    @classmethod
+    def find(cls, path=None):
+        """Load the given OUI file, else $OUI_FILE or the first system one found; None if there is none"""
+        candidates = [path] if path else [os.environ.get('OUI_FILE')] + OUI_FILES
+        for candidate in candidates:
+            if candidate and os.path.exists(candidate):
+                return cls.load(candidate)
+        return None
+    
+    def add(self, prefix: int, bits: int, vendor: str):
+        """Add a prefix of the given length in bits; the first vendor seen for a prefix wins"""
+        vendor_id = self._vendor_ids.get(vendor)
+        if vendor_id is None:
+            vendor_id = self._vendor_ids[vendor] = len(self.vendors)
+            self.vendors.append(vendor)
+        self._entries.setdefault(bits, {}).setdefault(prefix, vendor_id)
+    
+    def add_line(self, line: str):
+        """Add the prefix on one line of any supported OUI file format"""
+        line = line.strip()
+        if not line or line.startswith('#') or '(base 16)' in line:
+            return
+        match = IEEE_LINE.match(line)
+        if match:
+            self.add(int(''.join(match.group(1, 2, 3)), 16), 24, match.group(4).strip())
+            return
+        match = MANUF_LINE.match(line)
+        if match:
+            digits = re.sub(r'[:-]', '', match.group(1))
+            bits = int(match.group(2) or len(digits) * 4)
+            vendor = (match.group(4) or match.group(3)).strip()
+            self.add(int(digits, 16) >> (len(digits) * 4 - bits), bits, vendor)
+            return
+        match = HEX_LINE.match(line)
+        if match:
+            self.add(int(match.group(1), 16), 24, match.group(2).strip())
+    
+    def build(self):
+        """Sort the prefixes added since the last build into the lookup arrays"""
+        for bits, prefixes, vendor_ids in self._tables:
+            # Prefixes already indexed were added first, so they keep their vendor
+            self._entries.setdefault(bits, {}).update(zip(prefixes, vendor_ids))
+        
+        self._tables = []
+        for bits in sorted(self._entries, reverse=True):
+            entries = self._entries[bits]
+            prefixes = sorted(entries)
+            self._tables.append((bits, array('Q', prefixes), array('I', (entries[prefix] for prefix in prefixes))))
+        self._entries = {}
+    
+    def lookup(self, mac) -> Optional[str]:
+        """Vendor of a MAC address (string or integer), preferring the longest matching prefix"""
+        value = mac_to_int(mac) if isinstance(mac, str) else mac
+        for bits, prefixes, vendor_ids in self._tables:
+            key = value >> (48 - bits)
+            i = bisect.bisect_left(prefixes, key)
+            if i < len(prefixes) and prefixes[i] == key:
+                return self.vendors[vendor_ids[i]]
+        return None
+
+def build_arp_request(src_mac: bytes, src_ip: str, target_ip: str) -> bytes:
+    """A broadcast Ethernet frame carrying an ARP who-has request"""
+    return (BROADCAST + src_mac + b'\x08\x06' +
+            struct.pack('!HHBBH', 1, 0x0800, 6, 4, ARP_REQUEST) +
+            src_mac + socket.inet_aton(src_ip) + b'\x00' * 6 + socket.inet_aton(target_ip))
+
+def parse_arp_reply(frame: bytes) -> Optional[Tuple[str, str]]:
+    """(sender IP, sender MAC) of an ARP reply frame, or None for anything else"""
+    if len(frame) < 42 or frame[12:14] != b'\x08\x06' or struct.unpack('!H', frame[20:22])[0] != ARP_REPLY:
+        return None
+    mac = ':'.join(f'{b:02x}' for b in frame[22:28])
+    return socket.inet_ntoa(frame[28:32]), mac
+
+class ScapyArpTransport:
+    """Sends and receives raw ARP frames on one interface through a scapy layer 2 socket"""
+    
+    def __init__(self, iface=None, target=None):
+        if iface is None:
+            # The interface the kernel would route the target network through
+            iface = conf.route.route(target)[0] if target else conf.iface
+        self.iface = iface
+        self.src_mac = bytes.fromhex(get_if_hwaddr(iface).replace(':', ''))
+        self.src_ip = get_if_addr(iface)
+        self.sock = conf.L2socket(iface=iface)
+    
+    def send(self, ip):
+        self.sock.send(build_arp_request(self.src_mac, self.src_ip, ip))
+    
+    def receive(self, timeout) -> List[Tuple[str, str]]:
+        """ARP replies that arrive within timeout seconds, returned as soon as there are any"""
+        replies = []
+        wait = max(timeout, 0)
+        while select.select([self.sock], [], [], wait)[0]:
+            _, frame, _ = self.sock.recv_raw()
+            reply = parse_arp_reply(frame) if frame else None
+            if reply:
+                replies.append(reply)
+            wait = 0
+        return replies
+    
+    def close(self):
+        self.sock.close()
+
+class ArpSweeper:
+    """Sends ARP requests in rate-limited batches, retransmitting to hosts that stay silent"""
+    
+    def __init__(self, iface=None, rate=500, batch_size=64, retries=2, quiet_time=0.5, max_wait=3.0,
+                 transport=None, metrics=None):
+        """
+        rate is requests per second, sent batch_size at a time. After each round, replies
+        are awaited until quiet_time passes without one (at most max_wait), then silent
+        hosts are asked again, up to retries more times. metrics (a ScanMetrics) counts
+        requests as layer l2.
+        """
+        self.iface = iface
+        self.rate = rate
+        self.batch_size = batch_size
+        self.retries = retries
+        self.quiet_time = quiet_time
+        self.max_wait = max_wait
+        self.transport = transport
+        self.metrics = metrics
+    
+    def sweep(self, ips: Iterable[str], on_reply: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        """ARP every IP (consumed lazily) and return {ip: mac}, calling on_reply(ip, mac) as each answers"""
+        ips = iter(ips)
+        first = next(ips, None)
+        if first is None:
+            return {}
+        transport = self.transport or ScapyArpTransport(self.iface, first)
+        found: Dict[str, str] = {}
+        asked = set()
+        try:
+            pending = _chain(first, ips)
+            for _ in range(self.retries + 1):
+                sent = self._send_round(transport, pending, asked, found, on_reply)
+                self._wait_quiet(transport, sent, asked, found, on_reply)
+                pending = [ip for ip in sent if ip not in found]
+                if not pending:
+                    break
+        finally:
+            if transport is not self.transport:
+                transport.close()
+        if self.metrics is not None and len(asked) > len(found):
+            self.metrics.record_outcome('l2', 'timeout', count=len(asked) - len(found))
+        return found
+    
+    def _send_round(self, transport, ips, asked, found, on_reply):
+        """Send one request per IP, a batch at a time at the configured rate, collecting replies in between"""
+        sent = []
+        interval = 1.0 / self.rate
+        started = time.monotonic()
+        batch = []
+        for ip in ips:
+            if ip in found:
+                continue
+            batch.append(ip)
+            if len(batch) == self.batch_size:
+                self._send_batch(transport, batch, sent, asked)
+                batch = []
+                # Wait for the next batch's turn while taking in replies
+                while time.monotonic() < started + len(sent) * interval:
+                    self._collect(transport, started + len(sent) * interval - time.monotonic(), asked, found, on_reply)
+        if batch:
+            self._send_batch(transport, batch, sent, asked)
+        return sent
+    
+    def _send_batch(self, transport, batch, sent, asked):
+        for ip in batch:
+            asked.add(ip)
+            transport.send(ip)
+            sent.append(ip)
+        if self.metrics is not None:
+            self.metrics.record_sent('l2', len(batch))
+    
+    def _wait_quiet(self, transport, sent, asked, found, on_reply):
+        """Collect replies until none arrive for quiet_time, everyone answered, or max_wait passes"""
+        remaining = sum(ip not in found for ip in sent)
+        now = time.monotonic()
+        deadline = now + self.max_wait
+        last_reply = now
+        while remaining > 0 and now < deadline and now - last_reply < self.quiet_time:
+            new = self._collect(transport, min(deadline, last_reply + self.quiet_time) - now, asked, found, on_reply)
+            if new:
+                remaining -= new
+                last_reply = time.monotonic()
+            now = time.monotonic()
+    
+    def _collect(self, transport, timeout, asked, found, on_reply):
+        """Record replies from asked IPs arriving within timeout; returns how many hosts were new"""
+        new = 0
+        for ip, mac in transport.receive(timeout):
+            # Ignore unrelated ARP traffic on the segment
+            if ip in asked and ip not in found:
+                found[ip] = mac
+                new += 1
+                if self.metrics is not None:
+                    self.metrics.record_outcome('l2', 'reply')
+                if on_reply is not None:
+                    on_reply(ip, mac)
+        return new
+
+def _chain(first, rest):
+    yield first
+    yield from rest
@@ -15,19 +15,40 @@ To run the scanner, ensure you have the necessary dependencies in your environme
 2. Run the script using sudo within the `networking` folder:
     `sudo $(which python) -m comprehensive_network_scanner`
 """
-import socket
 import subprocess
+import platform
+import asyncio
 import ipaddress
-import requests
 import dns.resolver
 import concurrent.futures
+import functools
 import time
-from scapy.all import ARP, Ether, srp
+from port_scanner import AsyncPortScanner
+from icmp_sweep import IcmpSweeper
+from pipeline import ScanPipeline
+from service_fingerprint import ConnectionPool, ServiceFingerprinter
+from arp_sweep import ArpSweeper, OuiIndex
+from shard_scan import ShardCoordinator, ShardOptions, shard_count
+from scan_metrics import JsonLinesExporter, PrometheusTextExporter, ScanMetrics
+from report_writers import JsonLinesWriter, records, result_record
+
+DEFAULT_PORTS = [21, 22, 23, 25, 53, 80, 443, 445, 3306, 3389, 8080]
+MAX_BODY_BYTES = 16384  # Enough for the <head> of a typical page
+
+def timed_phase(name):
+    """Record a scan method's wall time as a phase in the scanner's metrics"""
+    def decorate(method):
+        @functools.wraps(method)
+        def run(self, *args, **kwargs):
+            with self.metrics.phase(name):
+                return method(self, *args, **kwargs)
+        return run
+    return decorate
 
 class NetworkScanner:
     """A comprehensive network scanner that analyzes multiple networking layers."""
     
-    def __init__(self, target_network):
+    def __init__(self, target_network, oui_file=None, metrics=None):
         """Initialize scanner with target network in CIDR notation (e.g., '192.168.1.0/24')"""
         self.target_network = target_network
         self.network = ipaddress.ip_network(target_network)
@@ -37,92 +58,281 @@ class NetworkScanner:
             'l4': {},  # Open ports
             'l7': {}   # Service identification
         }
+        self.metrics = metrics or ScanMetrics()  # Probe counts, RTTs, queue depths and phase times
+        self.writers = []  # Report writers that get a record for each result as it is found
+        self.oui = OuiIndex.find(oui_file)  # MAC prefix -> vendor; None without an OUI file
+        if self.oui is None:
+            print("[-] No OUI file found; MAC vendors will be unknown. Set OUI_FILE or pass oui_file")
+    
+    def stream_to(self, writer):
+        """Write a flat record to writer (see report_writers) for every result found from now on"""
+        self.writers.append(writer)
+    
+    def _emit(self, layer, ip, port=None):
+        """Stream the result just stored in self.results for (layer, ip, port) to the report writers"""
+        if self.writers:
+            self._write_records([result_record(self.results, layer, ip, port)])
+    
+    def _write_records(self, records):
+        for record in records:
+            for writer in self.writers:
+                writer.write(record)
     
-    def scan_l2(self):
+    @timed_phase('l2')
+    def scan_l2(self, on_device=None, rate=500, retries=2, quiet_time=0.5, max_wait=3.0):
         """Scan Layer 2 (Data Link) - ARP scan to discover devices"""
         print(f"[+] Scanning Layer 2 (Data Link) on {self.target_network}")
         
-        arp_request = ARP(pdst=self.target_network)
-        broadcast = Ether(dst="ff:ff:ff:ff:ff:ff")
-        packet = broadcast/arp_request
+        def record(ip, mac):
+            self.results['l2'][ip] = {
+                'mac_address': mac,
+                'vendor': self._get_vendor(mac)
+            }
+            self._emit('l2', ip)
+            if on_device is not None:
+                on_device(ip, mac)
         
         try:
-            result = srp(packet, timeout=3, verbose=0)[0]
-            
-            for sent, received in result:
-                self.results['l2'][received.psrc] = {
-                    'mac_address': received.hwsrc,
-                    'vendor': self._get_vendor(received.hwsrc)
-                }
+            # Batched requests with retransmits; the sweep ends once replies stop coming in
+            sweeper = ArpSweeper(rate=rate, retries=retries, quiet_time=quiet_time, max_wait=max_wait,
+                                 metrics=self.metrics)
+            sweeper.sweep((str(ip) for ip in self.network.hosts()), record)
             
             print(f"[+] Layer 2 scan complete. Found {len(self.results['l2'])} devices")
         except Exception as e:
             print(f"[-] Layer 2 scan error: {e}")
     
-    def scan_l3(self):
+    @timed_phase('l3')
+    def scan_l3(self, rate=1000, timeout=1.0, retries=1):
         """Scan Layer 3 (Network) - ICMP ping to check connectivity"""
         print(f"[+] Scanning Layer 3 (Network) on {self.target_network}")
         
+        # Generated as the sweep goes; the sweep opens its socket before taking the first one
+        ip_list = (str(ip) for ip in self.network.hosts())
+        alive = None
+        if self.network.version == 4:
+            try:
+                # One ICMP socket for the whole range, paced at rate echo requests per second
+                sweeper = IcmpSweeper(rate=rate, timeout=timeout, retries=retries, metrics=self.metrics)
+                alive = sweeper.sweep(ip_list)
+            except PermissionError as e:
+                print(f"[-] {e}. Falling back to the ping command")
+        
+        if alive is None:
+            self._ping_sweep(ip_list)
+        else:
+            for ip, rtt in alive.items():
+                if ip not in self.results['l3']:
+                    self.results['l3'][ip] = {'status': 'active', 'rtt_ms': round(rtt * 1000, 2)}
+                    self._emit('l3', ip)
+        
+        print(f"[+] Layer 3 scan complete. Found {len(self.results['l3'])} active hosts")
+    
+    def _ping_sweep(self, ip_list):
+        """Ping each host with the system ping command (no ICMP socket available)"""
         with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
-            ip_list = [str(ip) for ip in self.network.hosts()]
             future_to_ip = {executor.submit(self._ping_host, ip): ip for ip in ip_list}
+            self.metrics.record_sent('l3', len(future_to_ip))
             
             for future in concurrent.futures.as_completed(future_to_ip):
                 ip = future_to_ip[future]
                 try:
                     is_alive = future.result()
+                    self.metrics.record_outcome('l3', 'alive' if is_alive else 'timeout')
                     if is_alive:
                         if ip not in self.results['l3']:
                             self.results['l3'][ip] = {'status': 'active'}
+                            self._emit('l3', ip)
                 except Exception as e:
+                    self.metrics.record_outcome('l3', 'error')
                     print(f"[-] Error pinging {ip}: {e}")
-        
-        print(f"[+] Layer 3 scan complete. Found {len(self.results['l3'])} active hosts")
     
-    def scan_l4(self, ports=None):
+    @timed_phase('l4')
+    def scan_l4(self, ports=None, concurrency=1000, per_host_concurrency=64, per_host_rate=None, timeout=1.0,
+                hosts=None):
         """Scan Layer 4 (Transport) - TCP port scan"""
         if ports is None:
-            ports = [21, 22, 23, 25, 53, 80, 443, 445, 3306, 3389, 8080]
+            ports = DEFAULT_PORTS
         
         print(f"[+] Scanning Layer 4 (Transport) for common ports: {ports}")
         
-        active_ips = list(self.results['l3'].keys())
+        active_ips = list(self.results['l3'].keys()) if hosts is None else list(hosts)
         if not active_ips:
             print("[-] No active hosts found at Layer 3. Run scan_l3() first.")
             return
         
+        # Every (host, port) connect shares one event loop; timeouts adapt to each host's RTT
+        engine = AsyncPortScanner(concurrency=concurrency, per_host_concurrency=per_host_concurrency,
+                                  per_host_rate=per_host_rate, initial_timeout=timeout, metrics=self.metrics)
         for ip in active_ips:
-            self.results['l4'][ip] = {'open_ports': {}}
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
-                future_to_port = {executor.submit(self._check_port, ip, port): port for port in ports}
-                
-                for future in concurrent.futures.as_completed(future_to_port):
-                    port = future_to_port[future]
-                    try:
-                        is_open = future.result()
-                        if is_open:
-                            self.results['l4'][ip]['open_ports'][port] = True
-                    except Exception as e:
-                        print(f"[-] Error checking {ip}:{port}: {e}")
+            # Start each host's timeout from its ping, so a slow host is not judged by the network
+            rtt_ms = self.results['l3'].get(ip, {}).get('rtt_ms')
+            if rtt_ms is not None:
+                engine.seed_rtt(ip, rtt_ms / 1000)
+        try:
+            open_ports = engine.run(active_ips, ports)
+        except Exception as e:
+            print(f"[-] Error scanning ports: {e}")
+            open_ports = {}
+        
+        for ip in active_ips:
+            self.results['l4'][ip] = {'open_ports': {port: True for port in open_ports.get(ip, [])}}
+            for port in open_ports.get(ip, []):
+                self._emit('l4', ip, port)
         
         total_open = sum(len(host_data['open_ports']) for host_data in self.results['l4'].values())
         print(f"[+] Layer 4 scan complete. Found {total_open} open ports across all hosts")
     
-    def scan_l7(self):
+    @timed_phase('l7')
+    def scan_l7(self, concurrency=100, timeout=3.0, hosts=None):
         """Scan Layer 7 (Application) - Basic service identification"""
         print(f"[+] Scanning Layer 7 (Application) services")
         
-        for ip in self.results['l4']:
+        targets = []
+        for ip in (self.results['l4'] if hosts is None else hosts):
             self.results['l7'][ip] = {'services': {}}
+            targets.extend((ip, port) for port in self.results['l4'][ip]['open_ports'])
             
-            for port in self.results['l4'][ip]['open_ports']:
-                service = self._identify_service(ip, port)
-                if service:
-                    self.results['l7'][ip]['services'][port] = service
+        def record(ip, port, service):
+            if service:
+                self.results['l7'][ip]['services'][port] = service
+                self._emit('l7', ip, port)
+                details = service['type'] if isinstance(service, dict) else service
+                print(f"[+] {ip}:{port} identified as {details}")
+        
+        # Every probe shares one event loop and connection pool; results are recorded as they finish
+        fingerprinter = ServiceFingerprinter(concurrency=concurrency, timeout=timeout, metrics=self.metrics)
+        asyncio.run(fingerprinter.identify_all(targets, record))
         
         print(f"[+] Layer 7 scan complete")
     
+    @timed_phase('pipeline')
+    def scan_pipeline(self, ports=None, use_arp=False, ping=True, rate=1000, timeout=1.0,
+                      concurrency=1000, per_host_concurrency=64, per_host_rate=None,
+                      l7_concurrency=32, queue_size=256):
+        """Scan Layers 3, 4 and 7 as one pipeline, probing each host as soon as it is found"""
+        if ports is None:
+            ports = DEFAULT_PORTS
+        
+        print(f"[+] Scanning {self.target_network} as a pipeline (L3 -> L4 -> L7) for ports: {ports}")
+        
+        engine = AsyncPortScanner(concurrency=concurrency, per_host_concurrency=per_host_concurrency,
+                                  per_host_rate=per_host_rate, initial_timeout=timeout, metrics=self.metrics)
+        # Without ping, every address is probed (for networks that drop ICMP)
+        sweeper = IcmpSweeper(rate=rate, timeout=timeout, metrics=self.metrics) if ping else None
+        fingerprinter = ServiceFingerprinter(concurrency=l7_concurrency, metrics=self.metrics)
+        pipeline = ScanPipeline(self.results, fingerprinter.identify, ports, engine, sweeper,
+                                l7_concurrency=l7_concurrency, queue_size=queue_size, metrics=self.metrics,
+                                on_result=self._emit)
+        
+        async def arp_source():
+            # The ARP sweep blocks, so it runs on a thread next to the ICMP sweep, handing each
+            # device to the pipeline as it answers (and waiting while the pipeline is full)
+            loop = asyncio.get_running_loop()
+            
+            def on_device(ip, mac):
+                asyncio.run_coroutine_threadsafe(pipeline.add_host(ip), loop).result()
+            
+            await loop.run_in_executor(None, self.scan_l2, on_device)
+        
+        async def run():
+            fingerprinter.pool = ConnectionPool(max_connections=l7_concurrency)
+            try:
+                await pipeline.run(hosts, [arp_source()] if use_arp else [])
+            finally:
+                fingerprinter.pool.close()
+        
+        hosts = (str(ip) for ip in self.network.hosts())
+        try:
+            asyncio.run(run())
+        except PermissionError as e:
+            print(f"[-] {e}. Run with sudo, or pass ping=False to probe every address")
+            return
+        
+        total_open = sum(len(host_data['open_ports']) for host_data in self.results['l4'].values())
+        print(f"[+] Pipeline scan complete in {pipeline.elapsed:.1f}s. "
+              f"Found {len(self.results['l4'])} hosts and {total_open} open ports")
+        if pipeline.first_open_port is not None:
+            print(f"[+] First open port found after {pipeline.first_open_port:.2f}s")
+    
+    @timed_phase('sharded')
+    def scan_sharded(self, ports=None, workers=None, shard_prefix=None, rate=1000, ping=True, timeout=1.0,
+                     concurrency=1000, per_host_concurrency=64, per_host_rate=None, l7_concurrency=32):
+        """Scan a large network as subnet shards in worker processes, under one rate limit shared by all"""
+        if ports is None:
+            ports = DEFAULT_PORTS
+        
+        options = ShardOptions(list(ports), ping=ping, timeout=timeout, concurrency=concurrency,
+                               per_host_concurrency=per_host_concurrency, per_host_rate=per_host_rate,
+                               l7_concurrency=l7_concurrency)
+        coordinator = ShardCoordinator(options, workers=workers, shard_prefix=shard_prefix, rate=rate,
+                                       metrics=self.metrics)
+        total = shard_count(self.network, coordinator.prefix_for(self.network))
+        print(f"[+] Scanning {self.target_network} as {total} shards on {coordinator.workers} workers "
+              f"at up to {rate} probes per second for ports: {ports}")
+        
+        done = 0
+        started = time.time()
+        
+        def report(shard):
+            nonlocal done
+            done += 1
+            open_ports = sum(len(data['open_ports']) for data in shard.results['l4'].values())
+            print(f"[+] Shard {shard.shard} done in {shard.elapsed:.1f}s ({done}/{total}): "
+                  f"{len(shard.results['l4'])} hosts, {open_ports} open ports")
+            if self.writers:
+                self._write_records(records(shard.results))
+        
+        try:
+            coordinator.run(self.network, self.results, report)
+        except PermissionError as e:
+            print(f"[-] {e}. Run with sudo, or pass ping=False to probe every address")
+            return
+        
+        total_open = sum(len(host_data['open_ports']) for host_data in self.results['l4'].values())
+        print(f"[+] Sharded scan complete in {time.time() - started:.1f}s. "
+              f"Found {len(self.results['l4'])} hosts and {total_open} open ports")
+        if coordinator.failed:
+            print(f"[-] {len(coordinator.failed)} shards failed: {', '.join(coordinator.failed)}")
+    
+    @timed_phase('incremental')
+    def scan_incremental(self, store, ports=None, max_age=24 * 3600, use_arp=False):
+        """Rescan only new, changed or stale hosts, reusing stored results for the rest, and report the changes"""
+        started = time.time()
+        if ports is None:
+            ports = DEFAULT_PORTS
+        
+        if use_arp:
+            self.scan_l2()
+        self.scan_l3()
+        alive = {ip: None for ip in self.results['l3']}
+        alive.update((ip, data['mac_address']) for ip, data in self.results['l2'].items())
+        if not alive:
+            print("[-] No live hosts found; leaving the stored scan untouched")
+            return []
+        
+        plan = store.plan_rescan(self.target_network, alive, max_age, now=started)
+        print(f"[+] Incremental scan: {len(plan.changed)} new or changed and {len(plan.stale)} stale hosts "
+              f"to rescan, {len(plan.cached)} up to date")
+        
+        # Changed hosts go first so their differences show up soonest
+        if plan.reprobe:
+            self.scan_l4(ports, hosts=plan.reprobe)
+            self.scan_l7(hosts=plan.reprobe)
+        for ip, cached in plan.cached.items():
+            self.results['l4'][ip] = {'open_ports': cached['open_ports']}
+            self.results['l7'][ip] = {'services': cached['services']}
+            for port in cached['open_ports']:
+                self._emit('l4', ip, port)
+            for port in cached['services']:
+                self._emit('l7', ip, port)
+        
+        changes = store.record_scan(self.target_network, self.results, plan.reprobe, ports, started)
+        for change in changes:
+            print(f"[+] Change: {change}")
+        print(f"[+] Incremental scan complete. {len(changes)} changes since the last scan")
+        return changes
+    
     def run_dns_check(self, domain):
         """Check DNS resolution for a domain (Layer 7)"""
         print(f"[+] Checking DNS resolution for {domain}")
@@ -144,6 +354,7 @@ class NetworkScanner:
                         self.results['l3'][ip]['hostnames'] = []
                     
                     self.results['l3'][ip]['hostnames'].append(domain)
+                    self._emit('l3', ip)
             
             print(f"[+] DNS resolution for {domain}: {', '.join(results)}")
             return results
@@ -152,30 +363,42 @@ class NetworkScanner:
             return []
     
     def http_check(self, ip, port=80, use_ssl=False):
-        """Check HTTP service (Layer 7)"""
+        """Check HTTP service (Layer 7), returning what was learned about it"""
         protocol = "https" if use_ssl else "http"
         url = f"{protocol}://{ip}:{port}"
+        # Same ranged GET and title parsing as the Layer 7 scan, stopping once the title is in
+        fingerprinter = ServiceFingerprinter(concurrency=1, timeout=3, max_body_bytes=MAX_BODY_BYTES)
+        
+        async def check():
+            try:
+                return await fingerprinter.check_http(ip, port, use_ssl)
+            finally:
+                fingerprinter.pool.close()
         
         try:
-            response = requests.get(url, timeout=3, verify=False)
-            server = response.headers.get('Server', 'Unknown')
+            service = asyncio.run(check())
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            print(f"[-] HTTP check error for {url}: {str(e) or type(e).__name__}")
+            return None
+        if not isinstance(service, dict):
+            print(f"[-] HTTP check for {url}: not an HTTP response")
+            return None
             
-            if ip in self.results['l7'] and 'services' in self.results['l7'][ip]:
-                self.results['l7'][ip]['services'][port] = {
-                    'type': f"{protocol.upper()}",
-                    'status_code': response.status_code,
-                    'server': server,
-                    'title': self._extract_title(response.text)
-                }
+        if ip in self.results['l7'] and 'services' in self.results['l7'][ip]:
+            self.results['l7'][ip]['services'][port] = service
+            self._emit('l7', ip, port)
             
-            print(f"[+] HTTP check for {url}: {response.status_code} ({server})")
-            return response
-        except requests.exceptions.RequestException as e:
-            print(f"[-] HTTP check error for {url}: {e}")
-            return None
+        print(f"[+] HTTP check for {url}: {service['status_code']} ({service['server']})")
+        return service
     
-    def generate_report(self):
-        """Generate a comprehensive network report"""
+    def generate_report(self, writer=None):
+        """Generate a comprehensive network report, or write every result to a report writer as flat records"""
+        if writer is not None:
+            writer.write_all(records(self.results))
+            writer.flush()
+            print(f"[+] Wrote {writer.count} records to {writer.name}")
+            return
+        
         print("\n===== NETWORK SCAN REPORT =====")
         print(f"Target Network: {self.target_network}")
         print(f"Scan Time: {time.strftime('%Y-%m-%d %H:%M:%S')}")
@@ -195,6 +418,8 @@ class NetworkScanner:
         if self.results['l3']:
             for ip, data in self.results['l3'].items():
                 host_info = f"IP: {ip} | Status: {data['status']}"
+                if 'rtt_ms' in data:
+                    host_info += f" | RTT: {data['rtt_ms']} ms"
                 if 'hostnames' in data:
                     host_info += f" | Hostnames: {', '.join(data['hostnames'])}"
                 print(host_info)
@@ -237,7 +462,7 @@ class NetworkScanner:
         """Helper method to ping a host"""
         try:
             # Adjust command based on operating system
-            param = '-n' if subprocess.call('which ping', shell=True, stdout=subprocess.PIPE) else '-c'
+            param = '-n' if platform.system() == 'Windows' else '-c'
             command = ['ping', param, '1', '-W', '1', ip]
             
             return subprocess.call(
@@ -248,70 +473,24 @@ class NetworkScanner:
         except:
             return False
     
-    def _check_port(self, ip, port):
-        """Helper method to check if a port is open"""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1)
-        result = sock.connect_ex((ip, port))
-        sock.close()
-        return result == 0
-    
-    def _identify_service(self, ip, port):
-        """Basic service identification based on common ports"""
-        common_ports = {
-            21: 'FTP',
-            22: 'SSH',
-            23: 'Telnet',
-            25: 'SMTP',
-            53: 'DNS',
-            80: 'HTTP',
-            443: 'HTTPS',
-            445: 'SMB',
-            3306: 'MySQL',
-            3389: 'RDP',
-            8080: 'HTTP-Proxy'
-        }
-        
-        if port in common_ports:
-            # For HTTP/HTTPS, try to get more details
-            if port in [80, 8080]:
-                try:
-                    self.http_check(ip, port)
-                    return self.results['l7'][ip]['services'].get(port, common_ports[port])
-                except:
-                    pass
-            elif port == 443:
-                try:
-                    self.http_check(ip, port, use_ssl=True)
-                    return self.results['l7'][ip]['services'].get(port, common_ports[port])
-                except:
-                    pass
-                    
-            return common_ports[port]
-        else:
-            return "Unknown"
-    
     def _get_vendor(self, mac):
-        """Get vendor from MAC address (simplified)"""
-        # In a real implementation, this would use a MAC vendor database
-        return "Unknown Vendor"
-    
-    def _extract_title(self, html_content):
-        """Extract title from HTML content"""
-        try:
-            start = html_content.find('<title>')
-            end = html_content.find('</title>')
-            if start != -1 and end != -1:
-                return html_content[start+7:end].strip()
-        except:
-            pass
-        return "No title"
+        """Get vendor from MAC address using the local OUI database"""
+        if self.oui is None:
+            return "Unknown Vendor"
+        return self.oui.lookup(mac) or "Unknown Vendor"
 
 # Example usage
 if __name__ == "__main__":
     # Create scanner for local network
     scanner = NetworkScanner('192.168.4.0/24')
     
+    # Write scan metrics every 5 seconds while the scan runs
+    scanner.metrics.start_exporting([JsonLinesExporter('scan_metrics.jsonl'),
+                                     PrometheusTextExporter('network_scanner.prom')])
+    # Stream each result as a JSON line as soon as it is found
+    results_writer = JsonLinesWriter('scan_results.jsonl')
+    scanner.stream_to(results_writer)
+    
     # Run scans
     scanner.scan_l2()  # Data Link layer scan (ARP)
     scanner.scan_l3()  # Network layer scan (ICMP)
@@ -321,5 +500,8 @@ if __name__ == "__main__":
     # Additional application layer checks
     scanner.run_dns_check('example.com')
     
+    scanner.metrics.stop_exporting()
+    results_writer.close()
+    
     # Generate report
     scanner.generate_report()
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+ICMP Echo Sweep
+
+Pings a whole range of IPv4 hosts from a single ICMP socket instead of starting a `ping`
+process per host. Echo requests go out at a fixed rate while one loop collects the
+replies, matching each one to its probe by source address, identifier and sequence
+number, so a sweep takes about len(hosts) / rate + timeout seconds however many hosts
+there are.
+
+A raw socket needs root (or CAP_NET_RAW). Without it, Linux and macOS allow unprivileged
+datagram ICMP sockets when enabled (Linux: net.ipv4.ping_group_range), and the kernel may
+choose the identifier. Linux strips the IP header from what a datagram socket receives,
+but macOS leaves it in, so a reply starting with an IPv4 header has it removed whatever
+the socket type. If neither socket can be opened, open_icmp_socket raises PermissionError
+so the caller can fall back to `ping`.
+"""
+import asyncio
+import errno
+import os
+import socket
+import struct
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+PAYLOAD = b"showcase-sweep!!"
+
+def checksum(data: bytes) -> int:
+    """Internet checksum (RFC 1071)"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def build_echo_request(identifier: int, sequence: int, payload: bytes = PAYLOAD) -> bytes:
+    """An ICMP echo request packet"""
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum(header + payload), identifier, sequence)
+    return header + payload
+
+def parse_echo_reply(data: bytes, raw: bool) -> Optional[Tuple[int, int]]:
+    """(identifier, sequence) of an echo reply, or None for any other ICMP message"""
+    if data and (raw or data[0] >> 4 == 4):
+        # Raw sockets, and macOS datagram sockets, receive the IP header too. No ICMP type
+        # starts with the nibble 4, so a header-less message is never mistaken for one
+        data = data[(data[0] & 0x0f) * 4:]
+    if len(data) < 8:
+        return None
+    icmp_type, _, _, identifier, sequence = struct.unpack("!BBHHH", data[:8])
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return identifier, sequence
+
+def open_icmp_socket() -> Tuple[socket.socket, bool]:
+    """An ICMP socket and whether it is raw; PermissionError if neither kind is allowed"""
+    errors = []
+    for sock_type in (socket.SOCK_RAW, socket.SOCK_DGRAM):
+        try:
+            sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+        except OSError as e:
+            errors.append(e.strerror or str(e))
+            continue
+        return sock, sock_type == socket.SOCK_RAW
+    raise PermissionError(f"Cannot open an ICMP socket: {'; '.join(errors)}")
+
+class IcmpSweeper:
+    """Sends ICMP echo requests to many hosts from one socket at a fixed rate"""
+    
+    def __init__(self, rate=1000, timeout=1.0, retries=1, rate_limiter=None, metrics=None):
+        """
+        rate is echo requests per second; hosts silent for timeout seconds are retried up to
+        retries times. rate_limiter, if given, is awaited (acquire()) before every request too,
+        so several sweepers can share one rate. metrics (a ScanMetrics) counts them as layer l3.
+        """
+        self.rate = rate
+        self.timeout = timeout
+        self.retries = retries
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self.identifier = os.getpid() & 0xffff
+        self._sequence = 0
+    
+    def sweep(self, hosts: Iterable[str]) -> Dict[str, float]:
+        """Ping every host and return {host: round-trip seconds} for the hosts that answered"""
+        return asyncio.run(self.sweep_async(hosts))
+    
+    async def sweep_async(self, hosts: Iterable[str],
+                          on_alive: Optional[Callable[[str, float], Awaitable[None]]] = None) -> Dict[str, float]:
+        """
+        Ping every host (consuming hosts lazily) and return {host: round-trip seconds} for the
+        hosts that answered. on_alive is awaited with (host, rtt) as each host answers; no
+        further requests go out while it waits, so a slow consumer holds back the sweep.
+        """
+        loop = asyncio.get_running_loop()
+        sock, raw = open_icmp_socket()
+        try:
+            sock.setblocking(False)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            except OSError:
+                pass
+            # Datagram sockets get their identifier from the kernel (the socket's local port)
+            identifier = self.identifier if raw else None
+            
+            alive: Dict[str, float] = {}
+            answered = deque()  # Hosts that answered and have not been passed to on_alive yet
+            wakeup = asyncio.Event()
+            current = _Round()
+            
+            def on_readable():
+                if self._receive(loop, sock, raw, identifier, current, alive, answered):
+                    wakeup.set()
+            
+            loop.add_reader(sock.fileno(), on_readable)
+            try:
+                pending = hosts
+                for _ in range(self.retries + 1):
+                    current = _Round()
+                    await self._round(loop, sock, identifier, pending, current, alive, answered, wakeup, on_alive)
+                    pending = [host for host in current.sent if host not in alive]
+                    if not pending:
+                        break
+            finally:
+                loop.remove_reader(sock.fileno())
+            return alive
+        finally:
+            sock.close()
+    
+    async def _round(self, loop, sock, identifier, hosts, current, alive, answered, wakeup, on_alive):
+        """Send one echo request to each host, collecting replies until timeout after the last send"""
+        interval = 1.0 / self.rate
+        started = loop.time()
+        for host in hosts:
+            if host in current.sent:
+                continue
+            await _drain(answered, alive, on_alive)
+            
+            # Request n is due at started + n * interval; sleeping only when ahead of that
+            # schedule sends short bursts at high rates instead of a timer per packet
+            delay = started + len(current.sent) * interval - loop.time()
+            if delay > 0.001:
+                await asyncio.sleep(delay)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            
+            sequence = self._sequence = (self._sequence + 1) & 0xffff
+            packet = build_echo_request(identifier or 0, sequence)
+            sent_at = await _send(sock, packet, host)
+            if sent_at is not None:
+                current.sent[host] = (sequence, sent_at)
+            if self.metrics is not None:
+                self.metrics.record_sent('l3')
+                if sent_at is None:
+                    self.metrics.record_outcome('l3', 'error')
+        
+        deadline = loop.time() + self.timeout
+        while current.answered < len(current.sent):
+            wakeup.clear()
+            await _drain(answered, alive, on_alive)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        await _drain(answered, alive, on_alive)
+        if self.metrics is not None and current.answered < len(current.sent):
+            self.metrics.record_outcome('l3', 'timeout', count=len(current.sent) - current.answered)
+    
+    def _receive(self, loop, sock, raw, identifier, current, alive, answered):
+        """Record every echo reply waiting on the socket, returning how many hosts answered"""
+        count = 0
+        while True:
+            try:
+                data, (host, _) = sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return count
+            received = loop.time()
+            reply = parse_echo_reply(data, raw)
+            if reply is None or host not in current.sent or host in alive:
+                continue
+            reply_identifier, sequence = reply
+            expected_sequence, sent_at = current.sent[host]
+            if sequence == expected_sequence and (identifier is None or reply_identifier == identifier):
+                alive[host] = received - sent_at
+                if self.metrics is not None:
+                    self.metrics.record_outcome('l3', 'alive', alive[host])
+                answered.append(host)
+                current.answered += 1
+                count += 1
+
+@dataclass
+class _Round:
+    """Echo requests of one pass over the hosts"""
+    sent: Dict[str, Tuple[int, float]] = field(default_factory=dict)  # host -> (sequence, send time)
+    answered: int = 0
+
+async def _send(sock, packet, host):
+    """Send one echo request, returning the send time, or None if the host cannot be reached"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            sock.sendto(packet, (host, 0))
+            return loop.time()
+        except BlockingIOError:
+            pass  # Send buffer full
+        except OSError as e:
+            if e.errno != errno.ENOBUFS:
+                # Unroutable or not allowed (e.g. a broadcast address)
+                return None
+        await asyncio.sleep(0.001)
+
+async def _drain(answered, alive, on_alive):
+    """Pass hosts that answered to on_alive"""
+    while answered:
+        host = answered.popleft()
+        if on_alive is not None:
+            await on_alive(host, alive[host])
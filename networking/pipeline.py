@@ -0,0 +1,151 @@
+"""
+Pipelined Layer Scanning
+
+Runs the Layer 3, 4 and 7 stages of a scan at the same time instead of one after another:
+a host is queued for port probing as soon as it answers a ping (or ARP), and an open port
+is queued for service identification as soon as it is found. The stages are joined by
+bounded queues, so a slow stage holds back the one feeding it instead of letting work pile
+up, and each stage runs its own number of workers.
+"""
+import asyncio
+from port_scanner import OPEN
+
+_DONE = None  # Tells a stage worker there is no more work
+
+class ScanPipeline:
+    """Streams hosts through ICMP discovery, TCP port probing and service identification"""
+    
+    def __init__(self, results, identify_service, ports, port_scanner, sweeper=None,
+                 l7_concurrency=32, queue_size=256, metrics=None, on_result=None):
+        """
+        results is a scanner's {'l3', 'l4', 'l7'} dict, filled in as results arrive, and
+        identify_service(ip, port) the Layer 7 probe coroutine, run by l7_concurrency workers.
+        Layer 4 runs port_scanner.concurrency workers. Without a sweeper, every host is
+        probed as if it had answered a ping. metrics (a ScanMetrics) watches the depth of the
+        queues into Layer 4 and Layer 7 and counts the probes that fail with an error.
+        on_result(layer, ip, port) is called after each live host ('l3', port None), open port
+        ('l4') or identified service ('l7') is stored in results.
+        """
+        self.results = results
+        self.identify_service = identify_service
+        self.ports = list(ports)
+        self.port_scanner = port_scanner
+        self.sweeper = sweeper
+        self.l7_concurrency = l7_concurrency
+        self.queue_size = queue_size
+        self.metrics = metrics
+        self.on_result = on_result
+        
+        self.first_open_port = None  # Seconds from the start until the first open port
+        self.elapsed = None
+        self._queued = set()
+        self._probes = None
+        self._services = None
+    
+    async def add_host(self, ip):
+        """Queue every port of a live host for probing, waiting while the queue is full"""
+        if ip in self._queued:
+            return
+        self._queued.add(ip)
+        self.results['l4'].setdefault(ip, {'open_ports': {}})
+        for port in self.ports:
+            await self._probes.put((ip, port))
+    
+    async def run(self, hosts, sources=()):
+        """
+        Scan hosts (any iterable, consumed lazily) through every stage. sources are extra
+        discovery coroutines, such as an ARP sweep, that report hosts through add_host.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self._probes = asyncio.Queue(self.queue_size)
+        self._services = asyncio.Queue(self.queue_size)
+        
+        if self.metrics is not None:
+            self.metrics.watch_queue('l4', self._probes.qsize)
+            self.metrics.watch_queue('l7', self._services.qsize)
+        
+        l4_workers = [asyncio.create_task(self._l4_worker(started)) for _ in range(self.port_scanner.concurrency)]
+        l7_workers = [asyncio.create_task(self._l7_worker()) for _ in range(self.l7_concurrency)]
+        try:
+            await asyncio.gather(self._discover(hosts), *sources)
+            
+            # Each stage finishes once the one before it has, so nothing queued is lost
+            for _ in l4_workers:
+                await self._probes.put(_DONE)
+            await asyncio.gather(*l4_workers)
+            for _ in l7_workers:
+                await self._services.put(_DONE)
+            await asyncio.gather(*l7_workers)
+        finally:
+            for task in l4_workers + l7_workers:
+                task.cancel()
+            if self.metrics is not None:
+                self.metrics.watch_queue('l4', None)
+                self.metrics.watch_queue('l7', None)
+        
+        # Same shape as scan_l7: every scanned host has an entry, with or without services
+        for ip in self.results['l4']:
+            self.results['l7'].setdefault(ip, {'services': {}})
+        self.elapsed = loop.time() - started
+    
+    async def _discover(self, hosts):
+        """Layer 3: queue hosts as they answer the ICMP sweep (or all of them, without one)"""
+        if self.sweeper is None:
+            for ip in hosts:
+                await self.add_host(ip)
+            return
+        
+        async def on_alive(ip, rtt):
+            if ip not in self.results['l3']:
+                self.results['l3'][ip] = {'status': 'active', 'rtt_ms': round(rtt * 1000, 2)}
+                if self.on_result is not None:
+                    self.on_result('l3', ip, None)
+                self.port_scanner.seed_rtt(ip, rtt)
+            await self.add_host(ip)
+        
+        await self.sweeper.sweep_async(hosts, on_alive)
+    
+    async def _l4_worker(self, started):
+        """Layer 4: probe queued ports, queueing open ones for service identification"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._probes.get()
+            if item is _DONE:
+                return
+            ip, port = item
+            try:
+                result = await self.port_scanner.probe(ip, port)
+            except Exception as e:
+                print(f"[-] Error checking {ip}:{port}: {e}")
+                if self.metrics is not None:
+                    self.metrics.record_outcome('l4', 'error')
+                continue
+            
+            if result.state == OPEN:
+                self.results['l4'][ip]['open_ports'][port] = True
+                if self.on_result is not None:
+                    self.on_result('l4', ip, port)
+                if self.first_open_port is None:
+                    self.first_open_port = loop.time() - started
+                await self._services.put((ip, port))
+    
+    async def _l7_worker(self):
+        """Layer 7: identify the service on each open port"""
+        while True:
+            item = await self._services.get()
+            if item is _DONE:
+                return
+            ip, port = item
+            self.results['l7'].setdefault(ip, {'services': {}})
+            try:
+                service = await self.identify_service(ip, port)
+            except Exception as e:
+                print(f"[-] Error identifying {ip}:{port}: {e}")
+                if self.metrics is not None:
+                    self.metrics.record_outcome('l7', 'error')
+                continue
+            if service:
+                self.results['l7'][ip]['services'][port] = service
+                if self.on_result is not None:
+                    self.on_result('l7', ip, port)
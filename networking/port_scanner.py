@@ -0,0 +1,252 @@
+"""
+Asynchronous TCP Connect Scanner
+
+Checks many (host, port) pairs concurrently with non-blocking connects on one asyncio
+event loop instead of a thread per connection:
+
+- A fixed pool of worker tasks pulls (host, port) pairs from one shared iterator, so the
+  pool size is the global limit on connects in flight, and pairs are handed out port by
+  port across all hosts rather than host by host.
+- Each host has its own limit on concurrent connects and, optionally, connects per second.
+- Connect timeouts adapt to each host's measured round-trip time (open and closed ports
+  both answer, so both give samples), falling back to the network-wide estimate. Each
+  timeout doubles the host's timeout, and a timed-out connect is retried before the port
+  is called filtered, so a host slower than the rest of the network is not written off.
+
+Opening thousands of sockets at once may need a higher open-file limit (`ulimit -n`).
+"""
+import asyncio
+import errno
+import socket
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+OPEN = "open"
+CLOSED = "closed"
+FILTERED = "filtered"
+
+# Socket errors that mean "try again shortly" rather than "port unreachable"
+RESOURCE_ERRORS = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.EAGAIN)
+
+@dataclass
+class PortResult:
+    """Outcome of one connect attempt"""
+    host: str
+    port: int
+    state: str
+    rtt: Optional[float] = None  # Seconds until the host answered; None if it never did
+
+class RttEstimator:
+    """Smoothed round-trip time and timeout, following TCP's retransmission timer (RFC 6298)"""
+    
+    def __init__(self, initial_timeout=1.0, min_timeout=0.05, max_timeout=3.0):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.backoffs = 0  # Timeouts since the last sample; each doubles the timeout
+    
+    def observe(self, rtt):
+        """Add a round-trip time sample in seconds"""
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.samples += 1
+        self.backoffs = 0
+    
+    def backoff(self):
+        """A connect timed out: double the timeout until the next sample (RFC 6298 section 5.5)"""
+        if self.min_timeout * 2 ** self.backoffs < self.max_timeout:
+            self.backoffs += 1
+    
+    def timeout(self, base=None):
+        """
+        Timeout for the next connect, backed off after timeouts. It is computed from the
+        samples, else from base (e.g. the network-wide estimate), else the initial timeout.
+        """
+        if self.srtt is not None:
+            base = max(self.srtt + 4 * self.rttvar, self.min_timeout)
+        elif base is None:
+            if not self.backoffs:
+                return self.initial_timeout
+            base = self.initial_timeout
+        return min(base * 2 ** self.backoffs, self.max_timeout)
+
+class HostLimiter:
+    """Caps one host's concurrent connects and spaces them to at most rate per second"""
+    
+    def __init__(self, concurrency, rate=None):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = 0.0
+        self.rtt = None  # RttEstimator, set by the scanner
+    
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.interval:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+async def _wait_writable(loop, sock, timeout):
+    """Wait until a connecting socket is writable (the connect finished); False on timeout"""
+    # Cheaper than wait_for(loop.sock_connect()), which adds a task and a future per connect
+    waiter = loop.create_future()
+    
+    def finish(connected):
+        if not waiter.done():
+            waiter.set_result(connected)
+    
+    fd = sock.fileno()
+    loop.add_writer(fd, finish, True)
+    timer = loop.call_later(timeout, finish, False)
+    try:
+        return await waiter
+    finally:
+        loop.remove_writer(fd)
+        timer.cancel()
+
+def interleave(hosts: Sequence[str], ports: Iterable[int]) -> Iterator[Tuple[str, int]]:
+    """Yield (host, port) pairs port by port across every host, spreading load over the network"""
+    for port in ports:
+        for host in hosts:
+            yield host, port
+
+class AsyncPortScanner:
+    """TCP connect scanner running every connect on one asyncio event loop"""
+    
+    def __init__(self, concurrency=1000, per_host_concurrency=64, per_host_rate=None,
+                 initial_timeout=1.0, min_timeout=0.05, max_timeout=3.0, retries=1, rate_limiter=None,
+                 metrics=None):
+        """
+        concurrency caps connects in flight across all hosts; per_host_concurrency and
+        per_host_rate (connects per second, None for no limit) cap each host. Timeouts
+        start at initial_timeout and adapt to measured RTT within [min_timeout, max_timeout];
+        a connect that times out is tried up to retries more times, with the timeout doubled.
+        rate_limiter, if given, is awaited (acquire()) before every connect, so several
+        scanners can share one rate. metrics (a ScanMetrics) counts connects as layer l4.
+        """
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_rate = per_host_rate
+        self.timeouts = (initial_timeout, min_timeout, max_timeout)
+        self.retries = retries
+        self.network_rtt = RttEstimator(*self.timeouts)
+        self.hosts: Dict[str, HostLimiter] = {}
+        self.stats = {OPEN: 0, CLOSED: 0, FILTERED: 0}
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+    
+    def _limiter(self, host):
+        limiter = self.hosts.get(host)
+        if limiter is None:
+            limiter = self.hosts[host] = HostLimiter(self.per_host_concurrency, self.per_host_rate)
+            limiter.rtt = RttEstimator(*self.timeouts)
+        return limiter
+    
+    def timeout_for(self, host):
+        """Current connect timeout for a host, from its own samples or else the network's"""
+        limiter = self.hosts.get(host)
+        if limiter is None:
+            return self.network_rtt.timeout()
+        return limiter.rtt.timeout(None if limiter.rtt.samples else self.network_rtt.timeout())
+    
+    def seed_rtt(self, host, rtt):
+        """Start a host's timeout from a round-trip time measured elsewhere, e.g. its ping"""
+        self._limiter(host).rtt.observe(rtt)
+    
+    async def probe(self, host, port):
+        """Attempt a TCP connect and classify the port as open, closed or filtered"""
+        loop = asyncio.get_running_loop()
+        limiter = self._limiter(host)
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        
+        async with limiter:
+            for attempt in range(self.retries + 1):
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                if self.metrics is not None:
+                    self.metrics.record_sent('l4')
+                started = loop.time()
+                error = await self._connect(loop, family, host, port, self.timeout_for(host))
+                if error != errno.ETIMEDOUT:
+                    break
+                limiter.rtt.backoff()
+            
+            if error == 0:
+                state, rtt = OPEN, loop.time() - started
+            elif error == errno.ECONNREFUSED:
+                state, rtt = CLOSED, loop.time() - started
+            else:
+                # No answer in time, or unreachable
+                state, rtt = FILTERED, None
+        
+        if rtt is not None:
+            limiter.rtt.observe(rtt)
+            self.network_rtt.observe(rtt)
+        self.stats[state] += 1
+        if self.metrics is not None:
+            outcome = state if state != FILTERED else 'timeout' if error == errno.ETIMEDOUT else 'error'
+            self.metrics.record_outcome('l4', outcome, rtt)
+        return PortResult(host, port, state, rtt)
+    
+    async def _connect(self, loop, family, host, port, timeout):
+        """One non-blocking connect; returns its errno (0 if it connected, ETIMEDOUT if no answer)"""
+        while True:
+            try:
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                break
+            except OSError as e:
+                if e.errno not in RESOURCE_ERRORS:
+                    raise
+                await asyncio.sleep(0.05)
+        
+        sock.setblocking(False)
+        try:
+            error = sock.connect_ex((host, port))
+            if error == errno.EINPROGRESS:
+                if await _wait_writable(loop, sock, timeout):
+                    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                else:
+                    error = errno.ETIMEDOUT
+        except OSError as e:
+            error = e.errno
+        finally:
+            sock.close()
+        return error
+    
+    async def scan(self, hosts: Iterable[str], ports: Iterable[int],
+                   on_result: Optional[Callable[[PortResult], None]] = None) -> Dict[str, List[int]]:
+        """Scan every port on every host, returning {host: sorted open ports} for hosts with any"""
+        hosts, ports = list(hosts), list(ports)
+        work = interleave(hosts, ports)
+        open_ports: Dict[str, List[int]] = {}
+        
+        async def worker():
+            # Workers share one iterator; next() never awaits, so each pair goes to one worker
+            for host, port in work:
+                result = await self.probe(host, port)
+                if result.state == OPEN:
+                    open_ports.setdefault(host, []).append(port)
+                if on_result is not None:
+                    on_result(result)
+        
+        num_workers = min(self.concurrency, len(hosts) * len(ports))
+        await asyncio.gather(*(worker() for _ in range(num_workers)))
+        
+        return {host: sorted(open_ports[host]) for host in hosts if host in open_ports}
+    
+    def run(self, hosts: Iterable[str], ports: Iterable[int]) -> Dict[str, List[int]]:
+        """Run scan() to completion on a new event loop"""
+        return asyncio.run(self.scan(hosts, ports))
@@ -0,0 +1,260 @@
+"""
+Streaming Report Writers
+
+Writes scan results as flat records, one per finding, instead of the nested per-layer
+dicts: a device at Layer 2, a live host at Layer 3, an open port at Layer 4 and a service at
+Layer 7 each become one record with the fields in FIELDS (absent fields are left out).
+Records are written one at a time as the scan produces them, so a report of any size is
+never held in memory. A later record for the same (layer, ip, port) supersedes an earlier
+one, e.g. when a DNS check adds hostnames to a live host.
+
+Three formats:
+
+- JSON lines: one JSON object per record.
+- CSV: a header row, then one row per record; hostnames are joined with ';'.
+- Binary: the magic bytes b'NSR1', then for each record a varint byte length and the record:
+  a layer byte, a 16-bit mask of the fields present, the IP address (length byte plus the
+  packed address), then each present field in FIELDS order. Ports and status codes are
+  16-bit, RTTs 64-bit floats, MACs 6 bytes, and every string goes through a string table:
+  varint 0 followed by a varint length and UTF-8 bytes adds a string to the table (while it
+  holds fewer than MAX_STRINGS), and varint n refers to the nth string added. Vendors, server
+  names and service types repeat across hosts, so most strings cost a byte or two.
+  read_binary decodes the stream back into records.
+"""
+import abc
+import csv
+import ipaddress
+import json
+import os
+import socket
+import struct
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional
+
+LAYERS = ('l2', 'l3', 'l4', 'l7')
+FIELDS = ('layer', 'ip', 'port', 'mac', 'vendor', 'status', 'rtt_ms', 'hostnames',
+          'service', 'status_code', 'server', 'title', 'banner')
+# Binary format: fields after layer and ip, in the order of their bits in the mask
+OPTIONAL_FIELDS = FIELDS[2:]
+MAGIC = b'NSR1'
+MAX_STRINGS = 65536
+
+def result_record(results, layer, ip, port=None) -> Dict[str, object]:
+    """The record for one entry of a scanner's results: a host at l2/l3, a port at l4/l7"""
+    record = {'layer': layer, 'ip': ip}
+    if layer == 'l2':
+        data = results['l2'][ip]
+        record['mac'] = data.get('mac_address')
+        record['vendor'] = data.get('vendor')
+    elif layer == 'l3':
+        data = results['l3'][ip]
+        record['status'] = data.get('status')
+        record['rtt_ms'] = data.get('rtt_ms')
+        record['hostnames'] = data.get('hostnames')
+    elif layer == 'l4':
+        record['port'] = port
+        record['status'] = 'open'
+    else:
+        record['port'] = port
+        service = results['l7'][ip]['services'][port]
+        if isinstance(service, dict):
+            record['service'] = service.get('type')
+            for key in ('status_code', 'server', 'title', 'banner'):
+                record[key] = service.get(key)
+        else:
+            record['service'] = service
+    return {key: value for key, value in record.items() if value is not None}
+
+def records(results) -> Iterator[Dict[str, object]]:
+    """Every record in a scanner's results (or any of its layers), layer by layer, built one at a time"""
+    for ip in results.get('l2', {}):
+        yield result_record(results, 'l2', ip)
+    for ip in results.get('l3', {}):
+        yield result_record(results, 'l3', ip)
+    for ip, data in results.get('l4', {}).items():
+        for port in data.get('open_ports', {}):
+            yield result_record(results, 'l4', ip, port)
+    for ip, data in results.get('l7', {}).items():
+        for port in data.get('services', {}):
+            yield result_record(results, 'l7', ip, port)
+
+class RecordWriter(abc.ABC):
+    """Writes records to a path or an open file, one at a time"""
+    
+    binary = False
+    
+    def __init__(self, target):
+        if isinstance(target, (str, os.PathLike)):
+            self.file = open(target, 'wb') if self.binary else open(target, 'w', newline='')
+            self.name = str(target)
+            self._owns_file = True
+        else:
+            self.file = target
+            self.name = getattr(target, 'name', type(target).__name__)
+            self._owns_file = False
+        self.count = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def write(self, record: Dict[str, object]):
+        self._write(record)
+        self.count += 1
+    
+    def write_all(self, records: Iterable[Dict[str, object]]):
+        for record in records:
+            self.write(record)
+    
+    def flush(self):
+        self.file.flush()
+    
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+    
+    @abc.abstractmethod
+    def _write(self, record):
+        """Write one record in this writer's format"""
+
+class JsonLinesWriter(RecordWriter):
+    """One JSON object per line"""
+    
+    def _write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+
+class CsvWriter(RecordWriter):
+    """A header row of FIELDS, then one row per record"""
+    
+    def __init__(self, target):
+        super().__init__(target)
+        self._writer = csv.DictWriter(self.file, FIELDS)
+        self._writer.writeheader()
+    
+    def _write(self, record):
+        if 'hostnames' in record:
+            record = dict(record, hostnames=';'.join(record['hostnames']))
+        self._writer.writerow(record)
+
+class BinaryWriter(RecordWriter):
+    """Length-prefixed binary records with a shared string table (see the module docstring)"""
+    
+    binary = True
+    
+    def __init__(self, target):
+        super().__init__(target)
+        self._strings: Dict[str, int] = {}
+        self.file.write(MAGIC)
+    
+    def _write(self, record):
+        ip = record['ip']
+        address = socket.inet_pton(socket.AF_INET6 if ':' in ip else socket.AF_INET, ip)
+        mask = 0
+        fields = bytearray()
+        for bit, field in enumerate(OPTIONAL_FIELDS):
+            if field not in record:
+                continue
+            mask |= 1 << bit
+            value = record[field]
+            if field in ('port', 'status_code'):
+                fields += struct.pack('!H', value)
+            elif field == 'rtt_ms':
+                fields += struct.pack('!d', value)
+            elif field == 'mac':
+                fields += bytes.fromhex(value.replace(':', '').replace('-', ''))
+            elif field == 'hostnames':
+                self._write_string(fields, ','.join(value))
+            else:
+                self._write_string(fields, str(value))
+        
+        body = struct.pack('!BHB', LAYERS.index(record['layer']), mask, len(address)) + address + fields
+        self.file.write(_varint(len(body)) + body)
+    
+    def _write_string(self, out, text):
+        index = self._strings.get(text)
+        if index is not None:
+            out += _varint(index)
+            return
+        encoded = text.encode('utf-8')
+        out += b'\x00' + _varint(len(encoded)) + encoded
+        if len(self._strings) < MAX_STRINGS:
+            self._strings[text] = len(self._strings) + 1
+
+def read_binary(file: BinaryIO) -> Iterator[Dict[str, object]]:
+    """Decode the records of a BinaryWriter stream, one at a time"""
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a binary scan report")
+    strings = []
+    while True:
+        length = _read_varint(file)
+        if length is None:
+            return
+        data = file.read(length)
+        if len(data) < length:
+            raise ValueError("Truncated binary scan report")
+        
+        layer, mask, address_length = struct.unpack_from('!BHB', data)
+        offset = 4 + address_length
+        record = {'layer': LAYERS[layer], 'ip': str(ipaddress.ip_address(data[4:offset]))}
+        for bit, field in enumerate(OPTIONAL_FIELDS):
+            if not mask & (1 << bit):
+                continue
+            if field in ('port', 'status_code'):
+                record[field], = struct.unpack_from('!H', data, offset)
+                offset += 2
+            elif field == 'rtt_ms':
+                record[field], = struct.unpack_from('!d', data, offset)
+                offset += 8
+            elif field == 'mac':
+                record[field] = ':'.join(f'{b:02x}' for b in data[offset:offset + 6])
+                offset += 6
+            else:
+                text, offset = _decode_string(data, offset, strings)
+                record[field] = text.split(',') if field == 'hostnames' else text
+        yield record
+
+def _decode_string(data, offset, strings):
+    index, offset = _decode_varint(data, offset)
+    if index:
+        return strings[index - 1], offset
+    length, offset = _decode_varint(data, offset)
+    text = data[offset:offset + length].decode('utf-8')
+    if len(strings) < MAX_STRINGS:
+        strings.append(text)
+    return text, offset + length
+
+def _varint(value: int) -> bytes:
+    """LEB128: seven bits per byte, low bits first, high bit set on all but the last byte"""
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _decode_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+def _read_varint(file) -> Optional[int]:
+    """A varint read from a file, or None at the end of the file"""
+    value = shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            if shift:
+                raise ValueError("Truncated binary scan report")
+            return None
+        value |= (byte[0] & 0x7f) << shift
+        if not byte[0] & 0x80:
+            return value
+        shift += 7
@@ -0,0 +1,248 @@
+"""
+Scanner Metrics
+
+Counts what every stage of a scan does so concurrency and rate limits can be tuned from
+numbers rather than guesses: probes sent and their outcomes per layer (with probes per
+second), round-trip time histograms, timeouts and errors, queue depths between pipeline
+stages, and the wall time of each scan phase.
+
+The engines record into a ScanMetrics as they go. A background thread takes a snapshot
+every few seconds and hands it to the exporters (JSON lines, or a Prometheus text file for
+node_exporter's textfile collector), so a long scan can be watched while it runs.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Round-trip time bucket upper bounds in seconds, from loopback to a slow WAN link
+RTT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class Histogram:
+    """Counts of values at or below each bucket bound, plus one bucket for anything larger"""
+    
+    def __init__(self, bounds: Sequence[float] = RTT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value, count=1):
+        self.counts[bisect.bisect_left(self.bounds, value)] += count
+        self.sum += value * count
+        self.count += count
+    
+    def merge(self, other: 'Histogram'):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+    
+    def to_dict(self):
+        return {'bounds': list(self.bounds), 'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+class ScanMetrics:
+    """Per-layer probe counters, RTT histograms, queue depths and phase timers"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.sent: Dict[str, int] = {}  # layer -> probes sent
+        self.outcomes: Dict[str, Dict[str, int]] = {}  # layer -> {outcome: count}
+        self.rtt: Dict[str, Histogram] = {}  # layer -> round-trip times in seconds
+        self.phases: Dict[str, float] = {}  # phase -> wall seconds, summed over runs
+        self._running: Dict[str, float] = {}  # phase -> start time, while it runs
+        self._queues: Dict[str, Callable[[], int]] = {}  # queue name -> its qsize
+        self._last = (time.monotonic(), {})  # (time, sent) at the previous snapshot
+        self._exporting = None
+    
+    def __getstate__(self):
+        # Sent back from worker processes: the counters travel, the lock and queues do not
+        state = self.__dict__.copy()
+        del state['_lock'], state['_queues'], state['_exporting']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._exporting = None
+    
+    def record_sent(self, layer, count=1):
+        """Count probes sent at a layer"""
+        with self._lock:
+            self.sent[layer] = self.sent.get(layer, 0) + count
+    
+    def record_outcome(self, layer, outcome, rtt=None, count=1):
+        """Count how probes ended (e.g. open, closed, timeout, error), with their round-trip time if known"""
+        with self._lock:
+            outcomes = self.outcomes.setdefault(layer, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + count
+            if rtt is not None:
+                histogram = self.rtt.get(layer)
+                if histogram is None:
+                    histogram = self.rtt[layer] = Histogram()
+                histogram.observe(rtt, count)
+    
+    def watch_queue(self, name, qsize: Optional[Callable[[], int]]):
+        """Sample a queue's depth with qsize() at every snapshot, or stop with None"""
+        with self._lock:
+            if qsize is None:
+                self._queues.pop(name, None)
+            else:
+                self._queues[name] = qsize
+    
+    @contextmanager
+    def phase(self, name):
+        """Time a scan phase; phases that run more than once add up"""
+        started = time.monotonic()
+        with self._lock:
+            self._running[name] = started
+        try:
+            yield
+        finally:
+            with self._lock:
+                del self._running[name]
+                self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - started
+    
+    def merge(self, other: 'ScanMetrics'):
+        """Add the counters of another ScanMetrics, e.g. one sent back by a worker process"""
+        with self._lock:
+            for layer, count in other.sent.items():
+                self.sent[layer] = self.sent.get(layer, 0) + count
+            for layer, outcomes in other.outcomes.items():
+                mine = self.outcomes.setdefault(layer, {})
+                for outcome, count in outcomes.items():
+                    mine[outcome] = mine.get(outcome, 0) + count
+            for layer, histogram in other.rtt.items():
+                self.rtt.setdefault(layer, Histogram(histogram.bounds)).merge(histogram)
+    
+    def snapshot(self) -> dict:
+        """
+        Every metric as plain data. probes_per_second is the rate since the previous
+        snapshot; running phases report their time so far.
+        """
+        now = time.monotonic()
+        with self._lock:
+            last_time, last_sent = self._last
+            self._last = (now, dict(self.sent))
+            layers = {}
+            for layer in sorted(set(self.sent) | set(self.outcomes) | set(self.rtt)):
+                sent = self.sent.get(layer, 0)
+                layers[layer] = {
+                    'sent': sent,
+                    'probes_per_second': round((sent - last_sent.get(layer, 0)) / max(now - last_time, 1e-9), 1),
+                    'outcomes': dict(self.outcomes.get(layer, {})),
+                }
+                if layer in self.rtt:
+                    layers[layer]['rtt'] = self.rtt[layer].to_dict()
+            phases = dict(self.phases)
+            for name, started in self._running.items():
+                phases[name] = phases.get(name, 0.0) + now - started
+            queues = list(self._queues.items())
+        
+        return {
+            'time': time.time(),
+            'elapsed': time.time() - self.started,
+            'layers': layers,
+            'queues': {name: qsize() for name, qsize in queues},
+            'phases': {name: round(seconds, 3) for name, seconds in phases.items()},
+        }
+    
+    def export(self, exporters):
+        """Take one snapshot and hand it to every exporter"""
+        snapshot = self.snapshot()
+        for exporter in exporters:
+            exporter.export(snapshot)
+    
+    def start_exporting(self, exporters, interval=5.0):
+        """Export every interval seconds on a background thread until stop_exporting()"""
+        self.stop_exporting()
+        stop = threading.Event()
+        
+        def run():
+            while not stop.wait(interval):
+                self.export(exporters)
+        
+        thread = threading.Thread(target=run, name="scan-metrics", daemon=True)
+        self._exporting = (thread, stop, exporters)
+        thread.start()
+    
+    def stop_exporting(self):
+        """Stop the export thread, after one last export so the final numbers are written"""
+        if self._exporting is None:
+            return
+        thread, stop, exporters = self._exporting
+        self._exporting = None
+        stop.set()
+        thread.join()
+        self.export(exporters)
+
+class JsonLinesExporter:
+    """Appends each snapshot to a file as one JSON object per line"""
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def export(self, snapshot):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(snapshot, sort_keys=True) + "\n")
+
+class PrometheusTextExporter:
+    """
+    Writes the latest snapshot in the Prometheus text format, replacing the file atomically
+    so a scraper (e.g. node_exporter's textfile collector) never reads half of one.
+    """
+    
+    def __init__(self, path, prefix="network_scanner"):
+        self.path = path
+        self.prefix = prefix
+    
+    def export(self, snapshot):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(self.render(snapshot))
+        os.replace(temp_path, self.path)
+    
+    def render(self, snapshot) -> str:
+        p = self.prefix
+        lines: List[str] = []
+        
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+                lines.append(f"{p}_{name}{suffix}{{{label_text}}} {value}" if labels else f"{p}_{name}{suffix} {value}")
+        
+        layers = snapshot['layers']
+        family('probes_sent_total', 'counter', "Probes sent, by layer",
+               [('', {'layer': layer}, data['sent']) for layer, data in layers.items()])
+        family('probes_per_second', 'gauge', "Probes sent per second since the previous export, by layer",
+               [('', {'layer': layer}, data['probes_per_second']) for layer, data in layers.items()])
+        family('probe_outcomes_total', 'counter', "How probes ended, by layer and outcome",
+               [('', {'layer': layer, 'outcome': outcome}, count)
+                for layer, data in layers.items() for outcome, count in sorted(data['outcomes'].items())])
+        
+        samples = []
+        for layer, data in layers.items():
+            if 'rtt' not in data:
+                continue
+            rtt = data['rtt']
+            cumulative = 0
+            for bound, count in zip(rtt['bounds'] + ['+Inf'], rtt['counts']):
+                cumulative += count
+                samples.append(('_bucket', {'layer': layer, 'le': bound}, cumulative))
+            samples.append(('_sum', {'layer': layer}, rtt['sum']))
+            samples.append(('_count', {'layer': layer}, rtt['count']))
+        family('rtt_seconds', 'histogram', "Probe round-trip time in seconds, by layer", samples)
+        
+        family('queue_depth', 'gauge', "Items waiting in each queue",
+               [('', {'queue': name}, value) for name, value in sorted(snapshot['queues'].items())])
+        family('phase_seconds', 'gauge', "Wall time of each scan phase, including one still running",
+               [('', {'phase': name}, seconds) for name, seconds in sorted(snapshot['phases'].items())])
+        family('elapsed_seconds', 'gauge', "Seconds since the metrics were created", [('', {}, snapshot['elapsed'])])
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,258 @@
+"""
+Persistent Scan Store
+
+Keeps what every scan found in a SQLite database: each host's MAC, vendor and status,
+each port that has been open and the service on it, with first-seen, last-seen and
+last-checked times, plus a log of every change between scans. Hosts and ports are keyed
+by the packed address bytes, so any network (IPv4 or IPv6, of any size) is a range query.
+
+An incremental rescan asks plan_rescan which live hosts need their ports probed again:
+new hosts, hosts back up or with a different MAC first, then hosts whose last port scan
+is older than max_age, oldest first. Everything else is filled in from the store, and
+record_scan returns the differences from the stored state.
+"""
+import ipaddress
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    addr BLOB PRIMARY KEY,
+    ip TEXT NOT NULL,
+    mac TEXT,
+    vendor TEXT,
+    rtt_ms REAL,
+    status TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    ports_checked REAL
+);
+CREATE TABLE IF NOT EXISTS ports (
+    addr BLOB NOT NULL,
+    port INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    service TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (addr, port)
+);
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    network TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL NOT NULL,
+    hosts_up INTEGER NOT NULL,
+    hosts_port_scanned INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    scan_id INTEGER NOT NULL,
+    at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    ip TEXT NOT NULL,
+    port INTEGER,
+    old TEXT,
+    new TEXT
+);
+CREATE INDEX IF NOT EXISTS changes_by_time ON changes (at);
+"""
+
+HOST_UP, HOST_DOWN = 'up', 'down'
+PORT_OPEN, PORT_CLOSED = 'open', 'closed'
+
+@dataclass
+class Change:
+    """One difference between a scan and the stored state"""
+    kind: str  # new_host, host_up, host_down, mac_changed, port_opened, port_closed, service_changed
+    ip: str
+    port: Optional[int] = None
+    old: Optional[str] = None
+    new: Optional[str] = None
+    
+    def __str__(self):
+        where = f"{self.ip}:{self.port}" if self.port is not None else self.ip
+        text = f"{self.kind.replace('_', ' ')}: {where}"
+        if self.old is not None or self.new is not None:
+            text += f" ({self.old} -> {self.new})"
+        return text
+
+@dataclass
+class RescanPlan:
+    """Which live hosts to probe again, and the stored ports and services of the rest"""
+    changed: List[str]  # New, back up, or a different MAC
+    stale: List[str]  # Port scan older than max_age, oldest first
+    cached: Dict[str, dict]  # ip -> {'open_ports': {port: True}, 'services': {port: service}}
+    
+    @property
+    def reprobe(self):
+        return self.changed + self.stale
+
+def _addr(ip):
+    return ipaddress.ip_address(ip).packed
+
+def _encode_service(service):
+    return json.dumps(service, sort_keys=True)
+
+def _describe_service(encoded):
+    """Short text of a stored service for change messages"""
+    if encoded is None:
+        return None
+    service = json.loads(encoded)
+    if isinstance(service, dict):
+        return ' '.join(str(service[key]) for key in ('type', 'server', 'banner', 'title') if key in service)
+    return str(service)
+
+class ScanStore:
+    """Scan results that persist between runs, in a SQLite database"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+    
+    def close(self):
+        self.db.close()
+    
+    def _hosts_in(self, network):
+        network = ipaddress.ip_network(network)
+        return self.db.execute(
+            "SELECT addr, ip, mac, status, ports_checked FROM hosts WHERE addr BETWEEN ? AND ? AND length(addr) = ?",
+            (network.network_address.packed, network.broadcast_address.packed,
+             len(network.network_address.packed))).fetchall()
+    
+    def _ports_of(self, addrs):
+        """{addr: {port: (state, service)}} for the given hosts"""
+        ports = {}
+        addrs = list(addrs)
+        # Stay under SQLite's limit on query parameters
+        for i in range(0, len(addrs), 500):
+            chunk = addrs[i:i + 500]
+            rows = self.db.execute(
+                f"SELECT addr, port, state, service FROM ports WHERE addr IN ({','.join('?' * len(chunk))})", chunk)
+            for addr, port, state, service in rows:
+                ports.setdefault(addr, {})[port] = (state, service)
+        return ports
+    
+    def plan_rescan(self, network, alive: Dict[str, Optional[str]], max_age: float, now: Optional[float] = None) -> RescanPlan:
+        """
+        Sort live hosts (ip -> MAC, or None if unknown) into those to port scan again and
+        those whose stored ports are recent enough to reuse.
+        """
+        now = time.time() if now is None else now
+        stored = {ip: (addr, mac, status, ports_checked) for addr, ip, mac, status, ports_checked in self._hosts_in(network)}
+        
+        changed, stale, fresh = [], [], []
+        for ip, mac in alive.items():
+            entry = stored.get(ip)
+            if entry is None or entry[2] != HOST_UP or entry[3] is None or (mac and entry[1] and mac != entry[1]):
+                changed.append(ip)
+            elif entry[3] < now - max_age:
+                stale.append(ip)
+            else:
+                fresh.append(ip)
+        stale.sort(key=lambda ip: stored[ip][3])
+        
+        cached = {ip: {'open_ports': {}, 'services': {}} for ip in fresh}
+        ports = self._ports_of(stored[ip][0] for ip in fresh)
+        for ip in fresh:
+            for port, (state, service) in sorted(ports.get(stored[ip][0], {}).items()):
+                if state == PORT_OPEN:
+                    cached[ip]['open_ports'][port] = True
+                    if service is not None:
+                        cached[ip]['services'][port] = json.loads(service)
+        return RescanPlan(changed, stale, cached)
+    
+    def record_scan(self, network, results, port_scanned: Iterable[str] = (), ports: Iterable[int] = (),
+                    started: Optional[float] = None) -> List[Change]:
+        """
+        Merge a scanner's results into the store and return what changed. Hosts outside
+        network are ignored, and those in it that were up and are missing from the L2/L3
+        results are marked down. Only hosts in port_scanned have their ports compared, and
+        only for the given ports.
+        """
+        now = time.time()
+        started = now if started is None else started
+        port_scanned = set(port_scanned)
+        ports = set(ports)
+        network = ipaddress.ip_network(network)
+        alive = {ip for ip in set(results['l2']) | set(results['l3']) if ipaddress.ip_address(ip) in network}
+        stored = {ip: (addr, mac, status) for addr, ip, mac, status, _ in self._hosts_in(network)}
+        changes = []
+        
+        with self.db:
+            scan_id = self.db.execute(
+                "INSERT INTO scans (network, started, finished, hosts_up, hosts_port_scanned) VALUES (?, ?, ?, ?, ?)",
+                (str(network), started, now, len(alive), len(port_scanned))).lastrowid
+            
+            for ip in sorted(alive, key=_addr):
+                l2 = results['l2'].get(ip, {})
+                mac, vendor = l2.get('mac_address'), l2.get('vendor')
+                rtt_ms = results['l3'].get(ip, {}).get('rtt_ms')
+                entry = stored.get(ip)
+                if entry is None:
+                    changes.append(Change('new_host', ip, new=mac))
+                    self.db.execute(
+                        "INSERT INTO hosts (addr, ip, mac, vendor, rtt_ms, status, first_seen, last_seen) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (_addr(ip), ip, mac, vendor, rtt_ms, HOST_UP, now, now))
+                    continue
+                
+                if entry[2] != HOST_UP:
+                    changes.append(Change('host_up', ip))
+                if mac and entry[1] and mac != entry[1]:
+                    changes.append(Change('mac_changed', ip, old=entry[1], new=mac))
+                self.db.execute(
+                    "UPDATE hosts SET mac = COALESCE(?, mac), vendor = COALESCE(?, vendor), "
+                    "rtt_ms = COALESCE(?, rtt_ms), status = ?, last_seen = ? WHERE addr = ?",
+                    (mac, vendor, rtt_ms, HOST_UP, now, entry[0]))
+            
+            down = [ip for ip, (_, _, status) in stored.items() if status == HOST_UP and ip not in alive]
+            for ip in sorted(down, key=_addr):
+                changes.append(Change('host_down', ip))
+            self.db.executemany("UPDATE hosts SET status = ? WHERE addr = ?", ((HOST_DOWN, _addr(ip)) for ip in down))
+            
+            changes.extend(self._record_ports(results, sorted(port_scanned, key=_addr), ports, now))
+            self.db.executemany(
+                "INSERT INTO changes (scan_id, at, kind, ip, port, old, new) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((scan_id, now, c.kind, c.ip, c.port, c.old, c.new) for c in changes))
+        return changes
+    
+    def _record_ports(self, results, hosts, ports, now):
+        changes = []
+        previous = self._ports_of(_addr(ip) for ip in hosts)
+        for ip in hosts:
+            addr = _addr(ip)
+            # A host found only now (e.g. by ARP) may not have been added yet
+            self.db.execute(
+                "INSERT OR IGNORE INTO hosts (addr, ip, status, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)",
+                (addr, ip, HOST_UP, now, now))
+            self.db.execute("UPDATE hosts SET ports_checked = ? WHERE addr = ?", (now, addr))
+            
+            open_ports = results['l4'].get(ip, {}).get('open_ports', {})
+            services = results['l7'].get(ip, {}).get('services', {})
+            known = previous.get(addr, {})
+            
+            for port in sorted(ports | set(open_ports) | set(known)):
+                state, old_service = known.get(port, (None, None))
+                if port in open_ports:
+                    service = _encode_service(services[port]) if port in services else old_service
+                    if state != PORT_OPEN:
+                        changes.append(Change('port_opened', ip, port, new=_describe_service(service)))
+                    elif service != old_service and old_service is not None:
+                        changes.append(Change('service_changed', ip, port, _describe_service(old_service),
+                                              _describe_service(service)))
+                    self.db.execute(
+                        "INSERT INTO ports (addr, port, state, service, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (addr, port) DO UPDATE SET state = excluded.state, "
+                        "service = excluded.service, last_seen = excluded.last_seen",
+                        (addr, port, PORT_OPEN, service, now, now))
+                elif state == PORT_OPEN and port in ports:
+                    changes.append(Change('port_closed', ip, port, old=_describe_service(old_service)))
+                    self.db.execute("UPDATE ports SET state = ? WHERE addr = ? AND port = ?", (PORT_CLOSED, addr, port))
+        return changes
+    
+    def changes_since(self, since: float) -> List[Change]:
+        """Every change recorded at or after a time"""
+        rows = self.db.execute("SELECT kind, ip, port, old, new FROM changes WHERE at >= ? ORDER BY rowid", (since,))
+        return [Change(*row) for row in rows]
@@ -0,0 +1,299 @@
+"""
+Service Fingerprinting
+
+Identifies the services on open ports concurrently on one asyncio event loop:
+
+- HTTP(S) ports get a ranged GET whose response is read only until the page's </title>
+  (or a byte cap), then the connection is dropped instead of downloading the whole body.
+- Services that speak first (SSH, FTP, SMTP, ...) are identified from their banner line.
+- A port with no known service is given a moment to send a banner; if it stays silent,
+  an HTTP request goes out over the same connection.
+- Connections come from a shared pool with one TLS context, a cap on open connections,
+  and keep-alive reuse when a response was read to its end.
+"""
+import asyncio
+import html
+import re
+import ssl
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+COMMON_PORTS = {
+    21: 'FTP',
+    22: 'SSH',
+    23: 'Telnet',
+    25: 'SMTP',
+    53: 'DNS',
+    80: 'HTTP',
+    443: 'HTTPS',
+    445: 'SMB',
+    3306: 'MySQL',
+    3389: 'RDP',
+    8080: 'HTTP-Proxy'
+}
+HTTP_PORTS = {80, 8000, 8008, 8080, 8888}
+HTTPS_PORTS = {443, 8443}
+# Services that send a greeting as soon as a client connects
+BANNER_PORTS = {21: 'FTP', 22: 'SSH', 25: 'SMTP', 110: 'POP3', 143: 'IMAP', 587: 'SMTP'}
+
+USER_AGENT = "NetworkScanner/1.0"
+MAX_HEADER_BYTES = 64 * 1024
+
+def find_title(body: bytes) -> Optional[str]:
+    """Text of the first <title> element, or None if the body has no complete one"""
+    lower = body.lower()
+    start = lower.find(b"<title")
+    if start == -1:
+        return None
+    start = lower.find(b">", start)
+    end = lower.find(b"</title>", start)
+    if start == -1 or end == -1:
+        return None
+    text = body[start + 1:end].decode("utf-8", "replace")
+    return " ".join(html.unescape(text).split())
+
+def classify_banner(banner: str, port: int) -> str:
+    """Service name for a greeting line"""
+    upper = banner.upper()
+    if upper.startswith("SSH-"):
+        return "SSH"
+    if upper.startswith("+OK"):
+        return "POP3"
+    if upper.startswith("* OK"):
+        return "IMAP"
+    if upper.startswith("220"):
+        if "FTP" in upper:
+            return "FTP"
+        if "SMTP" in upper or "MAIL" in upper:
+            return "SMTP"
+    return BANNER_PORTS.get(port) or COMMON_PORTS.get(port, "Unknown")
+
+class ConnectionPool:
+    """Open TCP/TLS connections shared by every probe, reusing keep-alive connections"""
+    
+    def __init__(self, max_connections=100, max_idle=100, ssl_context=None):
+        if ssl_context is None:
+            # Scanned services rarely have certificates for their IP address
+            ssl_context = ssl.create_default_context()
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+        self.ssl_context = ssl_context
+        self.max_idle = max_idle
+        self._slots = asyncio.Semaphore(max_connections)
+        self._idle = OrderedDict()  # (host, port, tls) -> [(reader, writer)], least recently used first
+        self.opened = 0
+        self.reused = 0
+    
+    async def acquire(self, host, port, tls=False, timeout=3.0):
+        """A (reader, writer) pair for host:port, reusing an idle connection if there is one"""
+        await self._slots.acquire()
+        key = (host, port, tls)
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not idle:
+                del self._idle[key]
+            if not reader.at_eof() and not writer.is_closing():
+                self.reused += 1
+                return reader, writer
+            writer.close()
+        
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self.ssl_context if tls else None,
+                                        limit=MAX_HEADER_BYTES), timeout)
+        except BaseException:
+            self._slots.release()
+            raise
+        self.opened += 1
+        return reader, writer
+    
+    def release(self, host, port, tls, reader, writer, reusable=False):
+        """Return a connection; it is kept for reuse only if reusable, otherwise closed"""
+        self._slots.release()
+        if not reusable or writer.is_closing():
+            writer.close()
+            return
+        
+        self._idle.setdefault((host, port, tls), []).append((reader, writer))
+        self._idle.move_to_end((host, port, tls))
+        while sum(len(conns) for conns in self._idle.values()) > self.max_idle:
+            _, conns = self._idle.popitem(last=False)
+            for _, old_writer in conns:
+                old_writer.close()
+    
+    def close(self):
+        """Close every idle connection"""
+        for conns in self._idle.values():
+            for _, writer in conns:
+                writer.close()
+        self._idle.clear()
+
+class ServiceFingerprinter:
+    """Identifies services on open ports, many at a time, reporting each as it completes"""
+    
+    def __init__(self, concurrency=100, timeout=3.0, banner_wait=1.0, max_body_bytes=16384, pool=None,
+                 metrics=None):
+        """
+        timeout bounds each probe, banner_wait is how long a port may stay silent before it
+        is tried as HTTP, and max_body_bytes caps how much of an HTTP body is read. metrics
+        (a ScanMetrics) counts probes as layer l7, timing the ones that identify a service.
+        """
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.banner_wait = banner_wait
+        self.max_body_bytes = max_body_bytes
+        self.pool = pool
+        self.metrics = metrics
+        self._http_services = set()  # (host, port) of silent services that turned out to be HTTP
+    
+    async def identify_all(self, targets: Iterable[Tuple[str, int]],
+                           on_result: Optional[Callable[[str, int, object], None]] = None) -> Dict[Tuple[str, int], object]:
+        """Identify the service on each (host, port), calling on_result(host, port, service) as each finishes"""
+        if self.pool is None:
+            self.pool = ConnectionPool(max_connections=self.concurrency)
+        work = iter(targets)
+        services = {}
+        
+        async def worker():
+            # Workers share one iterator; next() never awaits, so each target goes to one worker
+            for host, port in work:
+                service = await self.identify(host, port)
+                services[(host, port)] = service
+                if on_result is not None:
+                    on_result(host, port, service)
+        
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            self.pool.close()
+        return services
+    
+    async def identify(self, host, port):
+        """
+        A dict of what was learned about the service (type plus HTTP status, server and
+        title, or the banner), or the port's well-known service name if nothing was.
+        """
+        if self.pool is None:
+            self.pool = ConnectionPool(max_connections=self.concurrency)
+        fallback = COMMON_PORTS.get(port, "Unknown")
+        if self.metrics is not None:
+            self.metrics.record_sent('l7')
+        started = time.monotonic()
+        try:
+            if port in HTTP_PORTS or port in HTTPS_PORTS or (host, port) in self._http_services:
+                service = await asyncio.wait_for(self._http(host, port, port in HTTPS_PORTS), self.timeout)
+            else:
+                service = await asyncio.wait_for(self._banner_or_http(host, port), self.timeout + self.banner_wait)
+        except asyncio.TimeoutError:
+            self._record('timeout')
+            return fallback
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            self._record('error')
+            return fallback
+        
+        if isinstance(service, dict):
+            self._record('identified', time.monotonic() - started)
+        else:
+            self._record('unidentified')
+        return service
+    
+    async def check_http(self, host, port, tls=False):
+        """
+        Probe one port as HTTP (or HTTPS if tls) regardless of its number. Returns the service
+        dict, or the port's well-known name if the answer was not HTTP; connection errors and
+        timeouts are raised.
+        """
+        if self.pool is None:
+            self.pool = ConnectionPool(max_connections=self.concurrency)
+        return await asyncio.wait_for(self._http(host, port, tls), self.timeout)
+    
+    def _record(self, outcome, elapsed=None):
+        if self.metrics is not None:
+            self.metrics.record_outcome('l7', outcome, elapsed)
+    
+    async def _banner_or_http(self, host, port):
+        """Read the greeting of a server-speaks-first service, or try HTTP if there is none"""
+        reader, writer = await self.pool.acquire(host, port, timeout=self.timeout)
+        reusable = False
+        try:
+            wait = self.timeout if port in BANNER_PORTS else self.banner_wait
+            try:
+                line = await asyncio.wait_for(reader.readline(), wait)
+            except asyncio.TimeoutError:
+                line = None
+            
+            if line:
+                banner = line.decode("utf-8", "replace").strip()
+                return {'type': classify_banner(banner, port), 'banner': banner}
+            if line is not None or port in BANNER_PORTS:
+                # Closed without a word, or a known banner service that said nothing
+                return COMMON_PORTS.get(port, "Unknown")
+            
+            # Silent: it may be waiting for a client request, so try HTTP on this connection
+            service, reusable = await self._http_exchange(reader, writer, host, port, "HTTP")
+            if isinstance(service, dict):
+                self._http_services.add((host, port))
+            return service
+        finally:
+            self.pool.release(host, port, False, reader, writer, reusable)
+    
+    async def _http(self, host, port, tls):
+        reader, writer = await self.pool.acquire(host, port, tls, timeout=self.timeout)
+        reusable = False
+        try:
+            service, reusable = await self._http_exchange(reader, writer, host, port, "HTTPS" if tls else "HTTP")
+            return service
+        finally:
+            self.pool.release(host, port, tls, reader, writer, reusable)
+    
+    async def _http_exchange(self, reader, writer, host, port, protocol):
+        """
+        Send a ranged GET and read the response only as far as the title or the byte cap.
+        Returns the service details and whether the connection can be reused.
+        """
+        request = (f"GET / HTTP/1.1\r\nHost: {host}:{port}\r\nUser-Agent: {USER_AGENT}\r\n"
+                   f"Accept: text/html\r\nRange: bytes=0-{self.max_body_bytes - 1}\r\n"
+                   f"Connection: keep-alive\r\n\r\n")
+        writer.write(request.encode("ascii"))
+        await writer.drain()
+        
+        status_line = await reader.readline()
+        match = re.match(rb"HTTP/\d(?:\.\d)? (\d{3})", status_line)
+        if not match:
+            return COMMON_PORTS.get(port, protocol), False
+        status_code = int(match.group(1))
+        
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        
+        length = headers.get('content-length')
+        length = int(length) if length and length.isdigit() and 'transfer-encoding' not in headers else None
+        to_read = min(length, self.max_body_bytes) if length is not None else self.max_body_bytes
+        
+        body = b""
+        title = None
+        while len(body) < to_read:
+            chunk = await reader.read(min(4096, to_read - len(body)))
+            if not chunk:
+                break
+            body += chunk
+            title = find_title(body)
+            if title is not None:
+                break
+        
+        # Only a response read to its end leaves the connection ready for another request
+        reusable = (length is not None and len(body) == length
+                    and headers.get('connection', '').lower() != 'close')
+        return {
+            'type': protocol,
+            'status_code': status_code,
+            'server': headers.get('server', 'Unknown'),
+            'title': title if title is not None else "No title"
+        }, reusable
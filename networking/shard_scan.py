@@ -0,0 +1,226 @@
+"""
+Sharded Scanning of Large Networks
+
+Scans networks too large for one process (a /16, a /8) by splitting them into subnet shards
+and running each shard through the pipelined L3 -> L4 -> L7 scan in a worker process with
+its own event loop. Nothing is ever held for the whole network:
+
+- Shards come from a generator, and only a few per worker are handed out at a time.
+- Each shard's addresses are generated as they are probed, never collected in a list.
+- A worker sends back only the hosts it found, which are merged into the scanner's
+  {'l3', 'l4', 'l7'} results as each shard completes.
+
+Every worker's pings and connects draw from one global rate: the next free send slot is a
+double in shared memory, and each worker reserves slots a batch at a time, so the lock is
+taken once per batch rather than once per probe.
+"""
+import asyncio
+import concurrent.futures
+import ipaddress
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+from icmp_sweep import IcmpSweeper
+from pipeline import ScanPipeline
+from port_scanner import AsyncPortScanner
+from scan_metrics import ScanMetrics
+from service_fingerprint import ConnectionPool, ServiceFingerprinter
+
+SHARD_HOST_BITS = 12  # Default shards of 4096 addresses
+
+def shard_network(network, shard_prefix: int) -> Iterator:
+    """Yield the subnets of network with the given prefix length (the network itself if it is no larger)"""
+    network = ipaddress.ip_network(network)
+    if shard_prefix <= network.prefixlen:
+        yield network
+    else:
+        yield from network.subnets(new_prefix=shard_prefix)
+
+def shard_hosts(shard, network) -> Iterator[str]:
+    """Yield the addresses of a shard that network.hosts() would, one at a time"""
+    shard, network = ipaddress.ip_network(shard), ipaddress.ip_network(network)
+    if shard == network:
+        for ip in network.hosts():
+            yield str(ip)
+        return
+    # A shard's first and last addresses are ordinary hosts unless they are the network's own
+    # network (and for IPv4, broadcast) address; /31 and /127 networks have neither
+    excluded = set()
+    if network.max_prefixlen - network.prefixlen > 1:
+        excluded.add(network.network_address)
+        if network.version == 4:
+            excluded.add(network.broadcast_address)
+    for ip in shard:
+        if ip not in excluded:
+            yield str(ip)
+
+def shard_count(network, shard_prefix: int) -> int:
+    """How many shards shard_network yields"""
+    network = ipaddress.ip_network(network)
+    return 2 ** max(shard_prefix - network.prefixlen, 0)
+
+class GlobalRateLimiter:
+    """A probes-per-second limit shared by every process holding the same next_slot"""
+    
+    def __init__(self, rate, next_slot=None, batch=32):
+        """
+        next_slot is a multiprocessing.Value('d') holding the time.monotonic() of the next
+        free slot; pass the same one to every process. Slots are reserved batch at a time.
+        """
+        self.rate = rate
+        self.interval = 1.0 / rate
+        self.next_slot = next_slot if next_slot is not None else multiprocessing.Value('d', 0.0)
+        self.batch = batch
+        self._slot = 0.0
+        self._left = 0
+    
+    def reserve(self, count: int) -> float:
+        """Claim count consecutive slots, returning the time the first one starts"""
+        with self.next_slot.get_lock():
+            start = max(time.monotonic(), self.next_slot.value)
+            self.next_slot.value = start + count * self.interval
+        return start
+    
+    async def acquire(self):
+        """Wait for this process's next slot"""
+        if self._left == 0:
+            self._slot = self.reserve(self.batch)
+            self._left = self.batch
+        slot = self._slot
+        self._slot += self.interval
+        self._left -= 1
+        
+        delay = slot - time.monotonic()
+        if delay > 0.001:
+            await asyncio.sleep(delay)
+
+@dataclass
+class ShardOptions:
+    """How each worker scans its shards; concurrency limits apply per worker"""
+    ports: List[int]
+    ping: bool = True
+    timeout: float = 1.0
+    concurrency: int = 1000
+    per_host_concurrency: int = 64
+    per_host_rate: Optional[float] = None
+    l7_concurrency: int = 32
+    l7_timeout: float = 3.0
+    queue_size: int = 256
+
+@dataclass
+class ShardResult:
+    """What one worker found in one shard"""
+    shard: str
+    results: Dict[str, dict] = field(default_factory=lambda: {'l3': {}, 'l4': {}, 'l7': {}})
+    elapsed: float = 0.0
+    metrics: ScanMetrics = field(default_factory=ScanMetrics)
+
+_limiter = None  # This worker process's GlobalRateLimiter
+
+def _init_worker(rate, next_slot, batch):
+    global _limiter
+    _limiter = GlobalRateLimiter(rate, next_slot, batch) if rate else None
+
+def _scan_shard(shard: str, network: str, options: ShardOptions) -> ShardResult:
+    """Scan one shard on a new event loop in a worker process"""
+    result = ShardResult(shard)
+    engine = AsyncPortScanner(concurrency=options.concurrency, per_host_concurrency=options.per_host_concurrency,
+                              per_host_rate=options.per_host_rate, initial_timeout=options.timeout,
+                              rate_limiter=_limiter, metrics=result.metrics)
+    sweeper = None
+    if options.ping:
+        rate = _limiter.rate if _limiter is not None else 1000
+        sweeper = IcmpSweeper(rate=rate, timeout=options.timeout, rate_limiter=_limiter, metrics=result.metrics)
+    fingerprinter = ServiceFingerprinter(concurrency=options.l7_concurrency, timeout=options.l7_timeout,
+                                         metrics=result.metrics)
+    pipeline = ScanPipeline(result.results, fingerprinter.identify, options.ports, engine, sweeper,
+                            l7_concurrency=options.l7_concurrency, queue_size=options.queue_size)
+    
+    async def run():
+        fingerprinter.pool = ConnectionPool(max_connections=options.l7_concurrency)
+        try:
+            await pipeline.run(shard_hosts(shard, network))
+        finally:
+            fingerprinter.pool.close()
+    
+    asyncio.run(run())
+    result.elapsed = pipeline.elapsed
+    return result
+
+class ShardCoordinator:
+    """Scans a network shard by shard across worker processes, merging results as shards finish"""
+    
+    def __init__(self, options: ShardOptions, workers=None, shard_prefix=None, rate=1000, rate_batch=32,
+                 shards_per_worker=2, metrics=None):
+        """
+        workers defaults to the CPU count and shard_prefix to shards of 4096 addresses. rate
+        caps pings plus connects per second across all workers (None for no limit). At most
+        shards_per_worker shards per worker are handed out at a time. Each shard's counters
+        are added to metrics (a ScanMetrics) when it completes.
+        """
+        self.options = options
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_prefix = shard_prefix
+        self.rate = rate
+        self.rate_batch = rate_batch
+        self.shards_per_worker = shards_per_worker
+        self.metrics = metrics
+        self.failed: List[str] = []
+    
+    def prefix_for(self, network) -> int:
+        """Prefix length of the shards network is split into"""
+        network = ipaddress.ip_network(network)
+        if self.shard_prefix is not None:
+            return self.shard_prefix
+        return max(network.prefixlen, network.max_prefixlen - SHARD_HOST_BITS)
+    
+    def run(self, network, results, on_shard: Optional[Callable[[ShardResult], None]] = None):
+        """
+        Scan every shard of network, merging each into results ({'l3', 'l4', 'l7'}) and
+        calling on_shard as it completes. A PermissionError (no ICMP socket) stops the scan;
+        other shard failures are reported and recorded in failed.
+        """
+        network = ipaddress.ip_network(network)
+        shards = shard_network(network, self.prefix_for(network))
+        context = multiprocessing.get_context()
+        next_slot = context.Value('d', 0.0)
+        
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                initargs=(self.rate, next_slot, self.rate_batch)) as executor:
+            in_flight = {}
+            
+            def submit_next():
+                shard = next(shards, None)
+                if shard is not None:
+                    future = executor.submit(_scan_shard, str(shard), str(network), self.options)
+                    in_flight[future] = str(shard)
+            
+            for _ in range(self.workers * self.shards_per_worker):
+                submit_next()
+            try:
+                while in_flight:
+                    done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        shard = in_flight.pop(future)
+                        try:
+                            shard_result = future.result()
+                        except PermissionError:
+                            raise
+                        except Exception as e:
+                            print(f"[-] Error scanning shard {shard}: {e}")
+                            self.failed.append(shard)
+                        else:
+                            for layer, hosts in shard_result.results.items():
+                                results[layer].update(hosts)
+                            if self.metrics is not None:
+                                self.metrics.merge(shard_result.metrics)
+                            if on_shard is not None:
+                                on_shard(shard_result)
+                        submit_next()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+        return results
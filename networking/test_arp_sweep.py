@@ -0,0 +1,124 @@
+import unittest
+import os
+import socket
+import tempfile
+import time
+from arp_sweep import ArpSweeper, OuiIndex, build_arp_request, parse_arp_reply
+
+OUI_SAMPLES = {
+    'oui.txt': "OUI/MA-L\t\t\tOrganization\ncompany_id\t\tOrganization\n\n"
+               "00-00-0C   (hex)\t\tCisco Systems, Inc\n"
+               "00000C     (base 16)\t\tCisco Systems, Inc\n\t\t\t\t170 West Tasman Dr.\n\n"
+               "3C-22-FB   (hex)\t\tApple, Inc.\n",
+    'manuf': "# Wireshark manuf\n00:00:0C\tCisco\tCisco Systems, Inc\n3C:22:FB\tApple\tApple, Inc.\n"
+             "00:1B:C5:00:00:00/36\tConvergi\tConverging Systems Inc.\n00:1B:C5\tIEEERegi\tIEEE Registration Authority\n"
+             "00:50:C2:00:00:00/36\tT.L.S.\n",
+    'nmap-mac-prefixes': "00000C Cisco Systems\n3C22FB Apple\n",
+}
+
+class SimulatedSegment:
+    """A transport standing in for a network segment: hosts answer after a delay, some drop requests"""
+    
+    def __init__(self, hosts, delay=0.01, drop_first=()):
+        self.hosts = hosts  # ip -> mac
+        self.delay = delay
+        self.drop_first = set(drop_first)
+        self.sent = []
+        self.due = []  # (time, ip, mac)
+    
+    def send(self, ip):
+        self.sent.append(ip)
+        if ip in self.drop_first:
+            self.drop_first.discard(ip)
+        elif ip in self.hosts:
+            self.due.append((time.monotonic() + self.delay, ip, self.hosts[ip]))
+        # Unrelated chatter, e.g. a gratuitous ARP from a host nobody asked about
+        self.due.append((time.monotonic(), "10.9.9.9", "aa:bb:cc:dd:ee:ff"))
+    
+    def receive(self, timeout):
+        deadline = time.monotonic() + max(timeout, 0)
+        while True:
+            now = time.monotonic()
+            ready = [(ip, mac) for at, ip, mac in self.due if at <= now]
+            if ready or now >= deadline:
+                self.due = [entry for entry in self.due if entry[0] > now]
+                return ready
+            time.sleep(min(0.002, deadline - now))
+    
+    def close(self):
+        pass
+
+class TestOuiIndex(unittest.TestCase):
+    def load(self, name):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, name)
+            with open(path, 'w') as f:
+                f.write(OUI_SAMPLES[name])
+            return OuiIndex.find(path)
+    
+    def test_file_formats(self):
+        for name in OUI_SAMPLES:
+            index = self.load(name)
+            self.assertIn("Cisco", index.lookup("00:00:0c:12:34:56"), name)
+            self.assertIn("Apple", index.lookup("3C-22-FB-00-00-01"), name)
+            self.assertIsNone(index.lookup("02:00:00:00:00:01"), name)
+        self.assertEqual(len(self.load('oui.txt')), 2)
+    
+    def test_longest_prefix_wins(self):
+        index = self.load('manuf')
+        self.assertEqual(index.lookup("00:1b:c5:00:00:01"), "Converging Systems Inc.")
+        self.assertEqual(index.lookup("00:1b:c5:ff:00:01"), "IEEE Registration Authority")
+        self.assertEqual(index.lookup("0050.c200.0abc"), "T.L.S.")
+        self.assertEqual(index.lookup(0x3c22fb000001), "Apple, Inc.")
+    
+    def test_incremental_build(self):
+        index = OuiIndex()
+        index.add(0x00000c, 24, "Cisco")
+        index.build()
+        index.add(0x00000c, 24, "Someone else")
+        index.add(0x3c22fb, 24, "Apple")
+        index.build()
+        self.assertEqual(index.lookup("00:00:0c:00:00:00"), "Cisco")
+        self.assertEqual(index.lookup("3c:22:fb:00:00:00"), "Apple")
+        self.assertEqual(len(index), 2)
+
+class TestArpSweeper(unittest.TestCase):
+    def test_frames(self):
+        frame = build_arp_request(bytes.fromhex("020000000001"), "10.0.0.1", "10.0.0.7")
+        self.assertEqual(len(frame), 42)
+        self.assertEqual(frame[:6], b'\xff' * 6)
+        self.assertIsNone(parse_arp_reply(frame))
+        
+        reply = (bytes.fromhex("020000000001") + bytes.fromhex("3c22fb000007") + b'\x08\x06' +
+                 bytes.fromhex("0001080006040002") + bytes.fromhex("3c22fb000007") + socket.inet_aton("10.0.0.7") +
+                 bytes.fromhex("020000000001") + socket.inet_aton("10.0.0.1"))
+        self.assertEqual(parse_arp_reply(reply), ("10.0.0.7", "3c:22:fb:00:00:07"))
+    
+    def test_sweep_retransmits_and_ends_early(self):
+        ips = [f"10.0.{i // 256}.{i % 256}" for i in range(1, 501)]
+        hosts = {ip: f"02:00:00:00:{i // 256:02x}:{i % 256:02x}" for i, ip in enumerate(ips[::10])}
+        segment = SimulatedSegment(hosts, drop_first=list(hosts)[:5])
+        sweeper = ArpSweeper(rate=5000, batch_size=32, retries=2, quiet_time=0.1, max_wait=3.0, transport=segment)
+        
+        reported = []
+        started = time.monotonic()
+        found = sweeper.sweep(iter(ips), lambda ip, mac: reported.append(ip))
+        elapsed = time.monotonic() - started
+        
+        self.assertEqual(found, hosts)
+        self.assertEqual(sorted(reported), sorted(hosts))
+        # Every silent address is asked three times in all, the dropped hosts twice
+        self.assertEqual(len(segment.sent), 3 * (len(ips) - len(hosts)) + len(hosts) + 5)
+        # Each round stops once replies go quiet rather than waiting max_wait
+        self.assertLess(elapsed, 1.5)
+    
+    def test_sweep_is_rate_limited(self):
+        segment = SimulatedSegment({})
+        sweeper = ArpSweeper(rate=1000, batch_size=50, retries=0, quiet_time=0.01, transport=segment)
+        started = time.monotonic()
+        sweeper.sweep(f"10.0.0.{i}" for i in range(1, 251))
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(sweeper.sweep([]), {})
+
+if __name__ == "__main__":
+    unittest.main()
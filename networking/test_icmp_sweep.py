@@ -0,0 +1,60 @@
+import unittest
+import struct
+import time
+from icmp_sweep import (ICMP_ECHO_REPLY, ICMP_ECHO_REQUEST, IcmpSweeper, build_echo_request, checksum,
+                        open_icmp_socket, parse_echo_reply)
+
+def icmp_sockets_allowed():
+    try:
+        sock, _ = open_icmp_socket()
+    except PermissionError:
+        return False
+    sock.close()
+    return True
+
+class TestIcmpPackets(unittest.TestCase):
+    def test_checksum(self):
+        # Example from RFC 1071 section 3
+        self.assertEqual(checksum(bytes([0x00, 0x01, 0xf2, 0x03, 0xf4, 0xf5, 0xf6, 0xf7])), ~0xddf2 & 0xffff)
+        packet = build_echo_request(0x1234, 7)
+        self.assertEqual(checksum(packet), 0)
+        self.assertEqual(checksum(build_echo_request(1, 2, b"odd")), 0)
+    
+    def test_build_and_parse(self):
+        packet = build_echo_request(0x1234, 7)
+        self.assertEqual(packet[0], ICMP_ECHO_REQUEST)
+        self.assertIsNone(parse_echo_reply(packet, raw=False))
+        
+        reply = bytes([ICMP_ECHO_REPLY]) + packet[1:]
+        self.assertEqual(parse_echo_reply(reply, raw=False), (0x1234, 7))
+        
+        # Raw sockets deliver the IP header first; its length comes from the IHL field
+        ip_header = struct.pack("!BBHHHBBH4s4s", 0x46, 0, 0, 0, 0, 64, 1, 0, bytes(4), bytes(4)) + bytes(4)
+        self.assertEqual(parse_echo_reply(ip_header + reply, raw=True), (0x1234, 7))
+        self.assertIsNone(parse_echo_reply(ip_header + reply[:4], raw=True))
+        # macOS datagram sockets leave the IP header in too
+        self.assertEqual(parse_echo_reply(ip_header + reply, raw=False), (0x1234, 7))
+        self.assertIsNone(parse_echo_reply(ip_header + packet, raw=False))
+        self.assertIsNone(parse_echo_reply(b"", raw=False))
+
+@unittest.skipUnless(icmp_sockets_allowed(), "ICMP sockets not permitted")
+class TestIcmpSweeper(unittest.TestCase):
+    def test_sweep_loopback_range(self):
+        # All of 127.0.0.0/8 answers on Linux
+        hosts = [f"127.0.0.{i}" for i in range(1, 101)]
+        started = time.monotonic()
+        alive = IcmpSweeper(rate=2000, timeout=0.5).sweep(hosts + hosts[:10])
+        elapsed = time.monotonic() - started
+        
+        self.assertEqual(sorted(alive), sorted(hosts))
+        self.assertTrue(all(rtt >= 0 for rtt in alive.values()))
+        # Finishes once every host has answered rather than waiting out the timeout
+        self.assertLess(elapsed, 0.4)
+    
+    def test_sweep_is_paced_by_rate(self):
+        started = time.monotonic()
+        IcmpSweeper(rate=500, timeout=0.5).sweep([f"127.0.1.{i}" for i in range(1, 101)])
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import asyncio
+from icmp_sweep import IcmpSweeper
+from pipeline import ScanPipeline
+from port_scanner import AsyncPortScanner
+from test_icmp_sweep import icmp_sockets_allowed
+from test_port_scanner import free_port, listen
+
+def new_results():
+    return {'l2': {}, 'l3': {}, 'l4': {}, 'l7': {}}
+
+class TestScanPipeline(unittest.TestCase):
+    def setUp(self):
+        self.hosts = ["127.0.0.1", "127.0.0.2", "127.0.0.3"]
+        self.listeners = [listen(host) for host in self.hosts[:2]]
+        self.open_ports = {sock.getsockname()[0]: sock.getsockname()[1] for sock in self.listeners}
+        self.ports = sorted(set(self.open_ports.values()) | {free_port("127.0.0.1")})
+        self.identified = []
+    
+    def tearDown(self):
+        for sock in self.listeners:
+            sock.close()
+    
+    async def identify(self, ip, port):
+        self.identified.append((ip, port))
+        return "Unknown"
+    
+    def check_results(self, results):
+        self.assertEqual({ip: list(data['open_ports']) for ip, data in results['l4'].items()},
+                         {ip: [self.open_ports[ip]] if ip in self.open_ports else [] for ip in self.hosts})
+        self.assertEqual(sorted(self.identified), sorted(self.open_ports.items()))
+        self.assertEqual(results['l7'], {ip: {'services': {self.open_ports[ip]: "Unknown"} if ip in self.open_ports else {}}
+                                         for ip in self.hosts})
+    
+    def test_every_host_without_ping(self):
+        results = new_results()
+        pipeline = ScanPipeline(results, self.identify, self.ports, AsyncPortScanner(concurrency=20))
+        asyncio.run(pipeline.run(iter(self.hosts)))
+        
+        self.check_results(results)
+        self.assertEqual(results['l3'], {})
+        self.assertLessEqual(pipeline.first_open_port, pipeline.elapsed)
+    
+    @unittest.skipUnless(icmp_sockets_allowed(), "ICMP sockets not permitted")
+    def test_hosts_found_by_ping(self):
+        results = new_results()
+        pipeline = ScanPipeline(results, self.identify, self.ports, AsyncPortScanner(concurrency=20),
+                                IcmpSweeper(timeout=0.5))
+        asyncio.run(pipeline.run(self.hosts))
+        
+        self.check_results(results)
+        self.assertEqual(sorted(results['l3']), self.hosts)
+    
+    def test_slow_stage_applies_backpressure(self):
+        results = new_results()
+        queued = []
+        
+        async def slow_identify(ip, port):
+            await asyncio.sleep(0.05)
+            return await self.identify(ip, port)
+        
+        pipeline = ScanPipeline(results, slow_identify, self.ports, AsyncPortScanner(concurrency=1),
+                                l7_concurrency=1, queue_size=1)
+        
+        async def extra_hosts():
+            # Hosts from another discovery source are probed once, however often they are reported
+            for ip in self.hosts[:2]:
+                await pipeline.add_host(ip)
+                queued.append(ip)
+        
+        asyncio.run(pipeline.run([], [extra_hosts(), extra_hosts()]))
+        self.assertEqual(sorted(queued), sorted(self.hosts[:2] * 2))
+        self.assertEqual(len(self.identified), 2)
+        self.assertEqual(set(results['l4']), set(self.hosts[:2]))
+
+if __name__ == "__main__":
+    unittest.main()
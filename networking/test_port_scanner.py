@@ -0,0 +1,145 @@
+import unittest
+import asyncio
+import errno
+import socket
+import time
+from port_scanner import CLOSED, FILTERED, OPEN, AsyncPortScanner, RttEstimator, interleave
+
+def listen(host):
+    """A listening socket on a free port of host"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind((host, 0))
+    sock.listen(128)
+    return sock
+
+def free_port(host):
+    """A port nothing is listening on"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+class SlowHostScanner(AsyncPortScanner):
+    """Connects to one host answer only after a delay, as if it were on a distant subnet"""
+    
+    def __init__(self, slow_host, delay, **kwargs):
+        super().__init__(**kwargs)
+        self.slow_host = slow_host
+        self.delay = delay
+        self.timeouts_used = []
+    
+    async def _connect(self, loop, family, host, port, timeout):
+        if host != self.slow_host:
+            return await super()._connect(loop, family, host, port, timeout)
+        self.timeouts_used.append(timeout)
+        if timeout < self.delay:
+            await asyncio.sleep(timeout)
+            return errno.ETIMEDOUT
+        await asyncio.sleep(self.delay)
+        return await super()._connect(loop, family, host, port, timeout)
+
+class TestAsyncPortScanner(unittest.TestCase):
+    def setUp(self):
+        # All of 127.0.0.0/8 is loopback on Linux, so each address acts as a separate host
+        self.hosts = ["127.0.0.1", "127.0.0.2", "127.0.0.3"]
+        self.listeners = [listen(host) for host in self.hosts[:2]]
+    
+    def tearDown(self):
+        for sock in self.listeners:
+            sock.close()
+    
+    def test_finds_open_ports(self):
+        open_ports = {sock.getsockname()[0]: sock.getsockname()[1] for sock in self.listeners}
+        ports = sorted(set(open_ports.values()) | {free_port("127.0.0.1")})
+        
+        scanner = AsyncPortScanner(concurrency=50)
+        results = []
+        found = asyncio.run(scanner.scan(self.hosts, ports, on_result=results.append))
+        
+        self.assertEqual(found, {host: [port] for host, port in open_ports.items()})
+        self.assertEqual(len(results), len(self.hosts) * len(ports))
+        self.assertEqual(scanner.stats[OPEN], 2)
+        self.assertEqual(scanner.stats[CLOSED], len(results) - 2)
+        self.assertTrue(all(result.rtt is not None for result in results))
+    
+    def test_timeouts_adapt_to_rtt(self):
+        scanner = AsyncPortScanner(initial_timeout=2.0, min_timeout=0.05)
+        self.assertEqual(scanner.timeout_for("127.0.0.1"), 2.0)
+        scanner.run(["127.0.0.1"], range(40000, 40020))
+        
+        self.assertEqual(scanner.timeout_for("127.0.0.1"), 0.05)
+        # Hosts not yet probed start from the network-wide estimate
+        self.assertEqual(scanner.timeout_for("127.0.0.9"), 0.05)
+    
+    def test_rtt_estimator(self):
+        estimator = RttEstimator(initial_timeout=1.0, min_timeout=0.01, max_timeout=0.5)
+        self.assertEqual(estimator.timeout(), 1.0)
+        estimator.observe(0.1)
+        self.assertAlmostEqual(estimator.timeout(), 0.1 + 4 * 0.05)
+        estimator.observe(0.2)
+        self.assertAlmostEqual(estimator.srtt, 0.1125)
+        self.assertAlmostEqual(estimator.rttvar, 0.0625)
+        estimator.observe(5.0)
+        self.assertEqual(estimator.timeout(), 0.5)
+    
+    def test_per_host_rate_limit(self):
+        scanner = AsyncPortScanner(per_host_rate=100)
+        started = time.monotonic()
+        scanner.run(["127.0.0.1", "127.0.0.2"], range(40000, 40020))
+        elapsed = time.monotonic() - started
+        
+        # 20 connects per host spaced 10ms apart; the hosts are limited independently
+        self.assertGreaterEqual(elapsed, 0.19)
+        self.assertLess(elapsed, 0.35)
+    
+    def test_unanswered_connect_is_filtered(self):
+        # A listener whose accept queue is full drops further SYNs, like a filtering firewall
+        listener = listen("127.0.0.5")
+        listener.listen(0)
+        self.listeners.append(listener)
+        port = listener.getsockname()[1]
+        for _ in range(4):
+            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client.setblocking(False)
+            client.connect_ex(("127.0.0.5", port))
+            self.listeners.append(client)
+        time.sleep(0.05)
+        
+        scanner = AsyncPortScanner(initial_timeout=0.2)
+        result = asyncio.run(scanner.probe("127.0.0.5", port))
+        self.assertEqual(result.state, FILTERED)
+        self.assertIsNone(result.rtt)
+        self.assertEqual(scanner.network_rtt.samples, 0)
+        # Tried twice, doubling the timeout after each expiry
+        self.assertEqual(scanner.timeout_for("127.0.0.5"), 0.8)
+    
+    def test_host_slower_than_network_estimate(self):
+        slow_host = "127.0.0.7"
+        listener = listen(slow_host)
+        self.listeners.append(listener)
+        ports = [listener.getsockname()[1], free_port(slow_host)]
+        scanner = SlowHostScanner(slow_host, 0.08, min_timeout=0.05, per_host_concurrency=1)
+        
+        async def main():
+            # Fast hosts drive the network-wide timeout down to its 50ms floor first
+            await scanner.scan(self.hosts, range(40000, 40020))
+            self.assertEqual(scanner.timeout_for(slow_host), 0.05)
+            return await scanner.scan([slow_host], ports)
+        
+        self.assertEqual(asyncio.run(main()), {slow_host: [ports[0]]})
+        self.assertEqual(scanner.stats[FILTERED], 0)
+        # The first connect timed out and was retried with double the timeout; after that the
+        # host's own samples set its timeout
+        self.assertEqual(scanner.timeouts_used[:2], [0.05, 0.1])
+        self.assertGreater(scanner.timeout_for(slow_host), 0.08)
+    
+    def test_seed_rtt(self):
+        scanner = AsyncPortScanner(min_timeout=0.05)
+        scanner.seed_rtt("127.0.0.1", 0.2)
+        self.assertAlmostEqual(scanner.timeout_for("127.0.0.1"), 0.2 + 4 * 0.1)
+        self.assertEqual(scanner.timeout_for("127.0.0.2"), 1.0)
+    
+    def test_interleave_spreads_ports_across_hosts(self):
+        self.assertEqual(list(interleave(["a", "b"], [1, 2])), [("a", 1), ("b", 1), ("a", 2), ("b", 2)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+from pipeline import ScanPipeline
+from port_scanner import AsyncPortScanner
+from report_writers import BinaryWriter, CsvWriter, FIELDS, JsonLinesWriter, read_binary, records, result_record
+from test_port_scanner import listen
+
+RESULTS = {
+    'l2': {'192.168.1.1': {'mac_address': '3c:22:fb:00:00:01', 'vendor': 'Apple, Inc.'}},
+    'l3': {'192.168.1.1': {'status': 'active', 'rtt_ms': 0.42, 'hostnames': ['router.lan', 'gw.lan']},
+           'fd00::7': {'status': 'active'}},
+    'l4': {'192.168.1.1': {'open_ports': {22: True, 80: True}}, 'fd00::7': {'open_ports': {}}},
+    'l7': {'192.168.1.1': {'services': {22: {'type': 'SSH', 'banner': 'SSH-2.0-OpenSSH_9.6'},
+                                        80: {'type': 'HTTP', 'status_code': 200, 'server': 'nginx', 'title': 'Läuft'}}},
+           'fd00::7': {'services': {}}},
+}
+
+EXPECTED = [
+    {'layer': 'l2', 'ip': '192.168.1.1', 'mac': '3c:22:fb:00:00:01', 'vendor': 'Apple, Inc.'},
+    {'layer': 'l3', 'ip': '192.168.1.1', 'status': 'active', 'rtt_ms': 0.42, 'hostnames': ['router.lan', 'gw.lan']},
+    {'layer': 'l3', 'ip': 'fd00::7', 'status': 'active'},
+    {'layer': 'l4', 'ip': '192.168.1.1', 'port': 22, 'status': 'open'},
+    {'layer': 'l4', 'ip': '192.168.1.1', 'port': 80, 'status': 'open'},
+    {'layer': 'l7', 'ip': '192.168.1.1', 'port': 22, 'service': 'SSH', 'banner': 'SSH-2.0-OpenSSH_9.6'},
+    {'layer': 'l7', 'ip': '192.168.1.1', 'port': 80, 'service': 'HTTP', 'status_code': 200, 'server': 'nginx',
+     'title': 'Läuft'},
+]
+
+class TestReportWriters(unittest.TestCase):
+    def test_flat_records(self):
+        self.assertEqual(list(records(RESULTS)), EXPECTED)
+        self.assertEqual(result_record({'l7': {'10.0.0.1': {'services': {3306: 'MySQL'}}}}, 'l7', '10.0.0.1', 3306),
+                         {'layer': 'l7', 'ip': '10.0.0.1', 'port': 3306, 'service': 'MySQL'})
+    
+    def test_json_lines(self):
+        out = io.StringIO()
+        with JsonLinesWriter(out) as writer:
+            writer.write_all(records(RESULTS))
+        self.assertEqual([json.loads(line) for line in out.getvalue().splitlines()], EXPECTED)
+        self.assertEqual(writer.count, len(EXPECTED))
+    
+    def test_csv(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "scan.csv")
+            with CsvWriter(path) as writer:
+                writer.write_all(records(RESULTS))
+            with open(path, newline='') as f:
+                rows = list(csv.DictReader(f))
+        
+        self.assertEqual(len(rows), len(EXPECTED))
+        self.assertEqual(list(rows[0]), list(FIELDS))
+        self.assertEqual(rows[1]['hostnames'], 'router.lan;gw.lan')
+        self.assertEqual((rows[6]['port'], rows[6]['status_code'], rows[6]['title'], rows[6]['mac']), ('80', '200', 'Läuft', ''))
+    
+    def test_binary_round_trip(self):
+        out = io.BytesIO()
+        with BinaryWriter(out) as writer:
+            for _ in range(100):
+                writer.write_all(records(RESULTS))
+        data = out.getvalue()
+        self.assertEqual(list(read_binary(io.BytesIO(data))), EXPECTED * 100)
+        
+        # Repeated strings become table references, so the binary form is far smaller than JSON lines
+        text = io.StringIO()
+        JsonLinesWriter(text).write_all(records(RESULTS))
+        self.assertLess(len(data), len(text.getvalue().encode()) * 100 / 3)
+        
+        with self.assertRaises(ValueError):
+            list(read_binary(io.BytesIO(data[:-3])))
+        with self.assertRaises(ValueError):
+            list(read_binary(io.BytesIO(b"nope")))
+    
+    def test_pipeline_streams_records_as_found(self):
+        listener = listen("127.0.0.1")
+        port = listener.getsockname()[1]
+        results = {'l2': {}, 'l3': {}, 'l4': {}, 'l7': {}}
+        out = io.StringIO()
+        writer = JsonLinesWriter(out)
+        
+        async def identify(ip, port):
+            # The open port was written before its service is identified
+            self.assertEqual(json.loads(out.getvalue()), {'layer': 'l4', 'ip': ip, 'port': port, 'status': 'open'})
+            return "Unknown"
+        
+        def on_result(layer, ip, port):
+            writer.write(result_record(results, layer, ip, port))
+        
+        try:
+            pipeline = ScanPipeline(results, identify, [port], AsyncPortScanner(concurrency=4), on_result=on_result)
+            asyncio.run(pipeline.run(["127.0.0.1", "127.0.0.2"]))
+        finally:
+            listener.close()
+        
+        self.assertEqual([json.loads(line) for line in out.getvalue().splitlines()],
+                         [{'layer': 'l4', 'ip': '127.0.0.1', 'port': port, 'status': 'open'},
+                          {'layer': 'l7', 'ip': '127.0.0.1', 'port': port, 'service': 'Unknown'}])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import asyncio
+import json
+import os
+import pickle
+import tempfile
+import time
+from port_scanner import AsyncPortScanner
+from scan_metrics import Histogram, JsonLinesExporter, PrometheusTextExporter, ScanMetrics
+from test_port_scanner import free_port, listen
+
+class TestScanMetrics(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram((0.001, 0.01, 0.1))
+        for value in (0.0005, 0.001, 0.002, 0.05, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.sum, 3.0535)
+    
+    def test_snapshot(self):
+        metrics = ScanMetrics()
+        metrics.record_sent('l4', 100)
+        metrics.record_outcome('l4', 'open', 0.002)
+        metrics.record_outcome('l4', 'closed', 0.0004, count=9)
+        metrics.record_outcome('l4', 'timeout', count=90)
+        metrics.watch_queue('l4', lambda: 7)
+        with metrics.phase('l3'):
+            time.sleep(0.02)
+        
+        with metrics.phase('l4'):
+            snapshot = metrics.snapshot()
+        layer = snapshot['layers']['l4']
+        self.assertEqual(layer['sent'], 100)
+        self.assertGreater(layer['probes_per_second'], 0)
+        self.assertEqual(layer['outcomes'], {'open': 1, 'closed': 9, 'timeout': 90})
+        self.assertEqual((layer['rtt']['counts'][0], layer['rtt']['counts'][2], layer['rtt']['count']), (9, 1, 10))
+        self.assertEqual(snapshot['queues'], {'l4': 7})
+        self.assertGreaterEqual(snapshot['phases']['l3'], 0.02)
+        self.assertIn('l4', snapshot['phases'])
+        
+        # The rate covers only what was sent since the previous snapshot
+        self.assertEqual(metrics.snapshot()['layers']['l4']['probes_per_second'], 0)
+    
+    def test_merge_from_another_process(self):
+        worker = ScanMetrics()
+        worker.record_sent('l3', 10)
+        worker.record_outcome('l3', 'alive', 0.01, count=4)
+        worker.watch_queue('l4', lambda: 1)
+        worker = pickle.loads(pickle.dumps(worker))
+        
+        metrics = ScanMetrics()
+        metrics.record_outcome('l3', 'alive', 0.01)
+        metrics.merge(worker)
+        metrics.merge(worker)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['layers']['l3']['sent'], 20)
+        self.assertEqual(snapshot['layers']['l3']['outcomes'], {'alive': 9})
+        self.assertEqual(snapshot['layers']['l3']['rtt']['count'], 9)
+    
+    def test_prometheus_text(self):
+        metrics = ScanMetrics()
+        metrics.record_sent('l4', 3)
+        metrics.record_outcome('l4', 'open', 0.0002)
+        metrics.record_outcome('l4', 'closed', 0.02, count=2)
+        text = PrometheusTextExporter(None).render(metrics.snapshot())
+        
+        self.assertIn('# TYPE network_scanner_rtt_seconds histogram', text)
+        self.assertIn('network_scanner_probes_sent_total{layer="l4"} 3', text)
+        self.assertIn('network_scanner_probe_outcomes_total{layer="l4",outcome="closed"} 2', text)
+        # Buckets are cumulative and end with +Inf holding the count
+        self.assertIn('network_scanner_rtt_seconds_bucket{layer="l4",le="0.0005"} 1', text)
+        self.assertIn('network_scanner_rtt_seconds_bucket{layer="l4",le="0.025"} 3', text)
+        self.assertIn('network_scanner_rtt_seconds_bucket{layer="l4",le="+Inf"} 3', text)
+        self.assertIn('network_scanner_rtt_seconds_count{layer="l4"} 3', text)
+    
+    def test_exports_while_running(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            jsonl, prom = os.path.join(temp_dir, "metrics.jsonl"), os.path.join(temp_dir, "metrics.prom")
+            metrics = ScanMetrics()
+            metrics.start_exporting([JsonLinesExporter(jsonl), PrometheusTextExporter(prom)], interval=0.05)
+            metrics.record_sent('l3', 5)
+            time.sleep(0.2)
+            metrics.record_sent('l3', 5)
+            metrics.stop_exporting()
+            
+            with open(jsonl) as f:
+                snapshots = [json.loads(line) for line in f]
+            with open(prom) as f:
+                text = f.read()
+            # The Prometheus file is replaced whole; no temporary file is left behind
+            self.assertEqual(sorted(os.listdir(temp_dir)), ["metrics.jsonl", "metrics.prom"])
+        
+        self.assertGreaterEqual(len(snapshots), 3)
+        self.assertEqual(snapshots[-1]['layers']['l3']['sent'], 10)
+        self.assertIn('network_scanner_probes_sent_total{layer="l3"} 10', text)
+    
+    def test_port_scanner_records(self):
+        listener = listen("127.0.0.1")
+        try:
+            ports = [listener.getsockname()[1], free_port("127.0.0.1")]
+            metrics = ScanMetrics()
+            asyncio.run(AsyncPortScanner(concurrency=10, metrics=metrics).scan(["127.0.0.1", "127.0.0.2"], ports))
+        finally:
+            listener.close()
+        
+        layer = metrics.snapshot()['layers']['l4']
+        self.assertEqual(layer['sent'], 4)
+        self.assertEqual(layer['outcomes'], {'open': 1, 'closed': 3})
+        self.assertEqual(layer['rtt']['count'], 4)
+
+if __name__ == "__main__":
+    unittest.main()
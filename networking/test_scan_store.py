@@ -0,0 +1,89 @@
+import unittest
+import os
+import tempfile
+from scan_store import Change, ScanStore
+
+PORTS = [22, 80, 443]
+
+def results(hosts):
+    """Scanner results for {ip: (mac, {port: service})}"""
+    scan = {'l2': {}, 'l3': {}, 'l4': {}, 'l7': {}}
+    for ip, (mac, services) in hosts.items():
+        if mac:
+            scan['l2'][ip] = {'mac_address': mac, 'vendor': 'Unknown Vendor'}
+        scan['l3'][ip] = {'status': 'active', 'rtt_ms': 1.5}
+        scan['l4'][ip] = {'open_ports': {port: True for port in services}}
+        scan['l7'][ip] = {'services': dict(services)}
+    return scan
+
+class TestScanStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "scans.db")
+        self.store = ScanStore(self.path)
+    
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+    
+    def test_first_scan_reports_new_hosts_and_ports(self):
+        scan = results({"10.0.0.2": ("aa:aa:aa:00:00:02", {22: "SSH"}), "10.0.0.10": (None, {})})
+        changes = self.store.record_scan("10.0.0.0/24", scan, scan['l4'], PORTS, started=0)
+        self.assertEqual(changes, [Change('new_host', '10.0.0.2', new='aa:aa:aa:00:00:02'),
+                                   Change('new_host', '10.0.0.10'),
+                                   Change('port_opened', '10.0.0.2', 22, new='SSH')])
+    
+    def test_changes_between_scans(self):
+        http = {'type': 'HTTP', 'status_code': 200, 'server': 'nginx', 'title': 'Home'}
+        first = results({"10.0.0.2": ("aa:aa:aa:00:00:02", {22: "SSH", 80: http}),
+                         "10.0.0.3": (None, {443: "HTTPS"}),
+                         "10.0.1.9": (None, {})})
+        self.store.record_scan("10.0.0.0/23", first, first['l4'], PORTS)
+        
+        second = results({"10.0.0.2": ("aa:aa:aa:00:00:99", {80: dict(http, server='Apache')}),
+                          "10.0.0.4": (None, {})})
+        changes = self.store.record_scan("10.0.0.0/24", second, second['l4'], PORTS)
+        
+        # 10.0.1.9 is outside the rescanned network, so it is not marked down
+        self.assertEqual([str(change) for change in changes], [
+            "mac changed: 10.0.0.2 (aa:aa:aa:00:00:02 -> aa:aa:aa:00:00:99)",
+            "new host: 10.0.0.4",
+            "host down: 10.0.0.3",
+            "port closed: 10.0.0.2:22 (SSH -> None)",
+            "service changed: 10.0.0.2:80 (HTTP nginx Home -> HTTP Apache Home)",
+        ])
+        self.assertEqual(self.store.changes_since(0)[-5:], changes)
+    
+    def test_plan_rescan(self):
+        scan = results({"10.0.0.2": (None, {22: "SSH"}), "10.0.0.3": (None, {}), "10.0.0.4": (None, {80: "HTTP"})})
+        self.store.record_scan("10.0.0.0/24", scan, ["10.0.0.2", "10.0.0.3"], PORTS)
+        self.store.db.execute("UPDATE hosts SET ports_checked = 100 WHERE ip = '10.0.0.3'")
+        self.store.db.commit()
+        
+        alive = {"10.0.0.2": None, "10.0.0.3": None, "10.0.0.4": None, "10.0.0.5": None}
+        plan = self.store.plan_rescan("10.0.0.0/24", alive, max_age=3600)
+        # 10.0.0.4 was seen but never port scanned; 10.0.0.5 is new
+        self.assertEqual(plan.changed, ["10.0.0.4", "10.0.0.5"])
+        self.assertEqual(plan.stale, ["10.0.0.3"])
+        self.assertEqual(plan.cached, {"10.0.0.2": {'open_ports': {22: True}, 'services': {22: "SSH"}}})
+        
+        # A different MAC means a different device behind the address
+        self.store.record_scan("10.0.0.0/24", results({"10.0.0.2": ("aa:aa:aa:00:00:02", {22: "SSH"})}))
+        plan = self.store.plan_rescan("10.0.0.0/24", {"10.0.0.2": "bb:bb:bb:00:00:02"}, max_age=3600)
+        self.assertEqual(plan.reprobe, ["10.0.0.2"])
+    
+    def test_persists_and_separates_address_families(self):
+        scan = results({"10.0.0.2": (None, {22: "SSH"}), "a00::1": (None, {80: "HTTP"})})
+        self.store.record_scan("10.0.0.0/24", scan, ["10.0.0.2"], PORTS)
+        self.store.record_scan("a00::/64", scan, ["a00::1"], PORTS)
+        self.store.close()
+        
+        self.store = ScanStore(self.path)
+        plan = self.store.plan_rescan("10.0.0.0/8", {"10.0.0.2": None}, max_age=3600)
+        self.assertEqual(plan.cached, {"10.0.0.2": {'open_ports': {22: True}, 'services': {22: "SSH"}}})
+        # The IPv6 address starts with the same bytes as 10.0.0.0 but is not in the IPv4 network
+        changes = self.store.record_scan("10.0.0.0/8", results({}))
+        self.assertEqual(changes, [Change('host_down', '10.0.0.2')])
+
+if __name__ == "__main__":
+    unittest.main()
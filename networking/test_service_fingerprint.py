@@ -0,0 +1,150 @@
+import unittest
+import asyncio
+from service_fingerprint import ConnectionPool, ServiceFingerprinter, classify_banner, find_title
+
+PAGE = b"<html><head><TITLE lang=en>\n  Router &amp; Admin </TITLE></head><body>"
+
+class Server:
+    """A loopback TCP server running handler(reader, writer), counting connections"""
+    
+    def __init__(self, handler):
+        self.handler = handler
+        self.connections = 0
+    
+    async def __aenter__(self):
+        async def handle(reader, writer):
+            self.connections += 1
+            try:
+                await self.handler(reader, writer)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                writer.close()
+        
+        self.server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+        await self.server.wait_closed()
+
+async def read_request(reader):
+    request = b""
+    while not request.endswith(b"\r\n\r\n"):
+        request += await reader.readline()
+    return request
+
+class TestServiceFingerprinter(unittest.TestCase):
+    def test_find_title(self):
+        self.assertEqual(find_title(PAGE), "Router & Admin")
+        self.assertIsNone(find_title(b"<html><title>Cut off"))
+        self.assertIsNone(find_title(b"no title here"))
+    
+    def test_classify_banner(self):
+        self.assertEqual(classify_banner("SSH-2.0-OpenSSH_9.6", 2222), "SSH")
+        self.assertEqual(classify_banner("220 (vsFTPd 3.0.5)", 2121), "FTP")
+        self.assertEqual(classify_banner("220 mail.example.com ESMTP Postfix", 2525), "SMTP")
+        self.assertEqual(classify_banner("hello", 25), "SMTP")
+        self.assertEqual(classify_banner("hello", 9999), "Unknown")
+    
+    def test_banner(self):
+        async def greet(reader, writer):
+            writer.write(b"SSH-2.0-Test_1.0\r\n")
+            await writer.drain()
+            await reader.read()
+        
+        async def main():
+            async with Server(greet) as server:
+                return await ServiceFingerprinter().identify("127.0.0.1", server.port)
+        
+        self.assertEqual(asyncio.run(main()), {'type': 'SSH', 'banner': 'SSH-2.0-Test_1.0'})
+    
+    def test_http_read_stops_at_title(self):
+        sent = []
+        
+        async def large_page(reader, writer):
+            request = await read_request(reader)
+            self.assertIn(b"Range: bytes=0-16383", request)
+            writer.write(b"HTTP/1.1 200 OK\r\nServer: test/1.0\r\nContent-Length: 67108864\r\n\r\n" + PAGE)
+            total = len(PAGE)
+            while total < 64 << 20:
+                writer.write(b"x" * 65536)
+                await writer.drain()
+                total += 65536
+                sent.append(total)
+        
+        async def main():
+            async with Server(large_page) as server:
+                fingerprinter = ServiceFingerprinter(banner_wait=0.05)
+                return await fingerprinter.identify("127.0.0.1", server.port)
+        
+        service = asyncio.run(main())
+        self.assertEqual(service, {'type': 'HTTP', 'status_code': 200, 'server': 'test/1.0', 'title': 'Router & Admin'})
+        # The client hung up long before the 64MB body was sent
+        self.assertLess(sent[-1], 16 << 20)
+    
+    def test_check_http_on_any_port(self):
+        async def page(reader, writer):
+            await read_request(reader)
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(PAGE) + PAGE)
+            await writer.drain()
+        
+        async def main():
+            async with Server(page) as server:
+                # No banner wait: the port is probed as HTTP straight away
+                fingerprinter = ServiceFingerprinter(timeout=1.0, banner_wait=5.0)
+                return await fingerprinter.check_http("127.0.0.1", server.port)
+        
+        service = asyncio.run(main())
+        self.assertEqual(service, {'type': 'HTTP', 'status_code': 200, 'server': 'Unknown', 'title': 'Router & Admin'})
+    
+    def test_keep_alive_connection_reused(self):
+        async def small_pages(reader, writer):
+            for _ in range(2):
+                await read_request(reader)
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 5\r\n\r\nnope!")
+                await writer.drain()
+            await reader.read()
+        
+        async def main():
+            async with Server(small_pages) as server:
+                pool = ConnectionPool()
+                fingerprinter = ServiceFingerprinter(banner_wait=0.05, pool=pool)
+                # The first probe waits out the banner and tries HTTP; the second goes straight to HTTP
+                services = [await fingerprinter.identify("127.0.0.1", server.port) for _ in range(2)]
+                pool.close()
+                return server.connections, pool, services
+        
+        connections, pool, services = asyncio.run(main())
+        self.assertEqual(services, [{'type': 'HTTP', 'status_code': 404, 'server': 'Unknown', 'title': 'No title'}] * 2)
+        self.assertEqual((connections, pool.opened, pool.reused), (1, 1, 1))
+    
+    def test_results_delivered_as_they_complete(self):
+        async def slow(reader, writer):
+            await asyncio.sleep(0.3)
+            writer.write(b"220 slow FTP ready\r\n")
+            await writer.drain()
+        
+        async def fast(reader, writer):
+            writer.write(b"220 fast ESMTP ready\r\n")
+            await writer.drain()
+        
+        async def silent(reader, writer):
+            await reader.read()
+        
+        async def main():
+            order = []
+            async with Server(slow) as slow_server, Server(fast) as fast_server, Server(silent) as silent_server:
+                targets = [("127.0.0.1", slow_server.port), ("127.0.0.1", fast_server.port),
+                           ("127.0.0.1", silent_server.port)]
+                fingerprinter = ServiceFingerprinter(timeout=0.2, banner_wait=0.5)
+                await fingerprinter.identify_all(targets, lambda ip, port, service: order.append(service))
+            return order
+        
+        self.assertEqual(asyncio.run(main()), [{'type': 'SMTP', 'banner': '220 fast ESMTP ready'},
+                                               {'type': 'FTP', 'banner': '220 slow FTP ready'},
+                                               "Unknown"])
+
+if __name__ == "__main__":
+    unittest.main()
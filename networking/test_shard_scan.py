@@ -0,0 +1,77 @@
+import unittest
+import asyncio
+import ipaddress
+import multiprocessing
+import time
+from itertools import chain, islice
+from shard_scan import GlobalRateLimiter, ShardCoordinator, ShardOptions, shard_count, shard_hosts, shard_network
+from test_port_scanner import free_port, listen
+
+def take_slots(limiter, count, times):
+    async def take():
+        for _ in range(count):
+            await limiter.acquire()
+            times.append(time.monotonic())
+    asyncio.run(take())
+
+class TestShards(unittest.TestCase):
+    def test_shards_are_generated_lazily(self):
+        started = time.monotonic()
+        first = list(islice(shard_network("10.0.0.0/8", 24), 3))
+        self.assertEqual([str(shard) for shard in first], ["10.0.0.0/24", "10.0.1.0/24", "10.0.2.0/24"])
+        self.assertEqual(next(shard_hosts(first[0], "10.0.0.0/8")), "10.0.0.1")
+        self.assertEqual(shard_count("10.0.0.0/8", 24), 65536)
+        self.assertLess(time.monotonic() - started, 0.1)
+    
+    def test_shards_cover_exactly_the_hosts(self):
+        for network, prefix in [("10.0.0.0/22", 24), ("10.0.0.0/24", 20), ("fd00::/120", 124), ("10.0.0.0/31", 32), ("fd00::/127", 128)]:
+            shards = list(shard_network(network, prefix))
+            self.assertEqual(len(shards), shard_count(network, prefix))
+            hosts = list(chain.from_iterable(shard_hosts(shard, network) for shard in shards))
+            self.assertEqual(hosts, [str(ip) for ip in ipaddress.ip_network(network).hosts()], network)
+
+class TestShardCoordinator(unittest.TestCase):
+    def test_rate_limit_is_shared_across_processes(self):
+        next_slot = multiprocessing.Value('d', 0.0)
+        times = multiprocessing.Manager().list()
+        workers = [multiprocessing.Process(target=take_slots, args=(GlobalRateLimiter(500, next_slot, batch=10), 100, times))
+                   for _ in range(3)]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        # 300 slots at 500 per second, however they were split between the processes
+        self.assertEqual(len(times), 300)
+        self.assertGreaterEqual(max(times) - started, 299 / 500 - 0.01)
+        self.assertLess(max(times) - started, 1.5)
+    
+    def test_merges_shards_into_results(self):
+        listeners = [listen("127.0.1.5"), listen("127.0.2.9")]
+        try:
+            open_ports = {sock.getsockname()[0]: sock.getsockname()[1] for sock in listeners}
+            ports = sorted(set(open_ports.values()) | {free_port("127.0.0.1")})
+            options = ShardOptions(ports, ping=False, timeout=0.5, concurrency=100, l7_timeout=0.2)
+            coordinator = ShardCoordinator(options, workers=2, shard_prefix=24, rate=5000)
+            
+            results = {'l2': {}, 'l3': {}, 'l4': {}, 'l7': {}}
+            shards = []
+            started = time.monotonic()
+            coordinator.run("127.0.0.0/22", results, lambda shard: shards.append(shard.shard))
+            elapsed = time.monotonic() - started
+        finally:
+            for sock in listeners:
+                sock.close()
+        
+        self.assertEqual(sorted(shards), ["127.0.0.0/24", "127.0.1.0/24", "127.0.2.0/24", "127.0.3.0/24"])
+        self.assertEqual(len(results['l4']), 1022)
+        self.assertEqual({ip: list(data['open_ports']) for ip, data in results['l4'].items() if data['open_ports']},
+                         {ip: [port] for ip, port in open_ports.items()})
+        self.assertEqual(set(results['l7']), set(results['l4']))
+        self.assertEqual(coordinator.failed, [])
+        # Every connect, from either worker, came out of the one 5000 per second budget
+        self.assertGreaterEqual(elapsed, 1022 * len(ports) / 5000)
+
+if __name__ == "__main__":
+    unittest.main()
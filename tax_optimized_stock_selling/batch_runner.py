@@ -0,0 +1,314 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, asdict
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from price_providers import (PriceProvider, CachedPriceProvider, FallbackPriceProvider, FilePriceProvider,
+                             StaticPriceProvider, YFinanceProvider)
+from tax_optimized_stock_selling import (LotTable, TaxOptimizer, iter_lot_table_chunks, SOLVER_HEURISTIC,
+                                         PRICE_CACHE_FILE)
+
+
+# LotTable constructor arguments, in order, as attribute names
+LOT_TABLE_ARGS = ("index", "quantity", "cost_basis_per_share", "acquired_ordinal", "symbol_code")
+
+
+@dataclass
+class BatchJob:
+    """One account to optimize: a lots CSV, the amount to raise and the account's tax rates"""
+    lots_file: str
+    target_amount: float
+    tax_rates: Dict[str, float]
+    job_id: Optional[str] = None
+    solver: str = SOLVER_HEURISTIC
+    
+    def __post_init__(self):
+        if self.job_id is None:
+            self.job_id = self.lots_file
+
+
+@dataclass
+class BatchResult:
+    """Outcome and timings of one job"""
+    job_id: str
+    lots_file: str
+    target_amount: float
+    total_proceeds: float = 0.0
+    total_tax: float = 0.0
+    sales: List[Tuple[int, float]] = field(default_factory=list)
+    num_lots: int = 0
+    load_seconds: float = 0.0      # Loading the job's CSV in the parent (shared by jobs on the same file)
+    solve_seconds: float = 0.0     # Building the optimizer and solving, in the worker
+    elapsed_seconds: float = 0.0   # Time since the batch started when the result came back
+    worker_pid: Optional[int] = None
+    error: Optional[str] = None
+
+
+class SharedLotTable:
+    """
+    The columns of a LotTable copied into one shared memory block.
+    
+    Worker processes attach to the block by name and slice their job's rows out of it
+    as zero-copy LotTable views, so no lot data is pickled per job.
+    """
+    
+    # Column name and dtype, widest first so every column stays aligned
+    COLUMNS = (("index", np.int64), ("acquired_ordinal", np.int64), ("quantity", np.float64),
+               ("cost_basis_per_share", np.float64), ("symbol_code", np.int32))
+    
+    def __init__(self, shm: shared_memory.SharedMemory, num_rows: int, symbols: List[str]):
+        self.shm = shm
+        self.num_rows = num_rows
+        self.symbols = symbols
+        
+        self.columns = {}
+        offset = 0
+        for name, dtype in self.COLUMNS:
+            self.columns[name] = np.ndarray((num_rows,), dtype=dtype, buffer=shm.buf, offset=offset)
+            offset += num_rows * np.dtype(dtype).itemsize
+    
+    @classmethod
+    def nbytes(cls, num_rows: int) -> int:
+        return sum(num_rows * np.dtype(dtype).itemsize for _, dtype in cls.COLUMNS)
+    
+    @classmethod
+    def create(cls, table: LotTable) -> "SharedLotTable":
+        """Allocate a block and copy the table into it"""
+        # SharedMemory refuses zero-sized blocks
+        shm = shared_memory.SharedMemory(create=True, size=max(cls.nbytes(len(table)), 1))
+        shared = cls(shm, len(table), table.symbols)
+        for name, _ in cls.COLUMNS:
+            shared.columns[name][:] = getattr(table, name)
+        return shared
+    
+    @classmethod
+    def attach(cls, name: str, num_rows: int, symbols: List[str]) -> "SharedLotTable":
+        """Attach to a block created by another process"""
+        # Pool workers share the creating process's resource tracker, so the block is
+        # still only unlinked once, by the creator
+        return cls(shared_memory.SharedMemory(name=name), num_rows, symbols)
+    
+    def table(self, start: int, stop: int) -> LotTable:
+        """Return rows [start, stop) as a LotTable backed by the shared block"""
+        return LotTable(*(self.columns[name][start:stop] for name in LOT_TABLE_ARGS), self.symbols)
+    
+    def close(self):
+        self.columns = {}
+        self.shm.close()
+    
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+
+
+# Per-process state set up once by _init_worker
+_worker_lots: Optional[SharedLotTable] = None
+_worker_prices: Dict[str, float] = {}
+
+
+def _init_worker(shm_name: str, num_rows: int, symbols: List[str], current_prices: Dict[str, float]):
+    """Attach to the shared lot block and keep the read-only price map for every job in this worker"""
+    global _worker_lots, _worker_prices
+    _worker_lots = SharedLotTable.attach(shm_name, num_rows, symbols)
+    _worker_prices = current_prices
+
+
+def _run_job(job: BatchJob, start: int, stop: int) -> BatchResult:
+    """Optimize one job against its slice of the shared lot block"""
+    result = BatchResult(job.job_id, job.lots_file, job.target_amount, num_lots=stop - start, worker_pid=os.getpid())
+    
+    started = time.perf_counter()
+    try:
+        optimizer = TaxOptimizer(_worker_lots.table(start, stop), _worker_prices, job.tax_rates, solver=job.solver)
+        (_, result.total_proceeds, result.total_tax, result.sales), = optimizer.optimize_sales_batch([job.target_amount])
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.solve_seconds = time.perf_counter() - started
+    
+    return result
+
+
+def _load_file(lots_file: str) -> Tuple[str, Tuple[np.ndarray, ...], List[str], Dict[str, float], float, Optional[str]]:
+    """
+    Load one lots file, returning its columns rather than the table to keep the pickle small.
+    
+    A file that cannot be read comes back empty with the error, rather than as an empty
+    account (as load_lot_table_from_csv would), so its jobs are reported as failed.
+    """
+    started = time.perf_counter()
+    implied_prices: Dict[str, float] = {}
+    error = None
+    try:
+        table = LotTable.concatenate(iter_lot_table_chunks(lots_file, implied_prices=implied_prices))
+    except Exception as e:
+        table, implied_prices, error = LotTable.from_lots([]), {}, f"{type(e).__name__}: {e}"
+    columns = tuple(getattr(table, name) for name in LOT_TABLE_ARGS)
+    return lots_file, columns, table.symbols, implied_prices, time.perf_counter() - started, error
+
+
+def load_jobs(jobs: List[BatchJob], max_workers: Optional[int] = None
+              ) -> Tuple[LotTable, Dict[str, Tuple[int, int]], Dict[str, float], Dict[str, float], Dict[str, str]]:
+    """
+    Load every distinct lots file once, in parallel, and stack them into a single table.
+    
+    Returns (table, {lots_file: (start_row, stop_row)}, {lots_file: load_seconds}, CSV-implied prices,
+    {lots_file: error} for files that could not be loaded).
+    """
+    lots_files = list(dict.fromkeys(job.lots_file for job in jobs))
+    tables, row_ranges, load_seconds, load_errors = [], {}, {}, {}
+    implied_prices: Dict[str, float] = {}
+    num_rows = 0
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # map keeps the files in order, so row ranges do not depend on completion order
+        for lots_file, columns, symbols, file_prices, seconds, error in executor.map(_load_file, lots_files):
+            load_seconds[lots_file] = seconds
+            if error is not None:
+                load_errors[lots_file] = error
+            tables.append(LotTable(*columns, symbols))
+            row_ranges[lots_file] = (num_rows, num_rows + len(columns[0]))
+            num_rows += len(columns[0])
+            for symbol, price in file_prices.items():
+                implied_prices.setdefault(symbol, price)
+    
+    return LotTable.concatenate(tables), row_ranges, load_seconds, implied_prices, load_errors
+
+
+def run_batch(jobs: Iterable[BatchJob], price_provider: Optional[PriceProvider] = None,
+              max_workers: Optional[int] = None) -> Iterator[BatchResult]:
+    """
+    Optimize many jobs on a process pool, yielding each result as soon as it completes.
+    
+    Each distinct lots file is loaded once (also on a process pool) and the lots are
+    shared with the solving workers through shared memory. Prices are fetched once for every symbol in the batch (falling back to the
+    prices implied by the CSVs) and handed to each worker when it starts.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+    
+    batch_started = time.perf_counter()
+    table, row_ranges, load_seconds, implied_prices, load_errors = load_jobs(jobs, max_workers)
+    
+    symbols = [symbol for symbol in table.symbols if symbol]
+    csv_provider = StaticPriceProvider(implied_prices, name="CSV data")
+    provider = csv_provider if price_provider is None else FallbackPriceProvider([price_provider, csv_provider])
+    current_prices = provider.get_prices(symbols)
+    
+    missing_prices = [symbol for symbol in symbols if symbol not in current_prices]
+    if missing_prices:
+        print(f"Warning: Missing prices for symbols: {', '.join(missing_prices)}")
+    
+    shared = SharedLotTable.create(table)
+    del table
+    
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(shared.shm.name, shared.num_rows, shared.symbols, current_prices)) as executor:
+            futures = {executor.submit(_run_job, job, *row_ranges[job.lots_file]): job
+                       for job in jobs if job.lots_file not in load_errors}
+            
+            for job in jobs:
+                if job.lots_file in load_errors:
+                    yield BatchResult(job.job_id, job.lots_file, job.target_amount, error=load_errors[job.lots_file],
+                                      load_seconds=load_seconds[job.lots_file],
+                                      elapsed_seconds=time.perf_counter() - batch_started)
+            
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. killed for running out of memory)
+                    result = BatchResult(job.job_id, job.lots_file, job.target_amount, error=f"{type(e).__name__}: {e}")
+                
+                result.load_seconds = load_seconds[job.lots_file]
+                result.elapsed_seconds = time.perf_counter() - batch_started
+                yield result
+    finally:
+        shared.unlink()
+
+
+def read_jobs_file(filename: str) -> List[BatchJob]:
+    """
+    Read jobs from a CSV with columns lots_file, target_amount, short_term_rate and
+    long_term_rate, plus optional job_id and solver columns. Relative lots_file paths
+    are resolved against the jobs file's directory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(filename))
+    jobs = []
+    
+    with open(filename, "r", newline="") as f:
+        for line_number, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                jobs.append(BatchJob(
+                    lots_file=os.path.join(base_dir, row["lots_file"]),
+                    target_amount=float(row["target_amount"]),
+                    tax_rates={"short_term": float(row["short_term_rate"]), "long_term": float(row["long_term_rate"])},
+                    job_id=row.get("job_id") or None,
+                    solver=row.get("solver") or SOLVER_HEURISTIC,
+                ))
+            except (KeyError, ValueError) as e:
+                print(f"Warning: Skipping invalid job on line {line_number}: {e}")
+    
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the tax optimizer for many accounts in parallel")
+    parser.add_argument("jobs_file", help="CSV of jobs: lots_file,target_amount,short_term_rate,long_term_rate[,job_id,solver]")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--prices", help="JSON or CSV file of prices to use instead of fetching from yfinance")
+    parser.add_argument("--output", help="Write one JSON result per line to this file as jobs complete")
+    args = parser.parse_args()
+    
+    jobs = read_jobs_file(args.jobs_file)
+    if not jobs:
+        print("No valid jobs found. Exiting.")
+        return
+    
+    if args.prices:
+        price_provider = FilePriceProvider(args.prices)
+    else:
+        price_provider = CachedPriceProvider(YFinanceProvider(), PRICE_CACHE_FILE)
+    
+    output = open(args.output, "w") if args.output else None
+    started = time.perf_counter()
+    solve_seconds = 0.0
+    failed = 0
+    
+    print(f"{'Job':<30} {'Lots':<8} {'Proceeds':<14} {'Tax':<12} {'Solve (s)':<10} {'Elapsed (s)':<10}")
+    print("-" * 90)
+    
+    try:
+        for result in run_batch(jobs, price_provider, args.workers):
+            solve_seconds += result.solve_seconds
+            if result.error:
+                failed += 1
+                print(f"{result.job_id:<30} ERROR: {result.error}")
+            else:
+                print(f"{result.job_id:<30} {result.num_lots:<8} ${result.total_proceeds:<13.2f} "
+                      f"${result.total_tax:<11.2f} {result.solve_seconds:<10.4f} {result.elapsed_seconds:<10.2f}")
+            
+            if output:
+                output.write(json.dumps(asdict(result)) + "\n")
+                output.flush()
+    finally:
+        if output:
+            output.close()
+    
+    wall_seconds = time.perf_counter() - started
+    print("-" * 90)
+    print(f"{len(jobs)} jobs ({failed} failed) in {wall_seconds:.2f}s; "
+          f"{solve_seconds:.2f}s of solving ({solve_seconds / wall_seconds:.1f}x parallelism)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tax_optimized_stock_selling import (LotTable, TaxOptimizer, load_lot_table_from_csv, sales_report_rows,
+                                         write_sales_report, SOLVER_LP, OBJECTIVE_ZERO_TAX)
+
+
+def generate_lot_table(num_lots: int, num_symbols: int, seed: int = 0, gain_fraction: float = 0.5,
+                       long_term_fraction: float = 0.5) -> Tuple[LotTable, Dict[str, float]]:
+    """
+    Generate a random portfolio directly as a LotTable, fast enough for millions of lots.
+    
+    gain_fraction of the lots have a cost basis below the current price (50-100% of it)
+    and the rest above (100-150%); long_term_fraction of the lots were held for at least
+    a year (up to three), the rest for less than a year.
+    """
+    rng = np.random.default_rng(seed)
+    today = datetime.date.today().toordinal()
+    
+    symbols = [f"SYM{i}" for i in range(num_symbols)]
+    price_by_code = rng.uniform(20.0, 500.0, num_symbols)
+    codes = rng.integers(0, num_symbols, num_lots)
+    
+    is_gain = rng.random(num_lots) < gain_fraction
+    basis_ratio = np.where(is_gain, rng.uniform(0.5, 1.0, num_lots), rng.uniform(1.0, 1.5, num_lots))
+    
+    is_long_term = rng.random(num_lots) < long_term_fraction
+    days_held = np.where(is_long_term, rng.integers(365, 3 * 365, num_lots), rng.integers(1, 365, num_lots))
+    
+    table = LotTable(np.arange(num_lots), rng.integers(1, 201, num_lots).astype(np.float64),
+                     price_by_code[codes] * basis_ratio, today - days_held, codes, symbols)
+    return table, dict(zip(symbols, price_by_code.tolist()))
+
+
+def write_lots_csv(table: LotTable, current_prices: Dict[str, float], filename: str):
+    """Write a LotTable in the brokerage export layout read by load_lot_table_from_csv"""
+    prices = table.prices_for(current_prices)
+    gain_loss = (prices - table.cost_basis_per_share) * table.quantity
+    
+    # Only a few hundred distinct dates, so format each once
+    dates = {ordinal: datetime.date.fromordinal(ordinal).strftime('%m/%d/%Y')
+             for ordinal in np.unique(table.acquired_ordinal).tolist()}
+    
+    with open(filename, "w", newline="") as f:
+        f.write("Symbol,Quantity,Date Acquired,Cost Basis/Share,Unrealized G/L\n")
+        f.writelines(f"{table.symbols[code]},{quantity:g},{dates[ordinal]},${basis:.4f},${gl:.2f}\n"
+                     for code, quantity, ordinal, basis, gl in zip(table.symbol_code.tolist(), table.quantity.tolist(),
+                                                                   table.acquired_ordinal.tolist(),
+                                                                   table.cost_basis_per_share.tolist(), gain_loss.tolist()))
+
+
+def summarize(solution: List[Tuple[int, float, float, float]]) -> Tuple[float, float]:
+    """Return (total_proceeds, total_tax) for a solution"""
+    return sum(s[2] for s in solution), sum(s[3] for s in solution)
+
+
+def measure(func: Callable, track_memory: bool = True) -> Tuple[object, Dict[str, float]]:
+    """
+    Time one call of func, then (optionally) call it again under tracemalloc for its peak
+    allocation, so tracing overhead never inflates the timing.
+    
+    Returns (result of the timed call, {"seconds": ..., "peak_bytes": ...}).
+    """
+    start = time.perf_counter()
+    result = func()
+    stats = {"seconds": time.perf_counter() - start, "peak_bytes": None}
+    
+    if track_memory:
+        tracemalloc.start()
+        try:
+            func()
+            stats["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    
+    return result, stats
+
+
+def run_case(num_lots: int, num_symbols: int, gain_fraction: float, long_term_fraction: float,
+             target_fraction: float, tax_rates: Dict[str, float], seed: int = 0, exact_limit: int = 20000,
+             track_memory: bool = True, work_dir: Optional[str] = None) -> Dict:
+    """
+    Benchmark one synthetic portfolio phase by phase: CSV loading, optimizer construction,
+    optimize_for_zero_tax, fine_tune_for_zero_tax and report writing. The heuristic's tax
+    is compared to the exact LP optimum for portfolios of up to exact_limit lots.
+    """
+    table, current_prices = generate_lot_table(num_lots, num_symbols, seed, gain_fraction, long_term_fraction)
+    target_amount = float(table.prices_for(current_prices) @ table.quantity) * target_fraction
+    
+    with tempfile.TemporaryDirectory(dir=work_dir) as temp_dir:
+        csv_file = os.path.join(temp_dir, "lots.csv")
+        report_file = os.path.join(temp_dir, "report.txt")
+        write_lots_csv(table, current_prices, csv_file)
+        
+        phases = {}
+        (table, _), phases["csv_load"] = measure(lambda: load_lot_table_from_csv(csv_file), track_memory)
+        optimizer, phases["build"] = measure(lambda: TaxOptimizer(table, current_prices, tax_rates), track_memory)
+        initial, phases["optimize_for_zero_tax"] = measure(
+            lambda: optimizer.optimize_for_zero_tax(target_amount), track_memory)
+        solution, phases["fine_tune_for_zero_tax"] = measure(
+            lambda: optimizer.fine_tune_for_zero_tax(initial, target_amount), track_memory)
+        sales = [(idx, shares) for idx, shares, _, _ in solution]
+        _, phases["report"] = measure(
+            lambda: write_sales_report(report_file, sales_report_rows(optimizer, sales), target_amount), track_memory)
+    
+    proceeds, tax = summarize(solution)
+    result = {
+        "num_lots": num_lots,
+        "num_symbols": num_symbols,
+        "gain_fraction": gain_fraction,
+        "long_term_fraction": long_term_fraction,
+        "target_amount": target_amount,
+        "phases": phases,
+        "lots_sold": len(sales),
+        "proceeds": proceeds,
+        "tax": tax,
+        "exact_tax": None,
+        "exact_proceeds": None,
+        "optimality_gap": None,
+    }
+    
+    if num_lots <= exact_limit:
+        lp = TaxOptimizer(table, current_prices, tax_rates, solver=SOLVER_LP)
+        exact, phases["exact"] = measure(
+            lambda: lp.optimize_with_linear_program(target_amount, objective=OBJECTIVE_ZERO_TAX), track_memory=False)
+        if exact is not None:
+            result["exact_proceeds"], result["exact_tax"] = summarize(exact)
+            result["optimality_gap"] = abs(tax) - abs(result["exact_tax"])
+    
+    return result
+
+
+def find_regressions(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare results with a baseline run of the same cases and describe every phase that
+    got more than tolerance slower, and every case whose optimality gap grew by over $1.
+    """
+    def key(r):
+        return (r["num_lots"], r["num_symbols"], r["gain_fraction"], r["long_term_fraction"])
+    
+    baseline_by_key = {key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    
+    for r in results:
+        old = baseline_by_key.get(key(r))
+        if old is None:
+            continue
+        
+        for phase, stats in r["phases"].items():
+            old_seconds = old["phases"].get(phase, {}).get("seconds")
+            if old_seconds and stats["seconds"] > old_seconds * (1 + tolerance):
+                regressions.append(f"{key(r)} {phase}: {old_seconds:.4f}s -> {stats['seconds']:.4f}s")
+        
+        if r["optimality_gap"] is not None and old.get("optimality_gap") is not None \
+                and r["optimality_gap"] > old["optimality_gap"] + 1.0:
+            regressions.append(f"{key(r)} optimality gap: ${old['optimality_gap']:.2f} -> ${r['optimality_gap']:.2f}")
+    
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tax optimizer on synthetic portfolios")
+    parser.add_argument("--lots", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000, 1000000])
+    parser.add_argument("--symbols", type=int, nargs="+", default=[50])
+    parser.add_argument("--gain-fractions", type=float, nargs="+", default=[0.5],
+                        help="Fractions of lots with an unrealized gain")
+    parser.add_argument("--long-term-fractions", type=float, nargs="+", default=[0.5],
+                        help="Fractions of lots held for at least a year")
+    parser.add_argument("--target-fraction", type=float, default=0.1,
+                        help="Target amount as a fraction of the portfolio value")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--exact-limit", type=int, default=20000,
+                        help="Largest portfolio to solve exactly with the LP for the optimality gap")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak memory runs")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown per phase before it counts as a regression")
+    args = parser.parse_args()
+    
+    tax_rates = {"short_term": 0.35, "long_term": 0.15}
+    phase_names = ["csv_load", "build", "optimize_for_zero_tax", "fine_tune_for_zero_tax", "report"]
+    
+    print(f"{'Lots':<9} {'Syms':<6} {'Gain':<5} {'LT':<5} " + " ".join(f"{p[:12]:<12}" for p in phase_names)
+          + f" {'Peak MB':<9} {'Gap':<10}")
+    print("-" * 130)
+    
+    results = []
+    for num_lots in args.lots:
+        for num_symbols in args.symbols:
+            for gain_fraction in args.gain_fractions:
+                for long_term_fraction in args.long_term_fractions:
+                    r = run_case(num_lots, num_symbols, gain_fraction, long_term_fraction, args.target_fraction,
+                                 tax_rates, args.seed, args.exact_limit, not args.no_memory)
+                    results.append(r)
+        
+                    peaks = [stats["peak_bytes"] for stats in r["phases"].values() if stats["peak_bytes"] is not None]
+                    peak = f"{max(peaks) / 2**20:.1f}" if peaks else "-"
+                    gap = "-" if r["optimality_gap"] is None else f"${r['optimality_gap']:.2f}"
+                    print(f"{num_lots:<9} {num_symbols:<6} {gain_fraction:<5.2f} {long_term_fraction:<5.2f} "
+                          + " ".join(f"{r['phases'][p]['seconds']:<12.4f}" for p in phase_names)
+                          + f" {peak:<9} {gap:<10}")
+    
+    output = {
+        "metadata": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "target_fraction": args.target_fraction,
+            "tax_rates": tax_rates,
+            # ru_maxrss is in kilobytes on Linux
+            "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults saved to {os.path.abspath(args.output)}")
+    
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import abc
+import csv
+import datetime
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional
+
+import yfinance as yf
+
+
+class PriceProvider(abc.ABC):
+    """Source of current prices for a set of symbols"""
+    
+    name = "provider"
+    
+    @abc.abstractmethod
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """
+        Return current prices for as many of the symbols as this provider knows.
+        Symbols without a valid (positive) price are left out.
+        """
+
+
+class StaticPriceProvider(PriceProvider):
+    """Prices from an in-memory mapping, e.g. the prices implied by a lots CSV"""
+    
+    def __init__(self, prices: Dict[str, float], name: str = "static"):
+        self.prices = prices
+        self.name = name
+    
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        return {symbol: self.prices[symbol] for symbol in set(symbols)
+                if self.prices.get(symbol, 0) > 0}
+
+
+class FilePriceProvider(StaticPriceProvider):
+    """
+    Prices from a local file, for running offline or in tests.
+    
+    JSON files hold a {"SYMBOL": price} object; CSV files have Symbol and Price columns.
+    """
+    
+    def __init__(self, filename: str):
+        if filename.lower().endswith(".json"):
+            with open(filename, "r") as f:
+                prices = {symbol: float(price) for symbol, price in json.load(f).items()}
+        else:
+            with open(filename, "r", newline="") as f:
+                prices = {row["Symbol"]: float(row["Price"]) for row in csv.DictReader(f) if row.get("Symbol")}
+        
+        super().__init__(prices, name=os.path.basename(filename))
+
+
+class YFinanceProvider(PriceProvider):
+    """
+    Latest closing prices from Yahoo Finance.
+    
+    All symbols are requested in a single multi-ticker download first; any the batch
+    misses are retried one at a time on a bounded thread pool.
+    """
+    
+    name = "yfinance"
+    
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+    
+    def _download_batch(self, symbols: List[str]) -> Dict[str, float]:
+        """Fetch the latest close for every symbol in one multi-ticker request"""
+        data = yf.download(symbols, period="1d", progress=False, threads=True, auto_adjust=False)
+        if data is None or data.empty:
+            return {}
+        
+        closes = data["Close"]
+        if not hasattr(closes, "columns"):
+            # A single ticker may come back as a Series
+            closes = closes.to_frame(symbols[0])
+        
+        last = closes.ffill().iloc[-1]
+        return {symbol: float(last[symbol]) for symbol in symbols
+                if symbol in last.index and last[symbol] > 0}
+    
+    def _fetch_symbol(self, symbol: str) -> Optional[float]:
+        """Fetch the latest close for one symbol"""
+        hist = yf.Ticker(symbol).history(period="1d")
+        if hist.empty:
+            return None
+        return float(hist['Close'].iloc[-1])
+    
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        symbols = sorted({symbol for symbol in symbols if symbol})
+        if not symbols:
+            return {}
+        
+        try:
+            prices = self._download_batch(symbols)
+        except Exception as e:
+            print(f"Error fetching batch prices: {e}")
+            prices = {}
+        
+        missing = [symbol for symbol in symbols if symbol not in prices]
+        if not missing:
+            return prices
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+            futures = {executor.submit(self._fetch_symbol, symbol): symbol for symbol in missing}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    price = future.result()
+                except Exception as e:
+                    print(f"Error fetching price for {symbol}: {e}")
+                    continue
+                
+                if price and price > 0:
+                    prices[symbol] = price
+                else:
+                    print(f"Warning: Could not get current price for {symbol}")
+        
+        return prices
+
+
+class CachedPriceProvider(PriceProvider):
+    """
+    On-disk cache in front of another provider.
+    
+    Entries are keyed by symbol and trading date, so a price is never reused on a later
+    day, and expire after ttl_seconds within the day. Only symbols missing from the
+    cache are passed on to the wrapped provider.
+    """
+    
+    def __init__(self, provider: PriceProvider, cache_file: str, ttl_seconds: float = 15 * 60):
+        self.provider = provider
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self.name = f"cached {provider.name}"
+    
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self.cache_file, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    def _save(self, cache: Dict[str, Dict[str, float]]):
+        # Write to a temporary file first so a crash never leaves a truncated cache
+        temp_file = f"{self.cache_file}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(cache, f)
+        os.replace(temp_file, self.cache_file)
+    
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        symbols = {symbol for symbol in symbols if symbol}
+        trading_date = datetime.date.today().isoformat()
+        now = time.time()
+        
+        cache = self._load()
+        prices = {}
+        for symbol in symbols:
+            entry = cache.get(f"{symbol}|{trading_date}")
+            if entry and now - entry["fetched_at"] <= self.ttl_seconds:
+                prices[symbol] = entry["price"]
+        
+        missing = symbols - prices.keys()
+        if missing:
+            fetched = self.provider.get_prices(missing)
+            if fetched:
+                # Drop entries from earlier trading dates while updating
+                cache = {key: entry for key, entry in cache.items() if key.endswith(f"|{trading_date}")}
+                for symbol, price in fetched.items():
+                    cache[f"{symbol}|{trading_date}"] = {"price": price, "fetched_at": now}
+                self._save(cache)
+            prices.update(fetched)
+        
+        return prices
+
+
+class FallbackPriceProvider(PriceProvider):
+    """Ask each provider in turn for the symbols the previous ones could not price"""
+    
+    name = "fallback"
+    
+    def __init__(self, providers: List[PriceProvider]):
+        self.providers = providers
+    
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        missing = {symbol for symbol in symbols if symbol}
+        prices = {}
+        
+        for provider in self.providers:
+            if not missing:
+                break
+            
+            try:
+                found = provider.get_prices(missing)
+            except Exception as e:
+                print(f"Error fetching prices from {provider.name}: {e}")
+                continue
+            
+            prices.update(found)
+            missing -= found.keys()
+        
+        return prices
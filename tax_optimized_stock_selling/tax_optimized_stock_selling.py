@@ -1,10 +1,14 @@
 import csv
 import datetime
-import yfinance as yf
+import itertools
+import operator
+import re
 import numpy as np
 from dataclasses import dataclass
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, Union
 import os
+from price_providers import (CachedPriceProvider, FallbackPriceProvider, StaticPriceProvider,
+                             YFinanceProvider)
 
 @dataclass
 class StockLot:
@@ -14,9 +18,9 @@ class StockLot:
     date_acquired: datetime.date
     cost_basis_per_share: float
     
-    def is_long_term(self) -> bool:
+    def is_long_term(self, as_of: Optional[datetime.date] = None) -> bool:
         """Returns True if this lot qualifies for long-term capital gains treatment"""
-        holding_period = datetime.date.today() - self.date_acquired
+        holding_period = (as_of or datetime.date.today()) - self.date_acquired
         return holding_period.days >= 365
     
     def unrealized_gain_loss_per_share(self, current_price: float) -> float:
@@ -31,12 +35,320 @@ class StockLot:
         return f"Lot {self.index}: {self.quantity} shares of {self.symbol}, acquired {self.date_acquired}, cost basis ${self.cost_basis_per_share:.2f}"
 
 
+class LotTable:
+    """
+    Columnar store of stock lots backed by parallel NumPy arrays.
+    
+    Each row holds a lot's index, quantity, cost basis per share, acquisition date
+    (as a proleptic Gregorian ordinal) and symbol code. Symbols are interned so that
+    per-symbol data such as prices is looked up once per symbol rather than once per lot.
+    Iterating or indexing the table yields StockLot views for compatibility.
+    """
+    
+    def __init__(self, indices: Iterable[int], quantities: Iterable[float],
+                 cost_basis_per_share: Iterable[float], acquired_ordinals: Iterable[int],
+                 symbol_codes: Iterable[int], symbols: List[str]):
+        self.index = np.asarray(indices, dtype=np.int64)
+        self.quantity = np.asarray(quantities, dtype=np.float64)
+        self.cost_basis_per_share = np.asarray(cost_basis_per_share, dtype=np.float64)
+        self.acquired_ordinal = np.asarray(acquired_ordinals, dtype=np.int64)
+        self.symbol_code = np.asarray(symbol_codes, dtype=np.int32)
+        self.symbols = list(symbols)
+        
+        # Lot index -> row, keeping the first row if an index repeats
+        n = len(self.index)
+        self._row_by_index = dict(zip(self.index[::-1].tolist(), range(n - 1, -1, -1)))
+        self._rows_by_code = None
+    
+    @classmethod
+    def from_lots(cls, stock_lots: Iterable[StockLot]) -> "LotTable":
+        """Build a table from StockLot objects"""
+        symbol_codes: Dict[str, int] = {}
+        indices, quantities, cost_basis, ordinals, codes = [], [], [], [], []
+        
+        for lot in stock_lots:
+            indices.append(lot.index)
+            quantities.append(lot.quantity)
+            cost_basis.append(lot.cost_basis_per_share)
+            ordinals.append(lot.date_acquired.toordinal())
+            codes.append(symbol_codes.setdefault(lot.symbol, len(symbol_codes)))
+        
+        return cls(indices, quantities, cost_basis, ordinals, codes, list(symbol_codes))
+    
+    @classmethod
+    def concatenate(cls, tables: Iterable["LotTable"]) -> "LotTable":
+        """Stack tables row-wise, merging their symbol vocabularies"""
+        symbol_codes: Dict[str, int] = {}
+        indices, quantities, cost_basis, ordinals, codes = [], [], [], [], []
+        
+        for table in tables:
+            # Remap this table's symbol codes into the merged vocabulary
+            remap = np.array([symbol_codes.setdefault(symbol, len(symbol_codes)) for symbol in table.symbols],
+                             dtype=np.int32)
+            indices.append(table.index)
+            quantities.append(table.quantity)
+            cost_basis.append(table.cost_basis_per_share)
+            ordinals.append(table.acquired_ordinal)
+            codes.append(remap[table.symbol_code] if len(remap) else table.symbol_code)
+        
+        if not indices:
+            return cls([], [], [], [], [], [])
+        
+        return cls(np.concatenate(indices), np.concatenate(quantities), np.concatenate(cost_basis),
+                   np.concatenate(ordinals), np.concatenate(codes), list(symbol_codes))
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    def __getitem__(self, row: int) -> StockLot:
+        return StockLot(
+            index=int(self.index[row]),
+            quantity=float(self.quantity[row]),
+            symbol=self.symbols[self.symbol_code[row]],
+            date_acquired=datetime.date.fromordinal(int(self.acquired_ordinal[row])),
+            cost_basis_per_share=float(self.cost_basis_per_share[row])
+        )
+    
+    def __iter__(self) -> Iterator[StockLot]:
+        for row in range(len(self)):
+            yield self[row]
+    
+    def row_of(self, lot_index: int) -> Optional[int]:
+        """Return the row holding the given lot index, or None if it is not in the table"""
+        return self._row_by_index.get(lot_index)
+    
+    def lot(self, lot_index: int) -> Optional[StockLot]:
+        """Return a StockLot view for the given lot index, or None if it is not in the table"""
+        row = self.row_of(lot_index)
+        return None if row is None else self[row]
+    
+    def symbol_of(self, row: int) -> str:
+        """Return the symbol for a row"""
+        return self.symbols[self.symbol_code[row]]
+    
+    def rows_for_symbols(self, symbols: Iterable[str]) -> np.ndarray:
+        """Return the rows holding any of the given symbols, in row order"""
+        if self._rows_by_code is None:
+            # Group rows by symbol once; each symbol's rows are then a contiguous slice
+            order = np.argsort(self.symbol_code, kind="stable")
+            bounds = np.searchsorted(self.symbol_code[order], np.arange(len(self.symbols) + 1))
+            self._rows_by_code = (order, bounds)
+        
+        order, bounds = self._rows_by_code
+        code_by_symbol = {symbol: code for code, symbol in enumerate(self.symbols)}
+        codes = sorted(code_by_symbol[symbol] for symbol in set(symbols) if symbol in code_by_symbol)
+        if not codes:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate([order[bounds[code]:bounds[code + 1]] for code in codes]))
+    
+    def prices_for(self, current_prices: Dict[str, float], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the current price of every row, or of the given rows (0 where the symbol has no price)"""
+        codes = self.symbol_code if rows is None else self.symbol_code[rows]
+        if not len(self.symbols):
+            return np.zeros(len(codes))
+        price_by_code = np.array([current_prices.get(symbol, 0) for symbol in self.symbols], dtype=np.float64)
+        return price_by_code[codes]
+    
+    def long_term_mask(self, as_of: Optional[datetime.date] = None) -> np.ndarray:
+        """Return a boolean mask of rows that qualify for long-term treatment"""
+        as_of_ordinal = (as_of or datetime.date.today()).toordinal()
+        return (as_of_ordinal - self.acquired_ordinal) >= 365
+    
+    def tax_per_share(self, current_prices: Dict[str, float], tax_rates: Dict[str, float],
+                      as_of: Optional[datetime.date] = None) -> np.ndarray:
+        """Return the tax per share sold for every row (negative for losses)"""
+        rates = np.where(self.long_term_mask(as_of), tax_rates["long_term"], tax_rates["short_term"])
+        return (self.prices_for(current_prices) - self.cost_basis_per_share) * rates
+
+
+class SaleFrontier:
+    """
+    Lots in the order they should be sold, with prefix sums of proceeds and tax.
+    
+    Selling greedily along the frontier until an amount is raised sells every lot
+    whose cumulative proceeds fall short of the amount in full, plus part of the next
+    lot. The prefix sums let totals for any amount be found by binary search instead
+    of walking the lots.
+    """
+    
+    def __init__(self, rows: np.ndarray, prices: np.ndarray, quantities: np.ndarray,
+                 tax_per_share: np.ndarray):
+        self.rows = rows
+        self.prices = prices[rows]
+        self.quantities = quantities[rows]
+        self.tax_per_share = tax_per_share[rows]
+        self.cumulative_proceeds = np.cumsum(self.quantities * self.prices)
+        self.cumulative_tax = np.cumsum(self.quantities * self.tax_per_share)
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def totals(self, amounts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (proceeds, tax) from selling along the frontier to raise each amount"""
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if len(self) == 0:
+            return np.zeros_like(amounts), np.zeros_like(amounts)
+        
+        # First lot whose cumulative proceeds reach the amount; lots before it sell in full
+        k = np.searchsorted(self.cumulative_proceeds, amounts, side="left")
+        full_proceeds = np.where(k > 0, self.cumulative_proceeds[np.maximum(k - 1, 0)], 0.0)
+        full_tax = np.where(k > 0, self.cumulative_tax[np.maximum(k - 1, 0)], 0.0)
+        
+        # Part of lot k covers the rest, unless the frontier is exhausted
+        partial = k < len(self)
+        k_clipped = np.minimum(k, len(self) - 1)
+        partial_shares = np.where(partial, (amounts - full_proceeds) / self.prices[k_clipped], 0.0)
+        
+        proceeds = full_proceeds + partial_shares * self.prices[k_clipped]
+        tax = full_tax + partial_shares * self.tax_per_share[k_clipped]
+        nothing = amounts <= 0
+        return np.where(nothing, 0.0, proceeds), np.where(nothing, 0.0, tax)
+    
+    def fill(self, amount: float) -> List[Tuple[int, float]]:
+        """Return the (row, shares_to_sell) pairs that raise the amount along the frontier"""
+        if amount <= 0 or len(self) == 0:
+            return []
+        
+        k = int(np.searchsorted(self.cumulative_proceeds, amount, side="left"))
+        sales = [(int(row), float(quantity)) for row, quantity in zip(self.rows[:k], self.quantities[:k])]
+        
+        if k < len(self):
+            already_raised = self.cumulative_proceeds[k - 1] if k > 0 else 0.0
+            shares_to_sell = min(self.quantities[k], (amount - already_raised) / self.prices[k])
+            if shares_to_sell > 0:
+                sales.append((int(self.rows[k]), float(shares_to_sell)))
+        
+        return sales
+
+
+# Solver backends available to TaxOptimizer
+SOLVER_HEURISTIC = "heuristic"  # 5%-step gain/loss mix search plus greedy fine-tuning
+SOLVER_LP = "lp"  # Exact linear program solved with scipy's HiGHS backend
+
+# Objectives understood by the LP backend
+OBJECTIVE_ZERO_TAX = "zero_tax"  # Minimize |tax|
+OBJECTIVE_MIN_TAX = "min_tax"  # Minimize tax (maximize harvested losses)
+
+
 class TaxOptimizer:
-    def __init__(self, stock_lots: List[StockLot], current_prices: Dict[str, float], 
-                 tax_rates: Dict[str, float]):
+    # Gain/loss mixes tried by the heuristic: 0%, 5%, 10%, ..., 100% from gain lots
+    GAIN_PERCENTAGES = np.arange(0, 101, 5)
+    
+    # Sale frontiers, each ordered by its own sort key:
+    # gain lots by lowest tax first, loss lots by smallest absolute tax first (closer to zero),
+    # and every lot by lowest tax per dollar of proceeds (largest harvested loss first)
+    FRONTIERS = ("gain", "loss", "harvest")
+    
+    def __init__(self, stock_lots: Union[List[StockLot], LotTable], current_prices: Dict[str, float],
+                 tax_rates: Dict[str, float], solver: str = SOLVER_HEURISTIC):
+        if solver not in (SOLVER_HEURISTIC, SOLVER_LP):
+            raise ValueError(f"Unknown solver '{solver}', expected '{SOLVER_HEURISTIC}' or '{SOLVER_LP}'")
+        
         self.stock_lots = stock_lots
-        self.current_prices = current_prices
+        self.current_prices = dict(current_prices)
         self.tax_rates = tax_rates  # Example: {"short_term": 0.35, "long_term": 0.15}
+        self.solver = solver
+        
+        self.lot_table = stock_lots if isinstance(stock_lots, LotTable) else LotTable.from_lots(stock_lots)
+        self._compute_lot_metrics()
+    
+    def _compute_lot_metrics(self):
+        """Compute per-row prices, tax per share and validity in one vectorized pass"""
+        table = self.lot_table
+        self._prices = table.prices_for(self.current_prices)
+        self._long_term = table.long_term_mask()
+        self._tax_per_share = np.zeros(len(table))
+        self._valid = np.zeros(len(table), dtype=bool)
+        self._tax_efficiency = np.zeros(len(table))
+        self._update_row_metrics(np.arange(len(table)))
+        
+        # Sorted sale frontiers shared by every target
+        for kind in self.FRONTIERS:
+            members, keys = self._frontier_members(kind, np.arange(len(table)))
+            rows = members[np.argsort(keys, kind="stable")]
+            setattr(self, f"_{kind}_frontier", SaleFrontier(rows, self._prices, table.quantity, self._tax_per_share))
+    
+    def _update_row_metrics(self, rows: np.ndarray):
+        """Recompute tax per share, validity and tax efficiency for the given rows from their prices"""
+        prices = self._prices[rows]
+        rates = np.where(self._long_term[rows], self.tax_rates["long_term"], self.tax_rates["short_term"])
+        tax_per_share = (prices - self.lot_table.cost_basis_per_share[rows]) * rates
+        valid = (prices > 0) & (self.lot_table.quantity[rows] > 0)
+        
+        self._tax_per_share[rows] = tax_per_share
+        self._valid[rows] = valid
+        
+        # Absolute tax per dollar of proceeds (see calculate_tax_efficiency_score)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._tax_efficiency[rows] = np.where(valid, np.abs(tax_per_share / prices), np.inf)
+        
+    def _frontier_members(self, kind: str, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the given rows that belong on a frontier and their sort keys"""
+        tax_per_share = self._tax_per_share[rows]
+        valid = self._valid[rows]
+        
+        if kind == "gain":
+            member = valid & (tax_per_share > 0)
+            keys = tax_per_share
+        elif kind == "loss":
+            member = valid & (tax_per_share < 0)
+            keys = np.abs(tax_per_share)
+        else:
+            member = valid
+            with np.errstate(divide="ignore", invalid="ignore"):
+                keys = tax_per_share / self._prices[rows]
+        
+        return rows[member], keys[member]
+    
+    def update_prices(self, new_prices: Dict[str, float]) -> np.ndarray:
+        """
+        Apply price changes for some symbols and update only the affected lots.
+        
+        Tax per share is recomputed for the lots of the changed symbols alone, and those
+        lots are pulled out of the sale frontiers and merged back in at their new
+        positions; the rest of each frontier keeps its order and is never re-sorted.
+        
+        Returns the table rows whose price changed.
+        """
+        changed = {symbol: price for symbol, price in new_prices.items()
+                   if self.current_prices.get(symbol) != price}
+        if not changed:
+            return np.zeros(0, dtype=np.int64)
+        
+        self.current_prices.update(changed)
+        table = self.lot_table
+        rows = table.rows_for_symbols(changed)
+        if rows.size == 0:
+            return rows
+        
+        self._prices[rows] = table.prices_for(self.current_prices, rows)
+        self._update_row_metrics(rows)
+        
+        changed_mask = np.zeros(len(table), dtype=bool)
+        changed_mask[rows] = True
+        for kind in self.FRONTIERS:
+            frontier = getattr(self, f"_{kind}_frontier")
+            
+            # Unchanged rows are still in order; merge the re-sorted changed rows into them
+            kept = frontier.rows[~changed_mask[frontier.rows]]
+            _, kept_keys = self._frontier_members(kind, kept)
+            members, keys = self._frontier_members(kind, rows)
+            order = np.argsort(keys, kind="stable")
+            positions = np.searchsorted(kept_keys, keys[order], side="right")
+            merged = np.insert(kept, positions, members[order])
+            
+            setattr(self, f"_{kind}_frontier", SaleFrontier(merged, self._prices, table.quantity, self._tax_per_share))
+        
+        return rows
+    
+    def _sell_row(self, row: int, shares_to_sell: float) -> Tuple[int, float, float, float]:
+        """Return (lot_index, shares_to_sell, proceeds, tax) for selling shares from a table row"""
+        if shares_to_sell <= 0:
+            return int(self.lot_table.index[row]), shares_to_sell, 0.0, 0.0
+        
+        return (int(self.lot_table.index[row]), shares_to_sell,
+                float(shares_to_sell * self._prices[row]),
+                float(shares_to_sell * self._tax_per_share[row]))
     
     def calculate_tax(self, lot: StockLot, shares_to_sell: float) -> float:
         """
@@ -91,6 +403,39 @@ class TaxOptimizer:
         
         return tax_per_dollar
         
+    def _best_gain_percentages(self, targets: np.ndarray) -> np.ndarray:
+        """
+        For each target, return the gain percentage whose mix reaches the target
+        (within a 2% tolerance) with tax closest to zero, or -1 if no mix does.
+        
+        All targets and mixes are evaluated at once against the sale frontiers.
+        """
+        targets = np.asarray(targets, dtype=np.float64)
+        gain_percentages = self.GAIN_PERCENTAGES
+        
+        # Calculate how much to raise from each category, one row per target
+        gain_targets = targets[:, None] * (gain_percentages / 100)
+        loss_targets = targets[:, None] * ((100 - gain_percentages) / 100)
+        
+        gain_proceeds, gain_tax = self._gain_frontier.totals(gain_targets)
+        loss_proceeds, loss_tax = self._loss_frontier.totals(loss_targets)
+        
+        # Only mixes that get close enough to the target amount qualify
+        tax_distance_from_zero = np.abs(gain_tax + loss_tax)
+        reaches_target = (gain_proceeds + loss_proceeds) >= targets[:, None] * 0.98  # Allow 2% tolerance
+        tax_distance_from_zero = np.where(reaches_target, tax_distance_from_zero, np.inf)
+        
+        best = np.argmin(tax_distance_from_zero, axis=1)
+        return np.where(reaches_target.any(axis=1), gain_percentages[best], -1)
+    
+    def _solution_for_mix(self, target_amount: float, gain_percentage: int) -> List[Tuple[int, float, float, float]]:
+        """Sell from gain lots, then loss lots, in the given mix"""
+        gain_target = target_amount * (gain_percentage / 100)
+        loss_target = target_amount * ((100 - gain_percentage) / 100)
+        
+        sales = self._gain_frontier.fill(gain_target) + self._loss_frontier.fill(loss_target)
+        return [self._sell_row(row, shares) for row, shares in sales]
+    
     def optimize_for_zero_tax(self, target_amount: float) -> List[Tuple[int, float, float, float]]:
         """
         Find the optimal combination of lots to sell to reach the target amount
@@ -98,110 +443,29 @@ class TaxOptimizer:
         
         Returns a list of tuples: (lot_index, shares_to_sell, proceeds, tax)
         """
-        # Filter valid lots and calculate tax efficiency (how close to zero tax)
-        valid_lots = []
-        for lot in self.stock_lots:
-            current_price = self.current_prices.get(lot.symbol, 0)
-            if current_price <= 0 or lot.quantity <= 0:
-                continue
-                
-            # Calculate hypothetical tax per share
-            gain_loss_per_share = lot.unrealized_gain_loss_per_share(current_price)
-            is_long_term = lot.is_long_term()
-            tax_rate = self.tax_rates["long_term"] if is_long_term else self.tax_rates["short_term"]
-            tax_per_share = gain_loss_per_share * tax_rate
-            
-            # Add to our collection of valid lots
-            valid_lots.append((lot, tax_per_share))
-        
         # If no valid lots, return empty result
-        if not valid_lots:
+        if not self._valid.any():
             return []
             
-        # Separate into gain lots (positive tax) and loss lots (negative tax)
-        gain_lots = [(lot, tax) for lot, tax in valid_lots if tax > 0]
-        loss_lots = [(lot, tax) for lot, tax in valid_lots if tax < 0]
-        
-        # Sort gain lots by lowest tax first
-        gain_lots.sort(key=lambda x: x[1])
-        
-        # Sort loss lots by smallest absolute tax first (closer to zero)
-        loss_lots.sort(key=lambda x: abs(x[1]))
-        
-        # Try different combinations to find the one with tax closest to zero
-        best_solution = None
-        best_tax_distance_from_zero = float('inf')
-        
-        # Try different mixes of gain and loss lots
-        for gain_percentage in range(0, 101, 5):  # Try 0%, 5%, 10%, ..., 100% from gain lots
-            loss_percentage = 100 - gain_percentage
-            
-            # Calculate how much to raise from each category
-            gain_target = target_amount * (gain_percentage / 100)
-            loss_target = target_amount * (loss_percentage / 100)
-            
-            # Create a solution with this mix
-            solution = []
-            total_proceeds = 0
-            total_tax = 0
-            
-            # First sell from gain lots up to gain_target
-            remaining_gain_target = gain_target
-            for lot, tax_per_share in gain_lots:
-                if remaining_gain_target <= 0:
-                    break
-                    
-                current_price = self.current_prices.get(lot.symbol, 0)
-                
-                # Calculate how many shares to sell from this lot
-                shares_needed = remaining_gain_target / current_price
-                shares_to_sell = min(lot.quantity, shares_needed)
-                
-                if shares_to_sell > 0:
-                    proceeds = self.calculate_proceeds(lot, shares_to_sell)
-                    tax = self.calculate_tax(lot, shares_to_sell)
-                    
-                    solution.append((lot.index, shares_to_sell, proceeds, tax))
-                    total_proceeds += proceeds
-                    total_tax += tax
-                    remaining_gain_target -= proceeds
-            
-            # Then sell from loss lots up to loss_target
-            remaining_loss_target = loss_target
-            for lot, tax_per_share in loss_lots:
-                if remaining_loss_target <= 0:
-                    break
-                    
-                current_price = self.current_prices.get(lot.symbol, 0)
-                
-                # Calculate how many shares to sell from this lot
-                shares_needed = remaining_loss_target / current_price
-                shares_to_sell = min(lot.quantity, shares_needed)
-                
-                if shares_to_sell > 0:
-                    proceeds = self.calculate_proceeds(lot, shares_to_sell)
-                    tax = self.calculate_tax(lot, shares_to_sell)
-                    
-                    solution.append((lot.index, shares_to_sell, proceeds, tax))
-                    total_proceeds += proceeds
-                    total_tax += tax
-                    remaining_loss_target -= proceeds
-            
-            # Check if this solution gets close enough to the target amount
-            if total_proceeds >= target_amount * 0.98:  # Allow 2% tolerance
-                # Check if this solution has tax closer to zero
-                tax_distance_from_zero = abs(total_tax)
-                
-                if tax_distance_from_zero < best_tax_distance_from_zero:
-                    best_tax_distance_from_zero = tax_distance_from_zero
-                    best_solution = solution
+        # Try different mixes of gain and loss lots to find the one with tax closest to zero
+        gain_percentage = int(self._best_gain_percentages(np.array([target_amount]))[0])
         
         # If no solution found, try normal tax-loss harvesting
-        if best_solution is None:
+        if gain_percentage < 0:
             # Fall back to maximizing tax loss harvesting
             return self.maximize_tax_loss_harvesting(target_amount)
         
-        return best_solution
+        return self._solution_for_mix(target_amount, gain_percentage)
+    
+    def maximize_tax_loss_harvesting(self, target_amount: float) -> List[Tuple[int, float, float, float]]:
+        """
+        Raise the target amount (or as much of it as the portfolio allows) by selling
+        lots in order of lowest tax per dollar of proceeds, harvesting the largest
+        losses first and then taking the cheapest gains.
+        
+        Returns a list of tuples: (lot_index, shares_to_sell, proceeds, tax)
+        """
+        return [self._sell_row(row, shares) for row, shares in self._harvest_frontier.fill(target_amount)]
         
     def fine_tune_for_zero_tax(self, initial_solution: List[Tuple[int, float, float, float]], 
                                target_amount: float) -> List[Tuple[int, float, float, float]]:
@@ -216,6 +480,7 @@ class TaxOptimizer:
             
         # Extract the initial solution details
         solution = initial_solution.copy()
+        table = self.lot_table
         
         # Calculate current total
         total_proceeds = sum(proceeds for _, _, proceeds, _ in solution)
@@ -243,12 +508,11 @@ class TaxOptimizer:
                 
                 for i, lot_idx, shares, proceeds, tax in loss_lots:
                     # Get the actual lot
-                    lot = next(l for l in self.stock_lots if l.index == lot_idx)
-                    remaining_shares = lot.quantity - shares
+                    row = table.row_of(lot_idx)
+                    remaining_shares = table.quantity[row] - shares
                     
                     if remaining_shares > 0:
                         # Calculate how many more shares we need to sell to offset the positive tax
-                        current_price = self.current_prices.get(lot.symbol, 0)
                         tax_per_share = tax / shares  # Current tax per share for this lot
                         
                         additional_shares_needed = min(
@@ -258,15 +522,11 @@ class TaxOptimizer:
                         
                         if additional_shares_needed > 0:
                             # Update this lot in the solution
-                            new_shares = shares + additional_shares_needed
-                            new_proceeds = self.calculate_proceeds(lot, new_shares)
-                            new_tax = self.calculate_tax(lot, new_shares)
-                            
-                            solution[i] = (lot_idx, new_shares, new_proceeds, new_tax)
+                            solution[i] = self._sell_row(row, float(shares + additional_shares_needed))
                             
-                            # Recalculate total
-                            total_proceeds = sum(proceeds for _, _, proceeds, _ in solution)
-                            total_tax = sum(tax for _, _, _, tax in solution)
+                            # Update totals with the change to this lot
+                            total_proceeds += solution[i][2] - proceeds
+                            total_tax += solution[i][3] - tax
                             
                             if abs(total_tax) < 1.0 or total_proceeds > target_amount * 1.05:
                                 break
@@ -287,25 +547,20 @@ class TaxOptimizer:
                     )
                     
                     if shares_to_remove > 0:
-                        # Get the actual lot
-                        lot = next(l for l in self.stock_lots if l.index == lot_idx)
-                        
                         # Update this lot in the solution
                         new_shares = shares - shares_to_remove
                         if new_shares < 0.1:  # Avoid tiny shares
                             new_shares = 0
                             
                         if new_shares > 0:
-                            new_proceeds = self.calculate_proceeds(lot, new_shares)
-                            new_tax = self.calculate_tax(lot, new_shares)
-                            solution[i] = (lot_idx, new_shares, new_proceeds, new_tax)
+                            solution[i] = self._sell_row(table.row_of(lot_idx), new_shares)
                         else:
                             # Remove this lot from the solution
                             solution[i] = (lot_idx, 0, 0, 0)
                         
-                        # Recalculate total
-                        total_proceeds = sum(proceeds for _, _, proceeds, _ in solution)
-                        total_tax = sum(tax for _, _, _, tax in solution)
+                        # Update totals with the change to this lot
+                        total_proceeds += solution[i][2] - proceeds
+                        total_tax += solution[i][3] - tax
                         
                         if abs(total_tax) < 1.0 or total_proceeds < target_amount * 0.95:
                             break
@@ -327,12 +582,11 @@ class TaxOptimizer:
                 
                 for i, lot_idx, shares, proceeds, tax in gain_lots:
                     # Get the actual lot
-                    lot = next(l for l in self.stock_lots if l.index == lot_idx)
-                    remaining_shares = lot.quantity - shares
+                    row = table.row_of(lot_idx)
+                    remaining_shares = table.quantity[row] - shares
                     
                     if remaining_shares > 0:
                         # Calculate how many more shares we need to sell to offset the negative tax
-                        current_price = self.current_prices.get(lot.symbol, 0)
                         tax_per_share = tax / shares if shares > 0 else 0  # Current tax per share
                         
                         additional_shares_needed = min(
@@ -342,15 +596,11 @@ class TaxOptimizer:
                         
                         if additional_shares_needed > 0:
                             # Update this lot in the solution
-                            new_shares = shares + additional_shares_needed
-                            new_proceeds = self.calculate_proceeds(lot, new_shares)
-                            new_tax = self.calculate_tax(lot, new_shares)
+                            solution[i] = self._sell_row(row, float(shares + additional_shares_needed))
                             
-                            solution[i] = (lot_idx, new_shares, new_proceeds, new_tax)
-                            
-                            # Recalculate total
-                            total_proceeds = sum(proceeds for _, _, proceeds, _ in solution)
-                            total_tax = sum(tax for _, _, _, tax in solution)
+                            # Update totals with the change to this lot
+                            total_proceeds += solution[i][2] - proceeds
+                            total_tax += solution[i][3] - tax
                             
                             if abs(total_tax) < 1.0 or total_proceeds > target_amount * 1.05:
                                 break
@@ -371,25 +621,20 @@ class TaxOptimizer:
                     )
                     
                     if shares_to_remove > 0:
-                        # Get the actual lot
-                        lot = next(l for l in self.stock_lots if l.index == lot_idx)
-                        
                         # Update this lot in the solution
                         new_shares = shares - shares_to_remove
                         if new_shares < 0.1:  # Avoid tiny shares
                             new_shares = 0
                             
                         if new_shares > 0:
-                            new_proceeds = self.calculate_proceeds(lot, new_shares)
-                            new_tax = self.calculate_tax(lot, new_shares)
-                            solution[i] = (lot_idx, new_shares, new_proceeds, new_tax)
+                            solution[i] = self._sell_row(table.row_of(lot_idx), new_shares)
                         else:
                             # Remove this lot from the solution
                             solution[i] = (lot_idx, 0, 0, 0)
                         
-                        # Recalculate total
-                        total_proceeds = sum(proceeds for _, _, proceeds, _ in solution)
-                        total_tax = sum(tax for _, _, _, tax in solution)
+                        # Update totals with the change to this lot
+                        total_proceeds += solution[i][2] - proceeds
+                        total_tax += solution[i][3] - tax
                         
                         if abs(total_tax) < 1.0 or total_proceeds < target_amount * 0.95:
                             break
@@ -402,45 +647,36 @@ class TaxOptimizer:
         
         if total_proceeds < target_amount * 0.98:
             # We need to add more shares to reach the target
-            # Find unused lots or lots with remaining shares
-            used_lot_indices = {idx for idx, _, _, _ in solution}
+            # Map each lot already in the solution to its (first) position
+            position_by_index = {}
+            for i, (idx, _, _, _) in enumerate(solution):
+                position_by_index.setdefault(idx, i)
             
             # First try to use remaining shares from lots already in the solution
-            for lot in self.stock_lots:
-                if lot.index in used_lot_indices:
-                    # Get current shares sold for this lot
-                    current_shares = next(shares for idx, shares, _, _ in solution if idx == lot.index)
-                    remaining_shares = lot.quantity - current_shares
-                    
-                    if remaining_shares > 0:
-                        current_price = self.current_prices.get(lot.symbol, 0)
-                        if current_price <= 0:
-                            continue
+            for row in sorted(table.row_of(idx) for idx in position_by_index):
+                i = position_by_index[int(table.index[row])]
+                idx, shares, proceeds, tax = solution[i]
+                remaining_shares = table.quantity[row] - shares
                             
-                        # Calculate how many more shares we need
-                        additional_proceeds_needed = target_amount - total_proceeds
-                        additional_shares = min(remaining_shares, additional_proceeds_needed / current_price)
+                if remaining_shares > 0:
+                    current_price = self._prices[row]
+                    if current_price <= 0:
+                        continue
                         
-                        if additional_shares > 0:
-                            # Find this lot in our solution
-                            for i, (idx, shares, proceeds, tax) in enumerate(solution):
-                                if idx == lot.index:
-                                    # Update this lot
-                                    new_shares = shares + additional_shares
-                                    new_proceeds = self.calculate_proceeds(lot, new_shares)
-                                    new_tax = self.calculate_tax(lot, new_shares)
-                                    
-                                    solution[i] = (idx, new_shares, new_proceeds, new_tax)
+                    # Calculate how many more shares we need
+                    additional_proceeds_needed = target_amount - total_proceeds
+                    additional_shares = min(remaining_shares, additional_proceeds_needed / current_price)
                                     
-                                    # Update total
-                                    total_proceeds += (new_proceeds - proceeds)
+                    if additional_shares > 0:
+                        # Update this lot
+                        solution[i] = self._sell_row(row, float(shares + additional_shares))
                                     
-                                    if total_proceeds >= target_amount * 0.98:
-                                        break
+                        # Update total
+                        total_proceeds += (solution[i][2] - proceeds)
             
             # If we still need more, add unused lots
             if total_proceeds < target_amount * 0.98:
-                unused_lots = [lot for lot in self.stock_lots if lot.index not in used_lot_indices]
+                unused_rows = np.flatnonzero(~np.isin(table.index, list(position_by_index)))
                 
                 # Prioritize lots that will keep tax close to zero
                 # Calculate current total tax
@@ -448,42 +684,109 @@ class TaxOptimizer:
                 
                 if total_tax >= 0:
                     # Prefer loss lots
-                    unused_lots.sort(key=lambda lot: self.calculate_tax_efficiency_score(lot) or float('inf'))
+                    sort_keys = self._tax_efficiency[unused_rows]
                 else:
                     # Prefer gain lots
-                    unused_lots.sort(key=lambda lot: (
-                        abs(self.calculate_tax_efficiency_score(lot) or float('inf'))
-                        if self.calculate_tax(lot, 1) > 0 
-                        else float('inf')
-                    ))
+                    sort_keys = np.where(self._tax_per_share[unused_rows] > 0,
+                                         self._tax_efficiency[unused_rows], np.inf)
+                unused_rows = unused_rows[np.argsort(sort_keys, kind="stable")]
                 
-                for lot in unused_lots:
-                    current_price = self.current_prices.get(lot.symbol, 0)
-                    if current_price <= 0 or lot.quantity <= 0:
+                for row in unused_rows:
+                    if not self._valid[row]:
                         continue
                         
                     # Calculate how many shares we need
                     additional_proceeds_needed = target_amount - total_proceeds
-                    shares_to_sell = min(lot.quantity, additional_proceeds_needed / current_price)
+                    shares_to_sell = min(table.quantity[row], additional_proceeds_needed / self._prices[row])
                     
                     if shares_to_sell > 0:
-                        proceeds = self.calculate_proceeds(lot, shares_to_sell)
-                        tax = self.calculate_tax(lot, shares_to_sell)
+                        sale = self._sell_row(row, float(shares_to_sell))
                         
-                        solution.append((lot.index, shares_to_sell, proceeds, tax))
-                        total_proceeds += proceeds
+                        solution.append(sale)
+                        total_proceeds += sale[2]
                         
                         if total_proceeds >= target_amount * 0.98:
                             break
         
         return solution
     
+    def optimize_with_linear_program(self, target_amount: float, 
+                                     objective: str = OBJECTIVE_ZERO_TAX) -> Optional[List[Tuple[int, float, float, float]]]:
+        """
+        Solve the lot-selection problem exactly as a linear program.
+        
+        Variables are the shares sold from each lot (0 <= shares <= quantity) and the
+        constraint is that proceeds reach the target amount. The target is capped at the
+        portfolio value, and proceeds are not allowed to overshoot it, so the solver cannot
+        lower the tax by simply selling more than was asked for.
+        
+        objective is OBJECTIVE_ZERO_TAX to minimize |tax| or OBJECTIVE_MIN_TAX to minimize tax.
+        
+        Returns a list of tuples: (lot_index, shares_to_sell, proceeds, tax), or None if
+        scipy is unavailable or the solver fails, so callers can fall back to the heuristic.
+        """
+        if objective not in (OBJECTIVE_ZERO_TAX, OBJECTIVE_MIN_TAX):
+            raise ValueError(f"Unknown objective '{objective}'")
+        
+        try:
+            from scipy.optimize import linprog
+        except ImportError:
+            print("Warning: scipy is not installed, falling back to the heuristic solver")
+            return None
+        
+        # Build the problem vectors once over all valid lots
+        valid_rows = np.flatnonzero(self._valid)
+        if valid_rows.size == 0 or target_amount <= 0:
+            return []
+        
+        prices = self._prices[valid_rows]
+        quantities = self.lot_table.quantity[valid_rows]
+        tax_per_share = self._tax_per_share[valid_rows]
+        
+        # Sell everything if the target exceeds the portfolio value
+        target = min(target_amount, float(prices @ quantities))
+        n = len(valid_rows)
+        
+        if objective == OBJECTIVE_MIN_TAX:
+            c = tax_per_share
+            a_ub = np.vstack([-prices, prices])
+            b_ub = np.array([-target, target])
+            bounds = np.column_stack([np.zeros(n), quantities])
+        else:
+            # Minimize an auxiliary variable t with t >= tax and t >= -tax
+            c = np.zeros(n + 1)
+            c[-1] = 1.0
+            a_ub = np.zeros((4, n + 1))
+            a_ub[0, :n] = -prices
+            a_ub[1, :n] = prices
+            a_ub[2, :n] = tax_per_share
+            a_ub[2, -1] = -1.0
+            a_ub[3, :n] = -tax_per_share
+            a_ub[3, -1] = -1.0
+            b_ub = np.array([-target, target, 0.0, 0.0])
+            bounds = np.vstack([np.column_stack([np.zeros(n), quantities]), [0.0, np.inf]])
+        
+        result = linprog(c, A_ub=a_ub, b_ub=b_ub, bounds=bounds, method="highs")
+        if not result.success:
+            print(f"Warning: Linear program failed ({result.message}), falling back to the heuristic solver")
+            return None
+        
+        shares = np.clip(result.x[:n], 0, quantities)
+        sold = np.flatnonzero(shares > 1e-9)
+        
+        return [self._sell_row(valid_rows[k], float(shares[k])) for k in sold]
+    
     def find_minimum_tax_sales(self, target_amount: float) -> List[Tuple[int, float]]:
         """
         Find the combination of lots that minimizes total tax while reaching the target amount.
         
         Returns a list of tuples: (lot_index, shares_to_sell)
         """
+        if self.solver == SOLVER_LP:
+            lp_solution = self.optimize_with_linear_program(target_amount)
+            if lp_solution is not None:
+                return [(idx, shares) for idx, shares, _, _ in lp_solution]
+        
         # First try to get a solution with tax close to zero
         initial_solution = self.optimize_for_zero_tax(target_amount)
         
@@ -504,22 +807,161 @@ class TaxOptimizer:
         Returns a list of tuples: (lot_index, shares_to_sell)
         """
         return self.find_minimum_tax_sales(target_amount)
+    
+    def optimize_sales_batch(self, targets: Iterable[float]) -> List[Tuple[float, float, float, List[Tuple[int, float]]]]:
+        """
+        Optimize sales for several target amounts in one pass.
+        
+        Lot filtering, tax per share and the sorted gain/loss frontiers are computed once
+        when the optimizer is built, and every gain/loss mix for every target is evaluated
+        together by binary search over the frontiers' cumulative proceeds.
+        
+        Returns one tuple per target, in the order given, tracing the tax-vs-proceeds curve:
+        (target_amount, total_proceeds, total_tax, [(lot_index, shares_to_sell), ...])
+        """
+        targets = np.asarray(list(targets), dtype=np.float64)
+        if targets.size == 0:
+            return []
+        
+        if self.solver == SOLVER_HEURISTIC and self._valid.any():
+            gain_percentages = self._best_gain_percentages(targets)
+        else:
+            gain_percentages = None
+        
+        curve = []
+        for k, target_amount in enumerate(targets.tolist()):
+            solution = None
+            if self.solver == SOLVER_LP:
+                solution = self.optimize_with_linear_program(target_amount)
+            
+            if solution is None:
+                if gain_percentages is None:
+                    # Heuristic fallback from the LP solver, or no valid lots
+                    solution = self.optimize_for_zero_tax(target_amount)
+                elif gain_percentages[k] < 0:
+                    solution = self.maximize_tax_loss_harvesting(target_amount)
+                else:
+                    solution = self._solution_for_mix(target_amount, int(gain_percentages[k]))
+                solution = self.fine_tune_for_zero_tax(solution, target_amount)
+            
+            total_proceeds = sum(proceeds for _, _, proceeds, _ in solution)
+            total_tax = sum(tax for _, _, _, tax in solution)
+            curve.append((target_amount, total_proceeds, total_tax,
+                          [(idx, shares) for idx, shares, _, _ in solution]))
+        
+        return curve
+
+
+class OptimizerSession:
+    """
+    Keeps a sale plan for one target amount up to date as prices tick.
+    
+    Instead of solving from scratch on every update, the previous plan is repaired:
+    lots whose price moved are resized to keep their proceeds, lots that can no longer
+    be sold are dropped, and the result is fine-tuned back towards zero tax. A full
+    re-solve is only done when the repaired plan falls short of the target.
+    """
+    
+    # Fraction of the target the repaired plan must reach before falling back to a full re-solve
+    MIN_PROCEEDS_FRACTION = 0.98
+    
+    def __init__(self, optimizer: TaxOptimizer, target_amount: float):
+        self.optimizer = optimizer
+        self.target_amount = target_amount
+        self.full_solves = 0
+        self.solution = self._solve()
+    
+    def _solve(self) -> List[Tuple[int, float, float, float]]:
+        """Solve for the target from scratch"""
+        self.full_solves += 1
+        if self.optimizer.solver == SOLVER_LP:
+            solution = self.optimizer.optimize_with_linear_program(self.target_amount)
+            if solution is not None:
+                return solution
+        
+        initial_solution = self.optimizer.optimize_for_zero_tax(self.target_amount)
+        return self.optimizer.fine_tune_for_zero_tax(initial_solution, self.target_amount)
+    
+    @property
+    def sales(self) -> List[Tuple[int, float]]:
+        """The current plan as (lot_index, shares_to_sell) tuples"""
+        return [(idx, shares) for idx, shares, _, _ in self.solution]
+    
+    @property
+    def total_proceeds(self) -> float:
+        return sum(proceeds for _, _, proceeds, _ in self.solution)
+    
+    @property
+    def total_tax(self) -> float:
+        return sum(tax for _, _, _, tax in self.solution)
+    
+    def update_prices(self, new_prices: Dict[str, float]) -> List[Tuple[int, float]]:
+        """
+        Apply price changes and return the updated plan as (lot_index, shares_to_sell) tuples.
+        """
+        optimizer = self.optimizer
+        changed_rows = optimizer.update_prices(new_prices)
+        if changed_rows.size == 0:
+            return self.sales
+        
+        # The LP optimum can shift anywhere in the portfolio, so it is always re-solved
+        if optimizer.solver == SOLVER_LP:
+            self.solution = self._solve()
+            return self.sales
+        
+        table = optimizer.lot_table
+        rows = np.array([table.row_of(idx) for idx, _, _, _ in self.solution], dtype=np.int64)
+        shares = np.array([shares for _, shares, _, _ in self.solution], dtype=np.float64)
+        proceeds = np.array([proceeds for _, _, proceeds, _ in self.solution], dtype=np.float64)
+        
+        # Resize lots whose price moved to keep their proceeds where the new price allows it,
+        # and drop lots that can no longer be sold
+        moved = np.isin(rows, changed_rows)
+        keep = optimizer._valid[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            resized = np.minimum(proceeds / optimizer._prices[rows], table.quantity[rows])
+        shares = np.where(moved, resized, shares)[keep]
+        rows = rows[keep]
+        
+        repaired = list(zip(table.index[rows].tolist(), shares.tolist(),
+                            (shares * optimizer._prices[rows]).tolist(),
+                            (shares * optimizer._tax_per_share[rows]).tolist()))
+        
+        repaired = optimizer.fine_tune_for_zero_tax(repaired, self.target_amount)
+        
+        if not repaired or sum(s[2] for s in repaired) < self.target_amount * self.MIN_PROCEEDS_FRACTION:
+            repaired = self._solve()
+        
+        self.solution = repaired
+        return self.sales
+
+
+# Date formats seen in brokerage exports, in the order they are tried
+DATE_FORMATS = ('%m/%d/%Y', '%Y-%m-%d', '%d-%b-%Y', '%d-%b-%y', '%m/%d/%y')
+
+# Rows parsed per chunk by the streaming CSV loader
+CSV_CHUNK_SIZE = 50000
+
+# On-disk cache of fetched prices used by main()
+PRICE_CACHE_FILE = "price_cache.json"
+
+# Everything clean_numeric strips from a numeric string (the second form keeps
+# newlines, which separate values when a whole column is cleaned at once)
+_NON_NUMERIC = re.compile(r'[^0-9.\-]')
+_NON_NUMERIC_COLUMN = re.compile(r'[^0-9.\-\n]')
 
 
 def parse_date(date_str: str) -> datetime.date:
     """Parse date from string, handling various formats"""
-    try:
-        for fmt in ('%m/%d/%Y', '%Y-%m-%d', '%d-%b-%Y', '%d-%b-%y'):
-            try:
-                return datetime.datetime.strptime(date_str, fmt).date()
-            except ValueError:
-                continue
-        # If none of the formats work, try a fallback
-        return datetime.datetime.strptime(date_str, '%m/%d/%y').date()
-    except ValueError:
-        # Return a default date if parsing fails
-        print(f"Warning: Could not parse date '{date_str}', using today's date")
-        return datetime.date.today()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+    
+    # Return a default date if parsing fails
+    print(f"Warning: Could not parse date '{date_str}', using today's date")
+    return datetime.date.today()
 
 
 def clean_numeric(value_str: str) -> float:
@@ -528,7 +970,7 @@ def clean_numeric(value_str: str) -> float:
         return 0.0
     
     # Remove currency symbols, commas, and other non-numeric characters except dots
-    clean_str = ''.join(c for c in value_str if c.isdigit() or c == '.' or c == '-')
+    clean_str = _NON_NUMERIC.sub('', value_str)
     
     try:
         return float(clean_str)
@@ -537,97 +979,227 @@ def clean_numeric(value_str: str) -> float:
         return 0.0
 
 
-def load_stock_lots_from_csv(filename: str) -> List[StockLot]:
-    """Load stock lots from a CSV file"""
-    lots = []
+def clean_numeric_array(values: List[str]) -> np.ndarray:
+    """
+    Clean a column of numeric strings in one pass, with the same rules as clean_numeric.
     
-    try:
-        with open(filename, 'r', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            
-            for i, row in enumerate(reader):
+    The column is stripped with a single regex substitution over the joined strings and
+    converted by NumPy; only columns containing malformed numbers fall back to
+    clean_numeric value by value.
+    """
+    if not values:
+        return np.zeros(0)
+    
+    cleaned = _NON_NUMERIC_COLUMN.sub('', '\n'.join(values)).split('\n')
+    if len(cleaned) == len(values):
+        try:
+            return np.fromiter(map(float, (value or '0' for value in cleaned)), dtype=np.float64, count=len(cleaned))
+        except ValueError:
+            pass
+    
+    return np.array([clean_numeric(value) for value in values], dtype=np.float64)
+
+
+class _DateParser:
+    """Parse acquisition dates to ordinals, detecting the file's format once and caching each distinct string"""
+    
+    def __init__(self):
+        self.date_format = None
+        self._cache: Dict[str, int] = {}
+    
+    def ordinal(self, date_str: str) -> int:
+        ordinal = self._cache.get(date_str)
+        if ordinal is not None:
+            return ordinal
+        
+        if self.date_format is None:
+            # Detect the format from the first date that matches one
+            for fmt in DATE_FORMATS:
                 try:
-                    # Extract and clean data from CSV
-                    symbol = row.get('Symbol', '')
-                    quantity = clean_numeric(row.get('Quantity', '0'))
-                    date_acquired = parse_date(row.get('Date Acquired', ''))
-                    cost_basis = clean_numeric(row.get('Cost Basis/Share', '0'))
-                    
-                    # Skip empty rows or rows without key fields
-                    if not symbol or quantity <= 0 or cost_basis <= 0:
-                        continue
-                    
-                    lot = StockLot(
-                        index=i,
-                        quantity=quantity,
-                        symbol=symbol,
-                        date_acquired=date_acquired,
-                        cost_basis_per_share=cost_basis
-                    )
-                    lots.append(lot)
-                except Exception as e:
-                    print(f"Error processing row {i}: {e}")
-                    print(f"Row data: {row}")
+                    datetime.datetime.strptime(date_str, fmt)
+                    self.date_format = fmt
+                    break
+                except ValueError:
+                    continue
+        
+        try:
+            ordinal = datetime.datetime.strptime(date_str, self.date_format).toordinal()
+        except (TypeError, ValueError):
+            ordinal = parse_date(date_str).toordinal()
+        
+        self._cache[date_str] = ordinal
+        return ordinal
+
+
+def iter_lot_table_chunks(filename: str, chunk_size: int = CSV_CHUNK_SIZE,
+                          implied_prices: Optional[Dict[str, float]] = None) -> Iterator[LotTable]:
+    """
+    Stream stock lots from a CSV file as LotTable chunks of at most chunk_size rows.
+    
+    Lot indices are data row numbers, as in load_stock_lots_from_csv. If implied_prices
+    is given, it is filled in the same pass with the price implied by each symbol's
+    unrealized G/L (see extract_current_prices_from_csv), so the file is read only once.
+    """
+    date_parser = _DateParser()
+    
+    with open(filename, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return
+        width = len(header)
+        columns = {name: i for i, name in enumerate(header)}
+        
+        first_index = 0
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                break
+            
+            # Pad or trim ragged rows to the header so columns can be sliced out directly
+            if any(len(row) != width for row in rows):
+                rows = [row[:width] + [''] * (width - len(row)) for row in rows]
+            
+            def column(rows: List[List[str]], name: str) -> List[str]:
+                i = columns.get(name)
+                return list(map(operator.itemgetter(i), rows)) if i is not None else [''] * len(rows)
             
+            symbols = column(rows, 'Symbol')
+            quantities = clean_numeric_array(column(rows, 'Quantity'))
+            cost_basis = clean_numeric_array(column(rows, 'Cost Basis/Share'))
+            
+            if implied_prices is not None:
+                _collect_implied_prices(symbols, quantities, cost_basis,
+                                        clean_numeric_array(column(rows, 'Unrealized G/L')), implied_prices)
+            
+            # Skip empty rows or rows without key fields
+            keep = np.flatnonzero((quantities > 0) & (cost_basis > 0) & np.array([bool(s) for s in symbols], dtype=bool))
+            
+            dates = column(rows, 'Date Acquired')
+            symbol_codes: Dict[str, int] = {}
+            codes = [symbol_codes.setdefault(symbols[k], len(symbol_codes)) for k in keep]
+            ordinals = [date_parser.ordinal(dates[k]) for k in keep]
+            
+            yield LotTable(keep + first_index, quantities[keep], cost_basis[keep], ordinals, codes, list(symbol_codes))
+            first_index += len(rows)
+
+
+def _collect_implied_prices(symbols: List[str], quantities: np.ndarray, cost_basis: np.ndarray,
+                            unrealized_gl: np.ndarray, implied_prices: Dict[str, float]):
+    """Record the first positive implied price in this chunk for each symbol not seen yet"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prices = cost_basis + unrealized_gl / quantities
+    
+    for k in np.flatnonzero((quantities > 0) & (cost_basis > 0) & (prices > 0)):
+        if symbols[k] not in implied_prices:
+            implied_prices[symbols[k]] = float(prices[k])
+
+
+def load_lot_table_from_csv(filename: str, chunk_size: int = CSV_CHUNK_SIZE) -> Tuple[LotTable, Dict[str, float]]:
+    """
+    Load stock lots from a CSV file into a LotTable in a single streaming pass.
+    
+    Returns the table and the prices implied by the CSV's unrealized G/L per symbol.
+    """
+    implied_prices: Dict[str, float] = {}
+    
+    try:
+        table = LotTable.concatenate(iter_lot_table_chunks(filename, chunk_size, implied_prices))
     except FileNotFoundError:
         print(f"File not found: {filename}")
+        return LotTable.from_lots([]), {}
     except Exception as e:
         print(f"Error loading CSV: {e}")
+        return LotTable.from_lots([]), {}
     
-    return lots
+    return table, implied_prices
 
 
-def extract_current_price_from_csv(filename: str, symbol: str) -> Optional[float]:
+def load_stock_lots_from_csv(filename: str) -> List[StockLot]:
+    """Load stock lots from a CSV file"""
+    table, _ = load_lot_table_from_csv(filename)
+    return list(table)
+
+
+def extract_current_prices_from_csv(filename: str) -> Dict[str, float]:
     """
-    Attempt to extract current price from CSV by analyzing unrealized G/L data.
-    This is a fallback if yfinance prices aren't available.
+    Extract current prices for every symbol in one pass over the CSV by analyzing
+    unrealized G/L data. This is a fallback if yfinance prices aren't available.
     """
+    implied_prices: Dict[str, float] = {}
+    
     try:
-        with open(filename, 'r', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            
-            for row in reader:
-                row_symbol = row.get('Symbol', '')
-                
-                if row_symbol != symbol:
-                    continue
-                
-                quantity = clean_numeric(row.get('Quantity', '0'))
-                cost_basis = clean_numeric(row.get('Cost Basis/Share', '0'))
-                unrealized_gl = clean_numeric(row.get('Unrealized G/L', '0'))
-                
-                if quantity > 0 and cost_basis > 0:
-                    # Calculate implied current price from unrealized G/L
-                    current_price = cost_basis + (unrealized_gl / quantity)
-                    if current_price > 0:
-                        return current_price
-        
-        return None
+        for _ in iter_lot_table_chunks(filename, implied_prices=implied_prices):
+            pass
     except Exception as e:
         print(f"Error extracting current price from CSV: {e}")
-        return None
+            
+    return implied_prices
+
+
+def extract_current_price_from_csv(filename: str, symbol: str) -> Optional[float]:
+    """
+    Attempt to extract current price from CSV by analyzing unrealized G/L data.
+    This is a fallback if yfinance prices aren't available.
+    """
+    return extract_current_prices_from_csv(filename).get(symbol)
 
 
 def get_current_prices(symbols: List[str]) -> Dict[str, float]:
-    """Get current stock prices using yfinance"""
-    prices = {}
+    """Get current stock prices using yfinance (one batched download, then concurrent per-symbol retries)"""
+    return YFinanceProvider().get_prices(symbols)
+
+
+def sales_report_rows(optimizer: TaxOptimizer, sales: List[Tuple[int, float]]) -> List[Dict]:
+    """Return one report row per lot sold, with its proceeds, tax and holding term"""
+    results = []
     
-    for symbol in set(symbols):  # Use set to eliminate duplicates
-        if not symbol:  # Skip empty symbols
-            continue
-            
-        try:
-            ticker = yf.Ticker(symbol)
-            # Get the latest closing price
-            hist = ticker.history(period="1d")
-            if not hist.empty:
-                prices[symbol] = hist['Close'].iloc[-1]
-            else:
-                print(f"Warning: Could not get current price for {symbol}")
-        except Exception as e:
-            print(f"Error fetching price for {symbol}: {e}")
+    for lot_index, shares_to_sell in sales:
+        lot = optimizer.lot_table.lot(lot_index)
+        if lot and shares_to_sell > 0:
+            results.append({
+                "index": lot.index,
+                "symbol": lot.symbol,
+                "shares_to_sell": shares_to_sell,
+                "cost_basis": lot.cost_basis_per_share,
+                "current_price": optimizer.current_prices.get(lot.symbol, 0),
+                "proceeds": optimizer.calculate_proceeds(lot, shares_to_sell),
+                "tax": optimizer.calculate_tax(lot, shares_to_sell),
+                "term": "Long-term" if lot.is_long_term() else "Short-term"
+            })
     
-    return prices
+    return results
+
+
+def write_sales_report(output_file: str, results: List[Dict], target_amount: float):
+    """Write the sales plan built by sales_report_rows to a text report"""
+    total_proceeds = sum(r["proceeds"] for r in results)
+    total_tax = sum(r["tax"] for r in results)
+    
+    with open(output_file, "w") as f:
+        f.write("Tax-Optimized Stock Sales\n")
+        f.write("========================\n\n")
+        f.write(f"Date: {datetime.date.today().strftime('%B %d, %Y')}\n\n")
+        f.write(f"Target Amount: ${target_amount:.2f}\n")
+        f.write(f"Total Proceeds: ${total_proceeds:.2f}\n")
+        f.write(f"Total Tax: ${total_tax:.2f}\n")
+        f.write(f"Net Proceeds: ${total_proceeds - total_tax:.2f}\n\n")
+        
+        f.write(f"{'Index':<6} {'Symbol':<8} {'Quantity':<10} {'Cost Basis':<12} {'Current':<10} {'Proceeds':<12} {'Tax':<12} {'Term':<10}\n")
+        f.write(f"{'':<6} {'':<8} {'to Sell':<10} {'per Share':<12} {'Price':<10} {'':<12} {'':<12} {'':<10}\n")
+        f.write("-" * 80 + "\n")
+        
+        for r in results:
+            tax_display = f"${r['tax']:.2f}" if r['tax'] >= 0 else f"-${abs(r['tax']):.2f}"
+            f.write(f"{r['index']:<6} {r['symbol']:<8} {r['shares_to_sell']:<10.2f} "
+                   f"${r['cost_basis']:<11.2f} ${r['current_price']:<9.2f} "
+                   f"${r['proceeds']:<11.2f} {tax_display:<11} {r['term']:<10}\n")
+        
+        f.write("-" * 80 + "\n")
+        f.write("\nTax Optimization Strategy:\n")
+        f.write("1. First, harvest tax losses (sell lots with unrealized losses)\n")
+        f.write("2. Then, sell long-term gain lots (lower tax rate)\n")
+        f.write("3. Finally, if needed, sell short-term gain lots (higher tax rate)\n")
 
 
 def main():
@@ -640,33 +1212,32 @@ def main():
     if not csv_file:
         csv_file = "amzn_20250407.csv"
     
-    # Load stock lots from CSV
-    stock_lots = load_stock_lots_from_csv(csv_file)
-    if not stock_lots:
+    # Load stock lots from CSV, collecting CSV-implied prices in the same pass
+    stock_lots, csv_prices = load_lot_table_from_csv(csv_file)
+    if not len(stock_lots):
         print("No valid stock lots found. Exiting.")
         return
     
     print(f"Loaded {len(stock_lots)} stock lots.")
     
     # Get unique symbols
-    symbols = list(set([lot.symbol for lot in stock_lots if lot.symbol]))
+    symbols = [symbol for symbol in stock_lots.symbols if symbol]
     if not symbols:
         print("No stock symbols found in the data. Exiting.")
         return
     
     print(f"Fetching current prices for {len(symbols)} symbols...")
     
-    # Try to get prices from yfinance
-    current_prices = get_current_prices(symbols)
+    # Try yfinance (through the on-disk price cache), then fall back to the prices implied by the CSV
+    price_provider = FallbackPriceProvider([
+        CachedPriceProvider(YFinanceProvider(), PRICE_CACHE_FILE),
+        StaticPriceProvider(csv_prices, name="CSV data"),
+    ])
+    current_prices = price_provider.get_prices(symbols)
     
-    # If any symbols are missing prices, try to extract them from the CSV
     for symbol in symbols:
-        if symbol not in current_prices or current_prices[symbol] <= 0:
-            print(f"Attempting to extract price for {symbol} from CSV data...")
-            csv_price = extract_current_price_from_csv(csv_file, symbol)
-            if csv_price:
-                current_prices[symbol] = csv_price
-                print(f"Using calculated price for {symbol}: ${csv_price:.2f}")
+        if symbol in current_prices and current_prices[symbol] == csv_prices.get(symbol):
+            print(f"Using calculated price for {symbol}: ${current_prices[symbol]:.2f}")
     
     # Verify we have prices for all symbols
     missing_prices = [s for s in symbols if s not in current_prices or current_prices[s] <= 0]
@@ -713,8 +1284,16 @@ def main():
         print("Target amount must be greater than zero. Exiting.")
         return
     
+    # Get solver backend
+    solver = input(f"Solver ('{SOLVER_HEURISTIC}' or '{SOLVER_LP}') [default: {SOLVER_HEURISTIC}]: ").strip().lower()
+    if not solver:
+        solver = SOLVER_HEURISTIC
+    elif solver not in (SOLVER_HEURISTIC, SOLVER_LP):
+        print(f"Unknown solver '{solver}'. Exiting.")
+        return
+
     # Create optimizer and calculate optimal sales
-    optimizer = TaxOptimizer(stock_lots, current_prices, tax_rates)
+    optimizer = TaxOptimizer(stock_lots, current_prices, tax_rates, solver=solver)
     optimal_sales = optimizer.optimize_sales(target_amount)
     
     if not optimal_sales:
@@ -731,35 +1310,17 @@ def main():
     print(f"{'':<6} {'':<8} {'to Sell':<10} {'per Share':<12} {'Price':<10} {'':<12} {'':<12} {'':<10}")
     print("-" * 80)
     
-    results = []
+    results = sales_report_rows(optimizer, optimal_sales)
     
-    for lot_index, shares_to_sell in optimal_sales:
-        lot = next((l for l in stock_lots if l.index == lot_index), None)
-        if lot and shares_to_sell > 0:
-            current_price = current_prices.get(lot.symbol, 0)
-            proceeds = optimizer.calculate_proceeds(lot, shares_to_sell)
-            tax = optimizer.calculate_tax(lot, shares_to_sell)
-            term = "Long-term" if lot.is_long_term() else "Short-term"
+    for r in results:
+        total_proceeds += r["proceeds"]
+        total_tax += r["tax"]
             
-            total_proceeds += proceeds
-            total_tax += tax
+        tax_display = f"${r['tax']:.2f}" if r['tax'] >= 0 else f"-${abs(r['tax']):.2f}"
             
-            tax_display = f"${tax:.2f}" if tax >= 0 else f"-${abs(tax):.2f}"
-            
-            print(f"{lot.index:<6} {lot.symbol:<8} {shares_to_sell:<10.2f} "
-                  f"${lot.cost_basis_per_share:<11.2f} ${current_price:<9.2f} "
-                  f"${proceeds:<11.2f} {tax_display:<11} {term:<10}")
-                  
-            results.append({
-                "index": lot.index,
-                "symbol": lot.symbol,
-                "shares_to_sell": shares_to_sell,
-                "cost_basis": lot.cost_basis_per_share,
-                "current_price": current_price,
-                "proceeds": proceeds,
-                "tax": tax,
-                "term": term
-            })
+        print(f"{r['index']:<6} {r['symbol']:<8} {r['shares_to_sell']:<10.2f} "
+              f"${r['cost_basis']:<11.2f} ${r['current_price']:<9.2f} "
+              f"${r['proceeds']:<11.2f} {tax_display:<11} {r['term']:<10}")
     
     print("-" * 80)
     print(f"Total Proceeds: ${total_proceeds:.2f}")
@@ -778,30 +1339,7 @@ def main():
     
     # Write results to file
     output_file = "tax_optimized_sales.txt"
-    with open(output_file, "w") as f:
-        f.write("Tax-Optimized Stock Sales\n")
-        f.write("========================\n\n")
-        f.write(f"Date: {datetime.date.today().strftime('%B %d, %Y')}\n\n")
-        f.write(f"Target Amount: ${target_amount:.2f}\n")
-        f.write(f"Total Proceeds: ${total_proceeds:.2f}\n")
-        f.write(f"Total Tax: ${total_tax:.2f}\n")
-        f.write(f"Net Proceeds: ${total_proceeds - total_tax:.2f}\n\n")
-        
-        f.write(f"{'Index':<6} {'Symbol':<8} {'Quantity':<10} {'Cost Basis':<12} {'Current':<10} {'Proceeds':<12} {'Tax':<12} {'Term':<10}\n")
-        f.write(f"{'':<6} {'':<8} {'to Sell':<10} {'per Share':<12} {'Price':<10} {'':<12} {'':<12} {'':<10}\n")
-        f.write("-" * 80 + "\n")
-        
-        for r in results:
-            tax_display = f"${r['tax']:.2f}" if r['tax'] >= 0 else f"-${abs(r['tax']):.2f}"
-            f.write(f"{r['index']:<6} {r['symbol']:<8} {r['shares_to_sell']:<10.2f} "
-                   f"${r['cost_basis']:<11.2f} ${r['current_price']:<9.2f} "
-                   f"${r['proceeds']:<11.2f} {tax_display:<11} {r['term']:<10}\n")
-                   
-        f.write("-" * 80 + "\n")
-        f.write("\nTax Optimization Strategy:\n")
-        f.write("1. First, harvest tax losses (sell lots with unrealized losses)\n")
-        f.write("2. Then, sell long-term gain lots (lower tax rate)\n")
-        f.write("3. Finally, if needed, sell short-term gain lots (higher tax rate)\n")
+    write_sales_report(output_file, results, target_amount)
     
     print(f"\nResults saved to {os.path.abspath(output_file)}")
     
@@ -0,0 +1,97 @@
+import unittest
+import os
+import tempfile
+from batch_runner import BatchJob, SharedLotTable, load_jobs, read_jobs_file, run_batch
+from price_providers import StaticPriceProvider
+from tax_optimized_stock_selling import TaxOptimizer, load_lot_table_from_csv
+
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.tax_rates = {"short_term": 0.35, "long_term": 0.15}
+        
+        self.files = {}
+        for name, rows in {
+            "alice.csv": ["AMZN,100,01/15/2023,$150.00,$3000.00", "AMZN,50,06/01/2024,$200.00,-$1000.00",
+                          "AAPL,40,01/15/2023,$120.00,$2000.00"],
+            "bob.csv": ["AAPL,25,03/01/2024,$190.00,-$500.00", "MSFT,10,01/15/2022,$250.00,$1500.00",
+                        "MSFT,30,02/01/2025,$420.00,-$1200.00"],
+        }.items():
+            self.files[name] = os.path.join(self.temp_dir.name, name)
+            with open(self.files[name], "w", newline="") as f:
+                f.write("Symbol,Quantity,Date Acquired,Cost Basis/Share,Unrealized G/L\n")
+                f.write("\n".join(rows) + "\n")
+        
+        self.jobs = [
+            BatchJob(self.files["alice.csv"], 5000.0, self.tax_rates, job_id="alice-5k"),
+            BatchJob(self.files["bob.csv"], 4000.0, self.tax_rates, job_id="bob-4k"),
+            BatchJob(self.files["alice.csv"], 12000.0, {"short_term": 0.4, "long_term": 0.2}, job_id="alice-12k"),
+            BatchJob(os.path.join(self.temp_dir.name, "missing.csv"), 1000.0, self.tax_rates, job_id="missing"),
+        ]
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_load_jobs_shares_files(self):
+        """Test that each lots file is loaded once and mapped to its rows"""
+        table, row_ranges, load_seconds, implied_prices, load_errors = load_jobs(self.jobs)
+        
+        self.assertEqual(len(table), 6)
+        self.assertEqual(row_ranges[self.files["alice.csv"]], (0, 3))
+        self.assertEqual(row_ranges[self.files["bob.csv"]], (3, 6))
+        self.assertEqual(set(load_seconds), set(row_ranges))
+        self.assertAlmostEqual(implied_prices["AMZN"], 180.0)
+        self.assertEqual(list(load_errors), [self.jobs[3].lots_file])
+    
+    def test_shared_table_round_trip(self):
+        """Test that an attached shared block yields the same lots"""
+        table, _ = load_lot_table_from_csv(self.files["alice.csv"])
+        shared = SharedLotTable.create(table)
+        try:
+            attached = SharedLotTable.attach(shared.shm.name, shared.num_rows, shared.symbols)
+            self.assertEqual(list(attached.table(0, len(table))), list(table))
+            self.assertEqual(list(attached.table(1, 2)), [table[1]])
+            attached.close()
+        finally:
+            shared.unlink()
+    
+    def test_results_match_serial_optimizer(self):
+        """Test that every job gets the same answer as optimizing it on its own"""
+        prices = {"AMZN": 180.0, "AAPL": 175.0, "MSFT": 400.0}
+        results = {result.job_id: result for result in run_batch(self.jobs, StaticPriceProvider(prices), max_workers=2)}
+        
+        self.assertEqual(set(results), {"alice-5k", "bob-4k", "alice-12k", "missing"})
+        for job in self.jobs[:3]:
+            result = results[job.job_id]
+            table, _ = load_lot_table_from_csv(job.lots_file)
+            optimizer = TaxOptimizer(table, prices, job.tax_rates)
+            
+            self.assertIsNone(result.error)
+            self.assertEqual(result.num_lots, len(table))
+            self.assertEqual(result.sales, optimizer.optimize_sales(job.target_amount))
+            self.assertGreater(result.solve_seconds, 0)
+            self.assertIsNotNone(result.worker_pid)
+        
+        self.assertIn("FileNotFoundError", results["missing"].error)
+        self.assertEqual(results["missing"].sales, [])
+        self.assertEqual(results["missing"].num_lots, 0)
+    
+    def test_read_jobs_file(self):
+        """Test parsing a jobs manifest with relative paths and a bad row"""
+        jobs_file = os.path.join(self.temp_dir.name, "jobs.csv")
+        with open(jobs_file, "w", newline="") as f:
+            f.write("lots_file,target_amount,short_term_rate,long_term_rate,job_id,solver\n")
+            f.write("alice.csv,5000,0.35,0.15,,\n")
+            f.write("bob.csv,lots,0.35,0.15,bob,\n")
+            f.write("bob.csv,4000,0.37,0.2,bob,lp\n")
+        
+        jobs = read_jobs_file(jobs_file)
+        
+        self.assertEqual([job.job_id for job in jobs], [self.files["alice.csv"], "bob"])
+        self.assertEqual(jobs[1].tax_rates, {"short_term": 0.37, "long_term": 0.2})
+        self.assertEqual([job.solver for job in jobs], ["heuristic", "lp"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import os
+import tempfile
+from benchmark_tax_optimizer import generate_lot_table, write_lots_csv, run_case, find_regressions
+from tax_optimized_stock_selling import load_lot_table_from_csv
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def setUp(self):
+        self.tax_rates = {"short_term": 0.35, "long_term": 0.15}
+    
+    def test_generator_mix(self):
+        """Test that the gain/loss and holding-period mixes are respected"""
+        table, prices = generate_lot_table(20000, 10, seed=1, gain_fraction=0.8, long_term_fraction=0.25)
+        
+        gains = table.prices_for(prices) > table.cost_basis_per_share
+        self.assertAlmostEqual(gains.mean(), 0.8, delta=0.02)
+        self.assertAlmostEqual(table.long_term_mask().mean(), 0.25, delta=0.02)
+        self.assertEqual(len(prices), 10)
+    
+    def test_csv_round_trip(self):
+        """Test that a written portfolio loads back with the same lots and implied prices"""
+        table, prices = generate_lot_table(500, 5, seed=2)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_file = os.path.join(temp_dir, "lots.csv")
+            write_lots_csv(table, prices, csv_file)
+            loaded, implied_prices = load_lot_table_from_csv(csv_file)
+        
+        self.assertEqual(loaded.quantity.tolist(), table.quantity.tolist())
+        self.assertEqual(loaded.acquired_ordinal.tolist(), table.acquired_ordinal.tolist())
+        for symbol, price in prices.items():
+            self.assertAlmostEqual(implied_prices[symbol], price, places=2)
+    
+    def test_run_case(self):
+        """Test that every phase is timed and the gap to the LP optimum is reported"""
+        result = run_case(200, 5, 0.5, 0.5, 0.2, self.tax_rates, seed=3)
+        
+        for phase in ("csv_load", "build", "optimize_for_zero_tax", "fine_tune_for_zero_tax", "report", "exact"):
+            self.assertGreaterEqual(result["phases"][phase]["seconds"], 0)
+        self.assertGreater(result["phases"]["csv_load"]["peak_bytes"], 0)
+        self.assertGreaterEqual(result["optimality_gap"], -1e-6)
+        self.assertAlmostEqual(result["exact_proceeds"], result["target_amount"], places=4)
+    
+    def test_find_regressions(self):
+        """Test that slower phases and larger gaps are flagged"""
+        result = run_case(50, 3, 0.5, 0.5, 0.2, self.tax_rates, exact_limit=0, track_memory=False)
+        self.assertIsNone(result["optimality_gap"])
+        
+        slower = dict(result, phases={phase: dict(stats, seconds=stats["seconds"] * 2 + 1)
+                                      for phase, stats in result["phases"].items()})
+        self.assertEqual(find_regressions([result], {"results": [result]}, 0.25), [])
+        self.assertEqual(len(find_regressions([slower], {"results": [result]}, 0.25)), len(result["phases"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import json
+import os
+import tempfile
+import threading
+from price_providers import (PriceProvider, StaticPriceProvider, FilePriceProvider, YFinanceProvider,
+                             CachedPriceProvider, FallbackPriceProvider)
+
+
+class CountingProvider(PriceProvider):
+    """Static provider that records which symbols it was asked for"""
+    
+    name = "counting"
+    
+    def __init__(self, prices):
+        self.prices = prices
+        self.requests = []
+    
+    def get_prices(self, symbols):
+        symbols = set(symbols)
+        self.requests.append(symbols)
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+
+class OfflineYFinanceProvider(YFinanceProvider):
+    """YFinanceProvider with the network calls replaced by local data"""
+    
+    def __init__(self, batch_prices, single_prices, max_workers=4):
+        super().__init__(max_workers=max_workers)
+        self.batch_prices = batch_prices
+        self.single_prices = single_prices
+        self.single_threads = set()
+    
+    def _download_batch(self, symbols):
+        return {s: self.batch_prices[s] for s in symbols if s in self.batch_prices}
+    
+    def _fetch_symbol(self, symbol):
+        self.single_threads.add(threading.get_ident())
+        if symbol == "BOOM":
+            raise RuntimeError("network down")
+        return self.single_prices.get(symbol)
+
+
+class TestPriceProviders(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_static_provider_skips_invalid_prices(self):
+        """Test that missing and non-positive prices are left out"""
+        provider = StaticPriceProvider({"AMZN": 180.0, "BAD": 0.0})
+        self.assertEqual(provider.get_prices(["AMZN", "BAD", "GOOG"]), {"AMZN": 180.0})
+    
+    def test_file_provider(self):
+        """Test loading fixture prices from JSON and CSV files"""
+        json_file = os.path.join(self.temp_dir.name, "prices.json")
+        with open(json_file, "w") as f:
+            json.dump({"AMZN": 180.5, "AAPL": 170}, f)
+        
+        csv_file = os.path.join(self.temp_dir.name, "prices.csv")
+        with open(csv_file, "w") as f:
+            f.write("Symbol,Price\nAMZN,181.25\nMSFT,400\n")
+        
+        self.assertEqual(FilePriceProvider(json_file).get_prices(["AMZN", "AAPL"]), {"AMZN": 180.5, "AAPL": 170.0})
+        self.assertEqual(FilePriceProvider(csv_file).get_prices(["AMZN", "MSFT", "AAPL"]), {"AMZN": 181.25, "MSFT": 400.0})
+    
+    def test_yfinance_retries_batch_misses_concurrently(self):
+        """Test that symbols the batch download misses are fetched one by one"""
+        provider = OfflineYFinanceProvider({"AMZN": 180.0}, {"AAPL": 170.0, "MSFT": 400.0})
+        prices = provider.get_prices(["AMZN", "AAPL", "MSFT", "BOOM", "NOPE", ""])
+        
+        self.assertEqual(prices, {"AMZN": 180.0, "AAPL": 170.0, "MSFT": 400.0})
+        self.assertNotIn(threading.get_ident(), provider.single_threads)
+    
+    def test_cache_serves_repeat_requests(self):
+        """Test that cached prices are not fetched again within the TTL"""
+        cache_file = os.path.join(self.temp_dir.name, "cache.json")
+        upstream = CountingProvider({"AMZN": 180.0, "AAPL": 170.0})
+        
+        cached = CachedPriceProvider(upstream, cache_file, ttl_seconds=60)
+        self.assertEqual(cached.get_prices(["AMZN"]), {"AMZN": 180.0})
+        
+        # A fresh provider on the same file only asks upstream for the new symbol
+        cached = CachedPriceProvider(upstream, cache_file, ttl_seconds=60)
+        self.assertEqual(cached.get_prices(["AMZN", "AAPL"]), {"AMZN": 180.0, "AAPL": 170.0})
+        self.assertEqual(upstream.requests, [{"AMZN"}, {"AAPL"}])
+    
+    def test_cache_expires(self):
+        """Test that entries older than the TTL are refetched"""
+        cache_file = os.path.join(self.temp_dir.name, "cache.json")
+        upstream = CountingProvider({"AMZN": 180.0})
+        
+        cached = CachedPriceProvider(upstream, cache_file, ttl_seconds=-1)
+        cached.get_prices(["AMZN"])
+        cached.get_prices(["AMZN"])
+        self.assertEqual(upstream.requests, [{"AMZN"}, {"AMZN"}])
+    
+    def test_fallback_chain(self):
+        """Test that later providers only see the symbols earlier ones missed"""
+        market = CountingProvider({"AMZN": 180.0})
+        csv_implied = CountingProvider({"AMZN": 1.0, "AAPL": 170.0})
+        
+        prices = FallbackPriceProvider([market, csv_implied]).get_prices(["AMZN", "AAPL", "GOOG"])
+        
+        self.assertEqual(prices, {"AMZN": 180.0, "AAPL": 170.0})
+        self.assertEqual(csv_implied.requests, [{"AAPL", "GOOG"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
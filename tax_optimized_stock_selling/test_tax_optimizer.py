@@ -1,7 +1,11 @@
 import unittest
 import datetime
 import os
-from tax_optimized_stock_selling import StockLot, TaxOptimizer, load_stock_lots_from_csv
+import tempfile
+from tax_optimized_stock_selling import (StockLot, LotTable, TaxOptimizer, load_stock_lots_from_csv,
+                                         load_lot_table_from_csv, iter_lot_table_chunks, clean_numeric,
+                                         clean_numeric_array, extract_current_price_from_csv,
+                                         OptimizerSession, SOLVER_LP, OBJECTIVE_ZERO_TAX, OBJECTIVE_MIN_TAX)
 
 class TestTaxOptimizer(unittest.TestCase):
     def setUp(self):
@@ -133,6 +137,297 @@ class TestTaxOptimizer(unittest.TestCase):
         self.assertLessEqual(total_shares_sold, total_shares_available)
 
 
+class TestLotTable(unittest.TestCase):
+    """Tests for the columnar lot store"""
+    
+    def setUp(self):
+        today = datetime.date.today()
+        self.one_year_ago = today - datetime.timedelta(days=366)
+        six_months_ago = today - datetime.timedelta(days=180)
+        
+        self.lots = [
+            StockLot(index=4, quantity=10, symbol="AAA", date_acquired=self.one_year_ago, cost_basis_per_share=150.0),
+            StockLot(index=7, quantity=15, symbol="BBB", date_acquired=six_months_ago, cost_basis_per_share=30.0),
+            StockLot(index=9, quantity=20, symbol="AAA", date_acquired=six_months_ago, cost_basis_per_share=80.0),
+        ]
+        self.current_prices = {"AAA": 100.0, "BBB": 40.0}
+        self.tax_rates = {"short_term": 0.35, "long_term": 0.15}
+        self.table = LotTable.from_lots(self.lots)
+    
+    def test_round_trip(self):
+        """Test that rows read back as the original StockLot objects"""
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(list(self.table), self.lots)
+        self.assertEqual(self.table.symbols, ["AAA", "BBB"])
+    
+    def test_lookup_by_lot_index(self):
+        """Test the lot index -> row hash index"""
+        self.assertEqual(self.table.row_of(9), 2)
+        self.assertEqual(self.table.lot(7), self.lots[1])
+        self.assertIsNone(self.table.row_of(5))
+        self.assertIsNone(self.table.lot(5))
+    
+    def test_vectorized_metrics(self):
+        """Test that vectorized prices, terms and tax per share match the per-lot methods"""
+        optimizer = TaxOptimizer(self.lots, self.current_prices, self.tax_rates)
+        
+        self.assertEqual(self.table.prices_for(self.current_prices).tolist(), [100.0, 40.0, 100.0])
+        self.assertEqual(self.table.long_term_mask().tolist(), [lot.is_long_term() for lot in self.lots])
+        self.assertEqual(self.table.long_term_mask(as_of=self.one_year_ago).tolist(), [False, False, False])
+        
+        tax_per_share = self.table.tax_per_share(self.current_prices, self.tax_rates)
+        for lot, expected in zip(self.lots, tax_per_share):
+            self.assertAlmostEqual(optimizer.calculate_tax(lot, 1.0), expected)
+    
+    def test_missing_price(self):
+        """Test that symbols without a price get a zero price"""
+        self.assertEqual(self.table.prices_for({"AAA": 100.0}).tolist(), [100.0, 0.0, 100.0])
+    
+    def test_optimizer_accepts_table(self):
+        """Test that TaxOptimizer gives the same answer for a LotTable and a list of lots"""
+        from_list = TaxOptimizer(self.lots, self.current_prices, self.tax_rates).optimize_sales(1200.0)
+        from_table = TaxOptimizer(self.table, self.current_prices, self.tax_rates).optimize_sales(1200.0)
+        self.assertEqual(from_list, from_table)
+
+
+class TestBatchOptimization(unittest.TestCase):
+    """Tests for optimizing several target amounts at once"""
+    
+    def setUp(self):
+        today = datetime.date.today()
+        one_year_ago = today - datetime.timedelta(days=366)
+        six_months_ago = today - datetime.timedelta(days=180)
+        
+        self.lots = [
+            StockLot(index=0, quantity=10, symbol="TEST", date_acquired=one_year_ago, cost_basis_per_share=150.0),
+            StockLot(index=1, quantity=15, symbol="TEST", date_acquired=six_months_ago, cost_basis_per_share=130.0),
+            StockLot(index=2, quantity=20, symbol="TEST", date_acquired=one_year_ago, cost_basis_per_share=80.0),
+            StockLot(index=3, quantity=25, symbol="TEST", date_acquired=six_months_ago, cost_basis_per_share=90.0),
+            StockLot(index=4, quantity=30, symbol="OTHER", date_acquired=one_year_ago, cost_basis_per_share=45.0),
+        ]
+        self.current_prices = {"TEST": 100.0, "OTHER": 50.0}
+        self.tax_rates = {"short_term": 0.35, "long_term": 0.15}
+        self.optimizer = TaxOptimizer(self.lots, self.current_prices, self.tax_rates)
+        self.targets = [250.0, 1000.0, 2500.0, 5000.0]
+    
+    def test_batch_matches_single_target(self):
+        """Test that every batch answer matches a separate optimize_sales call"""
+        curve = self.optimizer.optimize_sales_batch(self.targets)
+        
+        self.assertEqual([target for target, _, _, _ in curve], self.targets)
+        for target, total_proceeds, total_tax, sales in curve:
+            self.assertEqual(sales, self.optimizer.optimize_sales(target))
+            self.assertAlmostEqual(total_proceeds, sum(shares * self.current_prices[self.optimizer.lot_table.lot(idx).symbol]
+                                                       for idx, shares in sales))
+            self.assertGreaterEqual(total_proceeds, target * 0.98)
+    
+    def test_batch_with_lp_solver(self):
+        """Test that the batch API also works with the LP backend"""
+        lp_optimizer = TaxOptimizer(self.lots, self.current_prices, self.tax_rates, solver=SOLVER_LP)
+        curve = lp_optimizer.optimize_sales_batch(self.targets)
+        
+        for target, total_proceeds, total_tax, _ in curve:
+            self.assertAlmostEqual(total_proceeds, target, places=4)
+            self.assertAlmostEqual(total_tax, 0.0, places=4)
+    
+    def test_target_above_portfolio_value(self):
+        """Test that a target above the portfolio value sells everything"""
+        portfolio_value = 7000.0 + 1500.0
+        (_, total_proceeds, _, sales), = self.optimizer.optimize_sales_batch([20000.0])
+        
+        self.assertAlmostEqual(total_proceeds, portfolio_value)
+        self.assertEqual(sorted(idx for idx, _ in sales), [0, 1, 2, 3, 4])
+    
+    def test_empty_batch(self):
+        """Test that an empty batch returns an empty curve"""
+        self.assertEqual(self.optimizer.optimize_sales_batch([]), [])
+
+
+class TestOptimizerSession(unittest.TestCase):
+    """Tests for incremental re-optimization when prices change"""
+    
+    def setUp(self):
+        today = datetime.date.today()
+        one_year_ago = today - datetime.timedelta(days=366)
+        six_months_ago = today - datetime.timedelta(days=180)
+        
+        self.lots = [
+            StockLot(index=0, quantity=10, symbol="TEST", date_acquired=one_year_ago, cost_basis_per_share=150.0),
+            StockLot(index=1, quantity=15, symbol="TEST", date_acquired=six_months_ago, cost_basis_per_share=130.0),
+            StockLot(index=2, quantity=20, symbol="TEST", date_acquired=one_year_ago, cost_basis_per_share=80.0),
+            StockLot(index=3, quantity=25, symbol="TEST", date_acquired=six_months_ago, cost_basis_per_share=90.0),
+            StockLot(index=4, quantity=30, symbol="OTHER", date_acquired=one_year_ago, cost_basis_per_share=45.0),
+            StockLot(index=5, quantity=40, symbol="OTHER", date_acquired=six_months_ago, cost_basis_per_share=60.0),
+            StockLot(index=6, quantity=50, symbol="THIRD", date_acquired=one_year_ago, cost_basis_per_share=20.0),
+        ]
+        self.current_prices = {"TEST": 100.0, "OTHER": 50.0, "THIRD": 25.0}
+        self.tax_rates = {"short_term": 0.35, "long_term": 0.15}
+    
+    def test_update_matches_fresh_optimizer(self):
+        """Test that updated lot metrics and frontiers match an optimizer built at the new prices"""
+        optimizer = TaxOptimizer(self.lots, self.current_prices, self.tax_rates)
+        changed_rows = optimizer.update_prices({"OTHER": 65.0, "THIRD": 25.0})
+        
+        self.assertEqual(changed_rows.tolist(), [4, 5])
+        
+        fresh = TaxOptimizer(self.lots, dict(self.current_prices, OTHER=65.0), self.tax_rates)
+        for name in ("_prices", "_tax_per_share", "_valid", "_tax_efficiency"):
+            self.assertEqual(getattr(optimizer, name).tolist(), getattr(fresh, name).tolist())
+        for kind in TaxOptimizer.FRONTIERS:
+            self.assertEqual(getattr(optimizer, f"_{kind}_frontier").rows.tolist(),
+                             getattr(fresh, f"_{kind}_frontier").rows.tolist())
+    
+    def test_unchanged_prices_are_a_no_op(self):
+        """Test that re-sending the current prices leaves the plan untouched"""
+        optimizer = TaxOptimizer(self.lots, self.current_prices, self.tax_rates)
+        session = OptimizerSession(optimizer, 2000.0)
+        sales = session.sales
+        
+        self.assertEqual(optimizer.update_prices(self.current_prices).size, 0)
+        self.assertEqual(session.update_prices({"TEST": 100.0}), sales)
+        self.assertEqual(session.full_solves, 1)
+    
+    def test_repaired_plan_reaches_target(self):
+        """Test that the plan still raises the target after a price tick"""
+        optimizer = TaxOptimizer(self.lots, self.current_prices, self.tax_rates)
+        session = OptimizerSession(optimizer, 2000.0)
+        
+        for prices in ({"TEST": 95.0}, {"OTHER": 52.5, "THIRD": 24.0}, {"TEST": 0.0}):
+            session.update_prices(prices)
+            self.assertGreaterEqual(session.total_proceeds, 2000.0 * 0.98)
+            self.assertLessEqual(session.total_proceeds, 2000.0 * 1.05)
+            
+            # Every lot in the plan is sellable and priced at the latest prices
+            for idx, shares in session.sales:
+                lot = optimizer.lot_table.lot(idx)
+                self.assertGreater(optimizer.current_prices[lot.symbol], 0)
+                self.assertLessEqual(shares, lot.quantity + 1e-9)
+        
+        self.assertEqual(optimizer.current_prices, {"TEST": 0.0, "OTHER": 52.5, "THIRD": 24.0})
+
+
+class TestLinearProgramSolver(unittest.TestCase):
+    """Tests for the exact LP solver backend"""
+
+    def setUp(self):
+        today = datetime.date.today()
+        one_year_ago = today - datetime.timedelta(days=366)
+        six_months_ago = today - datetime.timedelta(days=180)
+
+        self.lots = [
+            StockLot(index=0, quantity=10, symbol="TEST", date_acquired=one_year_ago, cost_basis_per_share=150.0),
+            StockLot(index=1, quantity=15, symbol="TEST", date_acquired=six_months_ago, cost_basis_per_share=130.0),
+            StockLot(index=2, quantity=20, symbol="TEST", date_acquired=one_year_ago, cost_basis_per_share=80.0),
+            StockLot(index=3, quantity=25, symbol="TEST", date_acquired=six_months_ago, cost_basis_per_share=90.0),
+        ]
+        self.current_prices = {"TEST": 100.0}
+        self.tax_rates = {"short_term": 0.35, "long_term": 0.15}
+        self.optimizer = TaxOptimizer(self.lots, self.current_prices, self.tax_rates, solver=SOLVER_LP)
+
+    def test_zero_tax_objective(self):
+        """Test that the LP reaches the target with tax as close to zero as possible"""
+        solution = self.optimizer.optimize_with_linear_program(1000.0, objective=OBJECTIVE_ZERO_TAX)
+
+        self.assertAlmostEqual(sum(s[2] for s in solution), 1000.0, places=4)
+        self.assertAlmostEqual(sum(s[3] for s in solution), 0.0, places=4)
+
+    def test_min_tax_objective(self):
+        """Test that the LP harvests the largest tax benefit per dollar first"""
+        solution = self.optimizer.optimize_with_linear_program(1500.0, objective=OBJECTIVE_MIN_TAX)
+
+        # Lot 1 has the largest benefit per share (-10.5) and covers the whole target
+        self.assertEqual([idx for idx, _, _, _ in solution], [1])
+        self.assertAlmostEqual(solution[0][1], 15.0, places=4)
+        self.assertAlmostEqual(solution[0][3], -157.5, places=4)
+
+    def test_shares_within_lot_quantity(self):
+        """Test that the LP never sells more than a lot holds, even above portfolio value"""
+        solution = self.optimizer.optimize_with_linear_program(10000.0)
+        quantities = {lot.index: lot.quantity for lot in self.lots}
+
+        for idx, shares, _, _ in solution:
+            self.assertLessEqual(shares, quantities[idx] + 1e-9)
+        self.assertAlmostEqual(sum(s[2] for s in solution), 7000.0, places=4)
+
+    def test_no_worse_than_heuristic(self):
+        """Test that the LP's |tax| is never worse than the heuristic's"""
+        heuristic = TaxOptimizer(self.lots, self.current_prices, self.tax_rates)
+        for target in (250.0, 1000.0, 3000.0):
+            initial = heuristic.optimize_for_zero_tax(target)
+            heuristic_tax = sum(s[3] for s in heuristic.fine_tune_for_zero_tax(initial, target))
+            lp_tax = sum(s[3] for s in self.optimizer.optimize_with_linear_program(target))
+            self.assertLessEqual(abs(lp_tax), abs(heuristic_tax) + 1e-6)
+
+    def test_optimize_sales_uses_lp(self):
+        """Test that optimize_sales returns (lot_index, shares) pairs from the LP backend"""
+        optimal_sales = self.optimizer.optimize_sales(1000.0)
+        total_proceeds = sum(shares * 100.0 for _, shares in optimal_sales)
+        self.assertAlmostEqual(total_proceeds, 1000.0, places=4)
+
+    def test_unknown_solver(self):
+        """Test that an unknown solver name is rejected"""
+        with self.assertRaises(ValueError):
+            TaxOptimizer(self.lots, self.current_prices, self.tax_rates, solver="simplex")
+
+
+class TestStreamingCsvLoader(unittest.TestCase):
+    """Tests for the chunked, single-pass CSV loader"""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.csv_file = os.path.join(self.temp_dir.name, "lots.csv")
+        with open(self.csv_file, "w", newline="") as f:
+            f.write("Symbol,Quantity,Date Acquired,Cost Basis/Share,Unrealized G/L\n")
+            f.write('AMZN,"1,000",01/15/2024,$150.25,"$5,000.00"\n')
+            f.write("AAPL,10,01/15/2024,$180.00,-$100.00\n")
+            f.write(",5,02/01/2024,$10.00,$0.00\n")
+            f.write("AMZN,0,02/01/2024,$10.00,$0.00\n")
+            f.write("MSFT,2.5,not a date,$300.00,$50.00\n")
+            f.write("AMZN,20,03/01/2023,$100.00\n")
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_load_lot_table(self):
+        """Test that lots, dates and implied prices come back from one pass"""
+        table, implied_prices = load_lot_table_from_csv(self.csv_file)
+        
+        self.assertEqual(table.index.tolist(), [0, 1, 4, 5])
+        self.assertEqual(table.quantity.tolist(), [1000.0, 10.0, 2.5, 20.0])
+        self.assertEqual(table.cost_basis_per_share.tolist(), [150.25, 180.0, 300.0, 100.0])
+        self.assertEqual(table[0].date_acquired, datetime.date(2024, 1, 15))
+        self.assertEqual(table[2].date_acquired, datetime.date.today())
+        self.assertEqual([lot.symbol for lot in table], ["AMZN", "AAPL", "MSFT", "AMZN"])
+        
+        self.assertAlmostEqual(implied_prices["AMZN"], 155.25)
+        self.assertAlmostEqual(implied_prices["AAPL"], 170.0)
+        self.assertAlmostEqual(implied_prices["MSFT"], 320.0)
+    
+    def test_chunks_match_whole_file(self):
+        """Test that small chunks concatenate to the same table"""
+        chunks = list(iter_lot_table_chunks(self.csv_file, chunk_size=2))
+        self.assertEqual(len(chunks), 3)
+        
+        table = LotTable.concatenate(chunks)
+        self.assertEqual(list(table), load_stock_lots_from_csv(self.csv_file))
+    
+    def test_extract_current_prices(self):
+        """Test the per-symbol price helper against the all-symbol pass"""
+        self.assertAlmostEqual(extract_current_price_from_csv(self.csv_file, "AAPL"), 170.0)
+        self.assertIsNone(extract_current_price_from_csv(self.csv_file, "GOOG"))
+    
+    def test_clean_numeric_array(self):
+        """Test that the column cleaner matches clean_numeric"""
+        values = ["$1,234.50", "", "-$7.25", "12", "abc", "1.2.3"]
+        self.assertEqual(clean_numeric_array(values).tolist(), [clean_numeric(v) for v in values])
+    
+    def test_missing_file(self):
+        """Test that a missing file loads as an empty table"""
+        table, implied_prices = load_lot_table_from_csv(os.path.join(self.temp_dir.name, "missing.csv"))
+        self.assertEqual(len(table), 0)
+        self.assertEqual(implied_prices, {})
+
+
 class TestWithRealData(unittest.TestCase):
     """Tests using the real AMZN sample data"""
     